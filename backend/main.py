@@ -1,27 +1,35 @@
-"""FastAPI backend for CRISPR design platform."""
+"""FastAPI backend for CRISPR design platform.
 
-from fastapi import FastAPI, HTTPException
+Only configuration, telemetry and the design executor are set up at import
+time. The pipeline, fetchers, stores and their heavy imports are components
+built on first use or by a warm-up, as chosen by ``STARTUP_MODE``.
+"""
+
+import time
+_module_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Union
+from contextlib import nullcontext
 import sys
 import os
-import time
+import json
+import logging
 
 # Add crispr_rl to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from crispr_rl.utils.config import Config
-from crispr_rl.data.fetchers import SequenceFetcher
-from crispr_rl.features.pam_scanner import PAMScanner
-from crispr_rl.features.extractor import FeatureExtractor
-from crispr_rl.scoring.scorer import GuideScorer
-from crispr_rl.rl.optimizer import RLOptimizer
-from crispr_rl.rl.reranker import ParetoReranker
-from crispr_rl.rl.feedback_manager import FeedbackManager
-from crispr_rl.utils.metrics import metrics_collector
+from crispr_rl.utils.metrics import metrics_collector, StageTimer
+from crispr_rl.utils.tracing import start_trace, log_trace, cprofile_jobs, span
+from crispr_rl.utils.executor import DesignExecutor, Saturated, DesignTimeout
+from crispr_rl.utils.components import ComponentRegistry
 
 app = FastAPI(title="CRISPR Design API", version="0.1.0")
+logger = logging.getLogger("crispr_backend")
 
 # CORS
 app.add_middleware(
@@ -34,19 +42,81 @@ app.add_middleware(
 
 # Global instances
 config = Config()
-fetcher = SequenceFetcher(config)
-scanner = PAMScanner(config)
-extractor = FeatureExtractor()
-scorer = GuideScorer(config)
-optimizer = RLOptimizer(config, scorer)
-reranker = ParetoReranker()
-feedback_manager = FeedbackManager()
+design_executor = DesignExecutor.from_config(config, metrics_collector)  # Keeps design work off the event loop
+components = ComponentRegistry()  # Everything else, built lazily (see /ready for init timings)
+
+def _async_fetcher():
+    from crispr_rl.data.fetchers import SequenceFetcher
+    from crispr_rl.data.async_fetcher import AsyncSequenceFetcher
+    return AsyncSequenceFetcher(config, SequenceFetcher(config))
+
+def _scorer():
+    from crispr_rl.scoring.scorer import GuideScorer
+    return GuideScorer(config)
+
+def _policy_store():
+    from crispr_rl.rl.policy_store import PolicyStore
+    return PolicyStore(config.policy_store) if config.policy_store else None  # Shared by all API workers
+
+def _optimizer():
+    from crispr_rl.rl.optimizer import RLOptimizer
+    return RLOptimizer(config, components.get("scorer"), components.get("policy_store"))
+
+def _offtarget_index():
+    from crispr_rl.data.offtarget_index import OffTargetIndex
+    return OffTargetIndex.load(config.offtarget_index) if config.offtarget_index else None
+
+def _design_cache():
+    from crispr_rl.pipeline import DesignCache
+    return DesignCache(config.design_cache_size, config.design_cache_bytes) if config.design_cache_size > 0 else None
+
+def _pipeline():
+    from crispr_rl.features.pam_scanner import PAMScanner
+    from crispr_rl.features.extractor import FeatureExtractor
+    from crispr_rl.rl.reranker import ParetoReranker
+    from crispr_rl.pipeline import DesignPipeline
+    return DesignPipeline(config, PAMScanner(config), FeatureExtractor(), components.get("scorer"),
+                          components.get("optimizer"), ParetoReranker(), components.get("offtarget_index"),
+                          components.get("design_cache"), metrics_collector)
+
+def _feedback_manager():
+    from crispr_rl.rl.feedback_manager import FeedbackManager
+    return FeedbackManager()
+
+def _policy_retrainer():
+    from crispr_rl.rl.retrainer import PolicyRetrainer
+    retrainer = PolicyRetrainer(components.get("optimizer"), components.get("feedback_manager"), config)
+    retrainer.start()  # Folds feedback into the policy in the background
+    return retrainer
+
+def _batch_designer():
+    from crispr_rl.batch import BatchDesigner
+    return BatchDesigner(config, policy_store=config.policy_store)  # Workers start on the first batch
+
+for _name, _factory in [("async_fetcher", _async_fetcher), ("scorer", _scorer), ("policy_store", _policy_store),
+                        ("optimizer", _optimizer), ("offtarget_index", _offtarget_index),
+                        ("design_cache", _design_cache), ("pipeline", _pipeline),
+                        ("feedback_manager", _feedback_manager), ("policy_retrainer", _policy_retrainer),
+                        ("batch_designer", _batch_designer)]:
+    components.register(_name, _factory)
+
+def _default_nucleases() -> List[str]:
+    from crispr_rl.features.pam_scanner import NUCLEASES
+    return list(NUCLEASES)
 
 # Pydantic models
 class DesignRequest(BaseModel):
     gene_id: str
     region_start: Optional[int] = 0
     region_end: Optional[int] = None
+    top_k: int = Field(10, ge=1)
+
+class NucleaseDesignRequest(DesignRequest):
+    nucleases: List[Union[str, Dict[str, Any]]] = Field(default_factory=_default_nucleases)
+
+class BatchDesignRequest(BaseModel):
+    genes: List[DesignRequest] = Field(..., max_length=config.batch_max_genes)
+    top_k: int = Field(10, ge=1)
 
 class FeedbackRequest(BaseModel):
     candidate_id: str
@@ -56,18 +126,68 @@ class FeedbackRequest(BaseModel):
 class ConfigUpdate(BaseModel):
     weights: Optional[Dict[str, float]] = None
     rl_params: Optional[Dict[str, float]] = None
+    pam_sequence: Optional[str] = None
+    pam_side: Optional[str] = None
+
+@app.on_event("startup")
+def startup():
+    """Build components now (``eager``), on a background thread (``background``) or on first use (``lazy``)."""
+    if config.startup_mode == "eager":
+        components.warm_up()
+    elif config.startup_mode != "lazy":
+        components.start_warm_up()
+
+@app.on_event("shutdown")
+def shutdown():
+    """Stop retraining and release pooled fetch resources, design threads and batch workers."""
+    for name, release in (("policy_retrainer", "stop"), ("async_fetcher", "close"), ("batch_designer", "close")):
+        component = components.peek(name)
+        if component is not None:
+            getattr(component, release)()
+    design_executor.close()
+
+async def fetch_for_design(gene_id: str, timer: Optional[StageTimer] = None, region_start: Optional[int] = 0,
+                           region_end: Optional[int] = None):
+    """Fetch the sequence of a design, recording the time under the ``fetch`` pipeline stage.
+
+    For a region of a local contig only the region and the flank its guides
+    read are fetched, as a window in contig coordinates.
+    """
+    started = time.perf_counter()
+    try:
+        with span("fetch", gene_id=gene_id):
+            async_fetcher = await components.aget("async_fetcher")
+            if not region_start and region_end is None:
+                return await async_fetcher.fetch_sequence(gene_id)
+            flank = (await components.aget("pipeline")).context_flank
+            return await async_fetcher.fetch_region(gene_id, region_start or 0, region_end, flank)
+    finally:
+        duration = time.perf_counter() - started
+        metrics_collector.record_stage("fetch", duration)
+        if timer is not None:
+            timer.add("fetch", duration)
+
+def overloaded(error: Exception) -> HTTPException:
+    """429 when the design queue is full, 503 when a design times out; both ask the client to retry."""
+    status = 429 if isinstance(error, Saturated) else 503
+    return HTTPException(status_code=status, detail=str(error), headers={"Retry-After": "1"})
+
+def profile_mode(flag: Optional[str]) -> Optional[str]:
+    """Normalize a profiling flag to None (off), ``"stages"`` or ``"cprofile"``."""
+    if not flag or flag.lower() in ("0", "false", "no", "off"):
+        return None
+    return "cprofile" if flag.lower() == "cprofile" else "stages"
 
 @app.get("/crispr/sequence/{gene_id}")
 async def get_sequence(gene_id: str):
     """Fetch FASTA sequence for gene."""
     gene_id = gene_id.strip()
-    print(f"Fetching sequence for gene_id: '{gene_id}'")
+    logger.debug("Fetching sequence for gene_id: %r", gene_id)
     start_time = time.time()
     try:
-        sequence = fetcher.fetch_sequence(gene_id)
-        print(f"Sequence fetched: {sequence is not None}, length: {len(sequence) if sequence else 0}")
+        sequence = await (await components.aget("async_fetcher")).fetch_sequence(gene_id)
         if not sequence:
-            print("No sequence found, raising 404")
+            logger.debug("No sequence found for %r", gene_id)
             metrics_collector.record_request("/crispr/sequence", time.time() - start_time, False)
             raise HTTPException(status_code=404, detail="Gene sequence not found")
         duration = time.time() - start_time
@@ -76,78 +196,208 @@ async def get_sequence(gene_id: str):
     except HTTPException:
         raise  # Re-raise HTTPExceptions (like 404) without wrapping
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.exception("Unexpected error fetching %r", gene_id)
         duration = time.time() - start_time
         metrics_collector.record_request("/crispr/sequence", duration, False)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/crispr/design")
-async def design_guides(request: DesignRequest):
-    """Design CRISPR guides for gene region."""
+async def design_guides(request: DesignRequest, profile: Optional[str] = None,
+                        x_crispr_profile: Optional[str] = Header(None)):
+    """Design CRISPR guides for gene region.
+
+    ``?profile=1`` (or an ``X-CRISPR-Profile: 1`` header) adds a ``profile``
+    object with the per-stage breakdown and span trace of this request;
+    ``cprofile`` instead of ``1`` also includes a cProfile dump of the design
+    work run on the executor.
+    """
     start_time = time.time()
+    mode = profile_mode(profile or x_crispr_profile)
+    timer = StageTimer()
     try:
-        print(f"Starting guide design for gene {request.gene_id}")
-        sequence = fetcher.fetch_sequence(request.gene_id)
-        if not sequence:
-            raise HTTPException(status_code=404, detail="Gene sequence not found")
-        print(f"Fetched sequence of length {len(sequence)}")
-
-        # Scan PAM sites
-        pam_sites = scanner.find_pam_sites(sequence, request.region_start, request.region_end)
-        print(f"Found {len(pam_sites)} PAM sites")
-
-        # Extract features and score
-        guides = []
-        for i, site in enumerate(pam_sites[:5]):  # Limit for debugging
-            print(f"Processing site {i+1}/{len(pam_sites)} at locus {site['locus']}")
-            features = extractor.extract_features(
-                site['guide_sequence'], site['pam_sequence'], site['locus'], len(sequence)
-            )
-            scores = scorer.score_guide(features)
-            guide = {
-                **site,
-                **features,
-                **scores,
-                'candidate_id': f"{request.gene_id}_{site['locus']}"
-            }
-            guides.append(guide)
-
-        print(f"Extracted features for {len(guides)} guides")
-
-        # RL optimization
-        optimized = optimizer.optimize_guides(guides.copy(), top_k=min(20, len(guides)))
-        print(f"Optimized to {len(optimized)} guides")
-
-        # Rerank for diversity
-        final_guides = reranker.rerank(optimized, top_k=min(10, len(optimized)))
-        print(f"Final guides: {len(final_guides)}")
+        pipeline = await components.aget("pipeline")
+        with start_trace("/crispr/design") if mode or config.tracing else nullcontext() as trace:
+            # Only the executor jobs are profiled, never the event loop running other requests
+            with cprofile_jobs() if mode == "cprofile" else nullcontext() as profiler:
+                logger.debug("Starting guide design for gene %s", request.gene_id)
+                result = await design_executor.run(pipeline.lookup, request.gene_id, request.region_start,
+                                                   request.region_end, top_k=request.top_k, timer=timer)
+                cached = result is not None
+                if result is None:
+                    sequence = await fetch_for_design(request.gene_id, timer, request.region_start,
+                                                      request.region_end)
+                    if not sequence:
+                        raise HTTPException(status_code=404, detail="Gene sequence not found")
+
+                    # Scan, score, optimize and rerank chunk by chunk
+                    result = await design_executor.run(pipeline.design, sequence, request.gene_id,
+                                                       request.region_start, request.region_end,
+                                                       top_k=request.top_k, timer=timer)
+        logger.debug("Found %d PAM sites, final guides: %d", result['total_sites'], len(result['guides']))
+        if trace is not None and config.tracing:
+            log_trace(trace)
 
         duration = time.time() - start_time
-        metrics_collector.record_design(request.gene_id, len(pam_sites), len(final_guides), duration)
+        metrics_collector.record_design(request.gene_id, result['total_sites'], len(result['guides']), duration)
         metrics_collector.record_request("/crispr/design", duration, True)
-
-        return {
-            "gene_id": request.gene_id,
-            "region": {"start": request.region_start, "end": request.region_end or len(sequence)},
-            "total_sites": len(pam_sites),
-            "guides": final_guides
-        }
+        if mode:
+            result = {**result, "profile": {
+                "duration": duration,
+                "cached": cached,
+                "stages": timer.totals,
+                "trace": trace.to_dict(),
+                **({"cprofile": profiler["stats"]} if profiler is not None else {}),
+            }}
+        return result
+    except HTTPException:
+        metrics_collector.record_request("/crispr/design", time.time() - start_time, False)
+        raise
+    except (Saturated, DesignTimeout) as e:
+        metrics_collector.record_request("/crispr/design", time.time() - start_time, False)
+        raise overloaded(e)
     except Exception as e:
-        import traceback
-        print(f"Error in design_guides: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in design_guides")
         duration = time.time() - start_time
         metrics_collector.record_request("/crispr/design", duration, False)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/crispr/design/stream")
+async def design_guides_stream(request: DesignRequest):
+    """Stream CRISPR guides for a gene region as NDJSON.
+
+    Each line is a JSON object: ``{"type": "guides", ...}`` with the scored
+    guides of one chunk, then a final ``{"type": "summary", ...}`` with the
+    ranked result (or ``{"type": "error", ...}`` if design fails midway).
+    Chunks are computed on the design executor, one job per message.
+    """
+    start_time = time.time()
+    if design_executor.saturated:
+        metrics_collector.record_request("/crispr/design/stream", time.time() - start_time, False)
+        raise overloaded(Saturated("Design queue full"))
+    sequence = await fetch_for_design(request.gene_id, None, request.region_start, request.region_end)
+    if not sequence:
+        metrics_collector.record_request("/crispr/design/stream", time.time() - start_time, False)
+        raise HTTPException(status_code=404, detail="Gene sequence not found")
+    from crispr_rl.guide_table import dumps as dump_message
+    pipeline = await components.aget("pipeline")
+
+    def encoded():
+        for message in pipeline.iter_design(sequence, request.gene_id, request.region_start,
+                                            request.region_end, top_k=request.top_k):
+            yield message, dump_message(message) + "\n"
+
+    async def lines():
+        try:
+            messages = design_executor.iterate(encoded())
+            try:
+                async for message, line in messages:
+                    if message["type"] == "summary":
+                        duration = time.time() - start_time
+                        metrics_collector.record_design(request.gene_id, message['total_sites'],
+                                                        len(message['guides']), duration)
+                        metrics_collector.record_request("/crispr/design/stream", duration, True)
+                    yield line
+            finally:
+                await messages.aclose()  # Frees the executor slot when the client disconnects
+        except Exception as e:
+            metrics_collector.record_request("/crispr/design/stream", time.time() - start_time, False)
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/crispr/nucleases")
+async def list_nucleases():
+    """Built-in nuclease profiles accepted by ``/crispr/design/nucleases``."""
+    from crispr_rl.features.pam_scanner import NUCLEASES
+    return {name: profile.to_dict() for name, profile in NUCLEASES.items()}
+
+@app.post("/crispr/design/nucleases")
+async def design_guides_nucleases(request: NucleaseDesignRequest):
+    """Design guides for several nucleases from a single scan of the region.
+
+    ``nucleases`` lists built-in profile names or custom profiles
+    (``{"name", "pam", "pam_side", "guide_length"}``); each gets its own
+    ranked guides under ``nucleases`` in the response.
+    """
+    start_time = time.time()
+    try:
+        sequence = await fetch_for_design(request.gene_id)
+        if not sequence:
+            raise HTTPException(status_code=404, detail="Gene sequence not found")
+        try:
+            pipeline = await components.aget("pipeline")
+            result = await design_executor.run(pipeline.design_nucleases, sequence, request.gene_id,
+                                               request.nucleases, request.region_start, request.region_end,
+                                               top_k=request.top_k)
+        except (ValueError, KeyError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid nuclease profile: {e}")
+        metrics_collector.record_request("/crispr/design/nucleases", time.time() - start_time, True)
+        return result
+    except HTTPException:
+        metrics_collector.record_request("/crispr/design/nucleases", time.time() - start_time, False)
+        raise
+    except (Saturated, DesignTimeout) as e:
+        metrics_collector.record_request("/crispr/design/nucleases", time.time() - start_time, False)
+        raise overloaded(e)
+    except Exception as e:
+        logger.exception("Error in design_guides_nucleases")
+        metrics_collector.record_request("/crispr/design/nucleases", time.time() - start_time, False)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/crispr/design/batch")
+async def design_guides_batch(request: BatchDesignRequest):
+    """Design guides for many genes across the worker pool.
+
+    Streams one NDJSON line per gene in completion order, each tagged with
+    the gene's ``index`` in the request and a ``status`` of ``ok`` or
+    ``error``; a failing gene does not affect the rest of the batch. The
+    batch holds one design executor slot while it runs, and each gene must
+    finish within the design timeout.
+    """
+    start_time = time.time()
+    if design_executor.saturated:
+        metrics_collector.record_request("/crispr/design/batch", time.time() - start_time, False)
+        raise overloaded(Saturated("Design queue full"))
+    # Only fields a gene sets override the batch; a defaulted per-gene top_k would mask the batch top_k
+    jobs = [gene.model_dump(exclude_unset=True, exclude_none=True) for gene in request.genes]
+    batch_designer = await components.aget("batch_designer")
+
+    async def lines():
+        failures = 0
+        try:
+            results = design_executor.iterate(batch_designer.iter_design(jobs, top_k=request.top_k), per_item=True)
+            try:
+                async for result in results:
+                    metrics_collector.record_stages(result.get("stages", {}))
+                    if result["status"] == "ok":
+                        # The worker's own time for this gene, not its wait behind the rest of the batch
+                        metrics_collector.record_design(result["gene_id"], result["total_sites"],
+                                                        len(result["guides"]), sum(result["stages"].values()))
+                    else:
+                        failures += 1
+                    yield json.dumps(result) + "\n"
+            finally:
+                await results.aclose()  # Frees the executor slot when the client disconnects
+        except Exception as e:
+            metrics_collector.record_request("/crispr/design/batch", time.time() - start_time, False)
+            yield json.dumps({"status": "error", "error": str(e)}) + "\n"
+            return
+        metrics_collector.record_request("/crispr/design/batch", time.time() - start_time, failures == 0)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.post("/crispr/feedback")
 async def submit_feedback(request: FeedbackRequest):
-    """Submit user feedback for RL learning."""
+    """Submit user feedback for RL learning.
+
+    Feedback is only appended to the log here; the background retrainer
+    folds it into the policy in batches every ``RL_RETRAIN_INTERVAL``
+    seconds.
+    """
+    feedback_manager = await components.aget("feedback_manager")
+    await components.aget("policy_retrainer")  # Started on first feedback when STARTUP_MODE=lazy
     feedback_manager.add_feedback(request.candidate_id, request.rating, request.notes)
     metrics_collector.record_feedback(request.rating)
-    # Update RL policy with feedback
-    dummy_guide = {'locus': 0, 'guide_sequence': 'dummy'}
-    optimizer.update_policy(dummy_guide, request.rating / 5.0)  # Normalize to 0-1
     return {"status": "feedback_received"}
 
 @app.get("/crispr/config")
@@ -158,16 +408,62 @@ async def get_config():
 @app.post("/crispr/config")
 async def update_config(request: ConfigUpdate):
     """Update configuration."""
+    pipeline = await components.aget("pipeline")
     if request.weights:
         config.weights.update(request.weights)
     if request.rl_params:
         config.rl_params.update(request.rl_params)
+    # Cached designs depend on the weights and PAM; cached sites only on the PAM
+    pam_sequence = request.pam_sequence.upper() if request.pam_sequence is not None else config.pam_sequence
+    pam_side = request.pam_side if request.pam_side is not None else config.pam_side
+    if (pam_sequence, pam_side) != (config.pam_sequence, config.pam_side):
+        previous = config.pam_sequence, config.pam_side
+        config.pam_sequence, config.pam_side = pam_sequence, pam_side
+        try:
+            pipeline.config_changed(scan=True)
+        except ValueError as e:
+            config.pam_sequence, config.pam_side = previous
+            pipeline.config_changed(scan=True)
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        pipeline.config_changed()
     return config.to_dict()
 
 @app.get("/metrics")
 async def get_metrics():
     """Get telemetry metrics."""
-    return metrics_collector.get_summary()
+    summary = metrics_collector.get_summary()
+    design_cache = components.peek("design_cache")
+    if design_cache is not None:
+        summary["design_cache"] = design_cache.stats()
+    summary["design_executor"] = design_executor.stats()
+    policy_retrainer = components.peek("policy_retrainer")
+    if policy_retrainer is not None:
+        summary["policy_retrainer"] = policy_retrainer.stats()
+    return summary
+
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Telemetry metrics in the Prometheus text exposition format."""
+    stats = design_executor.stats()
+    gauges = {f"design_executor_{key}": stats[key] for key in ("running", "queued", "rejected", "timeouts")}
+    policy_retrainer = components.peek("policy_retrainer")
+    if policy_retrainer is not None:
+        stats = policy_retrainer.stats()
+        gauges.update({"policy_version": stats["policy_version"], "policy_feedback_offset": stats["offset"]})
+    design_cache = components.peek("design_cache")
+    if design_cache is not None:
+        stats = design_cache.stats()
+        gauges.update({f"design_cache_{key}": stats[key] for key in ("hits", "rescored", "misses")})
+    return PlainTextResponse(metrics_collector.prometheus_text(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once every component is warm, 503 before, with per-component init timings."""
+    status = {"startup_mode": config.startup_mode, "import_seconds": IMPORT_SECONDS, **components.status()}
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+IMPORT_SECONDS = time.perf_counter() - _module_started
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,175 @@
+"""Multi-gene batch design across a process pool."""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Union
+from .utils.config import Config
+from .data.fetchers import SequenceFetcher
+from .data.offtarget_index import OffTargetIndex
+from .pipeline import DesignPipeline, config_fingerprint
+from .scoring.scorer import GuideScorer
+from .rl.optimizer import RLOptimizer
+from .rl.policy_store import PolicyStore
+from .utils.metrics import StageTimer
+
+# Per-process state, built once by _init_worker
+_worker_fetcher: Optional[SequenceFetcher] = None
+_worker_pipeline: Optional[DesignPipeline] = None
+
+
+def _init_worker(config: Config, offtarget_index_path: Optional[str], policy_store_path: Optional[str] = None):
+    """Build the fetcher, pipeline, memory-mapped off-target index and shared policy of a worker."""
+    global _worker_fetcher, _worker_pipeline
+    offtarget_index = OffTargetIndex.load(offtarget_index_path) if offtarget_index_path else None
+    scorer = GuideScorer(config)
+    store = PolicyStore(policy_store_path) if policy_store_path else None
+    _worker_fetcher = SequenceFetcher(config)
+    _worker_pipeline = DesignPipeline(config, scorer=scorer, optimizer=RLOptimizer(config, scorer, store),
+                                      offtarget_index=offtarget_index)
+
+
+def _design_job(job: Dict[str, Any], top_k: int) -> Dict[str, Any]:
+    """Design one gene in a worker; failures are returned, never raised.
+
+    Successful results carry the job's per-stage times under ``stages``.
+    """
+    timer = StageTimer()
+    try:
+        with timer.stage('fetch'):
+            sequence = job.get('sequence')
+            if not sequence and (job.get('region_start') or job.get('region_end') is not None):
+                sequence = _worker_fetcher.fetch_window(job['gene_id'], job.get('region_start') or 0,
+                                                        job.get('region_end'), _worker_pipeline.context_flank)
+            sequence = sequence or _worker_fetcher.fetch_sequence(job['gene_id'])
+        if not sequence:
+            return {"status": "error", "gene_id": job['gene_id'], "error": "Gene sequence not found"}
+        result = _worker_pipeline.design(sequence, job['gene_id'], job.get('region_start') or 0,
+                                         job.get('region_end'), top_k=top_k, timer=timer)
+        return {"status": "ok", **result, "stages": timer.totals}
+    except Exception as e:
+        return {"status": "error", "gene_id": job.get('gene_id'), "error": f"{type(e).__name__}: {e}"}
+
+
+def parse_job(spec: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Normalize a job: a gene ID, ``"gene_id start end"``, or a dict with ``gene_id``."""
+    if isinstance(spec, dict):
+        return dict(spec)
+    fields = spec.split()
+    if len(fields) not in (1, 3):
+        raise ValueError(f"Expected 'gene_id' or 'gene_id start end', got {spec!r}")
+    job: Dict[str, Any] = {"gene_id": fields[0]}
+    if len(fields) == 3:
+        job["region_start"], job["region_end"] = int(fields[1]), int(fields[2])
+    return job
+
+
+class BatchDesigner:
+    """Designs many genes in parallel worker processes.
+
+    Each worker is initialized once with the config and the off-target index
+    (memory-mapped, so its pages are shared), then fetches and designs genes
+    independently. Results stream back in completion order, tagged with the
+    job's input ``index``; a failing gene yields an ``error`` record without
+    affecting the others, and a crashed worker pool is restarted. Workers
+    hold a copy of the config, so the pool is also restarted when the config
+    has changed since it started. Given a ``policy_store`` path, workers rank
+    with the policy shared through it.
+    """
+
+    def __init__(self, config: Config, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 policy_store: Optional[str] = None):
+        self.config = config
+        self.policy_store = policy_store
+        self.workers = workers or config.batch_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.fingerprint: Optional[str] = None  # Config the pool's workers were started with
+        self.lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        """The worker pool, started on first use and restarted when the config changes."""
+        fingerprint = config_fingerprint(self.config)
+        stale = None
+        with self.lock:
+            if self.executor is not None and self.fingerprint != fingerprint:
+                stale, self.executor = self.executor, None
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker,
+                    initargs=(self.config, self.config.offtarget_index, self.policy_store),
+                )
+                self.fingerprint = fingerprint
+            executor = self.executor
+        if stale is not None:
+            stale.shutdown(wait=False)  # Its in-flight jobs still finish under the old config
+        return executor
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool so the next submission starts a fresh one."""
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False)
+
+    def close(self):
+        """Shut the worker pool down."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self) -> 'BatchDesigner':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def iter_design(self, jobs: Iterable[Union[str, Dict[str, Any]]], top_k: int = 10) -> Iterator[Dict[str, Any]]:
+        """Yield one result per job as workers finish.
+
+        At most ``max_pending`` jobs are in flight, so arbitrarily long job
+        lists are consumed lazily.
+        """
+        job_iter = enumerate(jobs)
+        pending: Dict[Any, tuple] = {}
+        results: List[Dict[str, Any]] = []
+
+        def submit_next() -> bool:
+            for index, spec in job_iter:
+                try:
+                    job = parse_job(spec)
+                except ValueError as e:
+                    gene_id = spec.split()[0] if isinstance(spec, str) and spec.split() else None
+                    results.append({"index": index, "status": "error", "gene_id": gene_id, "error": str(e)})
+                    continue
+                executor = self._executor()
+                pending[executor.submit(_design_job, job, job.get('top_k') or top_k)] = (index, job, executor)
+                return True
+            return False
+
+        while len(pending) < self.max_pending and submit_next():
+            pass
+        while pending or results:
+            yield from results
+            results.clear()
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, job, executor = pending.pop(future)
+                try:
+                    results.append({"index": index, **future.result()})
+                except BrokenProcessPool:
+                    # Everything else in flight on that pool died with it; the
+                    # remaining jobs go to a fresh pool
+                    self._discard(executor)
+                    results.append({"index": index, "status": "error", "gene_id": job['gene_id'],
+                                    "error": "Worker process died"})
+            while len(pending) < self.max_pending and submit_next():
+                pass
+
+    def design(self, jobs: Iterable[Union[str, Dict[str, Any]]], top_k: int = 10) -> List[Dict[str, Any]]:
+        """Design every job and return results in input order."""
+        return sorted(self.iter_design(jobs, top_k), key=lambda result: result["index"])
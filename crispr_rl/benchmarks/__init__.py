@@ -0,0 +1 @@
+"""Reproducible performance benchmarks."""
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""Entry point for ``python -m crispr_rl.benchmarks``."""
+
+import sys
+from .suite import main
+
+sys.exit(main())
@@ -0,0 +1,222 @@
+"""Per-stage and end-to-end benchmarks on seeded synthetic genomes.
+
+Run ``python -m crispr_rl.benchmarks --help``. Results are JSON documents
+(see :func:`run_benchmarks`); pass one back with ``--compare`` to flag
+throughput or memory regressions against it.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from ..utils.config import Config
+from ..utils.encoding import encode_sequence
+from ..features.pam_scanner import PAMScanner
+from ..features.extractor import FeatureExtractor
+from ..scoring.scorer import GuideScorer
+from ..rl.optimizer import RLOptimizer
+from ..rl.reranker import ParetoReranker
+from ..pipeline import DesignPipeline
+from .synthetic import synthetic_sequence, parse_size, format_size
+
+DEFAULT_SIZES = ('1k', '10k', '100k', '1M', '10M', '100M')
+STAGES = ('scan', 'find_pam_sites', 'extract', 'score', 'optimize', 'rerank', 'pipeline')
+# Stages that build one dict per site run on at most this many sites
+DEFAULT_MAX_RECORDS = 200_000
+# From this length on, every stage is timed once instead of ``repeat`` times
+SINGLE_RUN_SIZE = 10 ** 7
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'baseline.json')
+
+
+def _measure(func: Callable[[], Any], repeat: int, memory: bool) -> Tuple[float, Optional[int]]:
+    """Best wall time over ``repeat`` runs, plus peak traced allocation of one extra run."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def _environment(config: Config, seed: int) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': seed,
+        'pam_sequence': config.pam_sequence,
+        'guide_length': config.guide_length,
+    }
+
+
+def run_benchmarks(sizes: Sequence[int], seed: int = 0, repeat: int = 3, memory: bool = True,
+                   max_records: int = DEFAULT_MAX_RECORDS, stages: Sequence[str] = STAGES,
+                   config: Config = None, log: Callable[[str], None] = None) -> Dict[str, Any]:
+    """Benchmark ``stages`` on a synthetic genome of each length in ``sizes``.
+
+    Returns ``{"environment": {...}, "results": [...]}`` with one result per
+    stage and size: sites processed, best time, sites per second and peak
+    traced memory in bytes (``None`` when ``memory`` is off). Results with
+    ``truncated`` set ran on the first ``max_records`` sites only.
+    """
+    config = config or Config()
+    scanner = PAMScanner(config)
+    extractor = FeatureExtractor()
+    scorer = GuideScorer(config)
+    optimizer = RLOptimizer(config, scorer)
+    reranker = ParetoReranker()
+    pipeline = DesignPipeline(config, scanner, extractor, scorer, optimizer, reranker)
+    results: List[Dict[str, Any]] = []
+
+    for size in sizes:
+        sequence = synthetic_sequence(size, seed)
+        codes = encode_sequence(sequence)
+        sites = scanner.scan(codes)
+        features = extractor.extract_sites(codes, sites)
+        total = len(sites)
+        capped = min(total, max_records)
+        guides: List[Dict[str, Any]] = []
+        if {'optimize', 'rerank'} & set(stages):
+            columns = {'pam_start': sites.pam_starts[:capped], 'guide_start': sites.guide_starts[:capped],
+                       'strand': sites.strands[:capped], 'guide_codes': sites[:capped].guide_codes(codes),
+                       'pam_codes': sites[:capped].pam_codes(codes),
+                       **{key: values[:capped] for key, values in features.items()}}
+            guides = pipeline.guide_records(pipeline.score_columns(columns), 'bench')
+        # Dict-building scan runs on a prefix holding about max_records sites
+        prefix = sequence if capped == total else sequence[:int(size * capped / total)]
+
+        cases = {
+            'scan': (total, lambda: scanner.scan(codes)),
+            'find_pam_sites': (capped, lambda: scanner.find_pam_sites(prefix)),
+            'extract': (total, lambda: extractor.extract_sites(codes, sites)),
+            'score': (total, lambda: scorer.score_batch(features)),
+            'optimize': (capped, lambda: optimizer.optimize_guides(guides, top_k=20)),
+            'rerank': (capped, lambda: reranker.rerank(guides, top_k=10)),
+            'pipeline': (total, lambda: pipeline.design(sequence, 'bench')),
+        }
+        runs = repeat if size < SINGLE_RUN_SIZE else 1
+        for stage in stages:
+            count, func = cases[stage]
+            seconds, peak = _measure(func, runs, memory)
+            result = {
+                'stage': stage,
+                'size': size,
+                'sites': count,
+                'seconds': seconds,
+                'sites_per_sec': count / seconds if seconds > 0 else None,
+                'peak_bytes': peak,
+                'truncated': count < total,
+            }
+            results.append(result)
+            if log:
+                log(_format_row(result))
+        del sequence, codes, sites, features, guides
+
+    return {'environment': _environment(config, seed), 'results': results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25,
+            min_memory_delta: int = 1 << 20, min_time_delta: float = 1e-3) -> List[str]:
+    """Describe every stage/size whose throughput fell, or whose peak memory grew, beyond ``tolerance``.
+
+    Slowdowns under ``min_time_delta`` seconds and growth under
+    ``min_memory_delta`` bytes are timer and allocator noise, not regressions.
+    """
+    reference = {(r['stage'], r['size']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in current.get('results', []):
+        base = reference.get((result['stage'], result['size']))
+        if base is None:
+            continue
+        label = f"{result['stage']} @ {format_size(result['size'])}"
+        if base['sites_per_sec'] and result['sites_per_sec'] is not None:
+            slowdown = result['seconds'] - base['seconds']
+            if slowdown > min_time_delta and result['sites_per_sec'] < base['sites_per_sec'] * (1 - tolerance):
+                regressions.append(f"{label}: {result['sites_per_sec']:.3g} sites/s "
+                                   f"vs {base['sites_per_sec']:.3g} baseline")
+        if base['peak_bytes'] is not None and result['peak_bytes'] is not None:
+            growth = result['peak_bytes'] - base['peak_bytes']
+            if growth > min_memory_delta and result['peak_bytes'] > base['peak_bytes'] * (1 + tolerance):
+                regressions.append(f"{label}: peak {result['peak_bytes'] / 2 ** 20:.1f} MiB "
+                                   f"vs {base['peak_bytes'] / 2 ** 20:.1f} MiB baseline")
+    return regressions
+
+
+def _format_row(result: Dict[str, Any]) -> str:
+    peak = f"{result['peak_bytes'] / 2 ** 20:9.1f}" if result['peak_bytes'] is not None else f"{'-':>9}"
+    rate = f"{result['sites_per_sec']:12.4g}" if result['sites_per_sec'] else f"{'-':>12}"
+    flag = '*' if result['truncated'] else ''
+    return (f"{result['stage']:<15} {format_size(result['size']):>6} {result['sites']:>10}{flag:1} "
+            f"{result['seconds']:10.4f} {rate} {peak}")
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the CRISPR design pipeline on synthetic genomes")
+    parser.add_argument("--sizes", default=','.join(DEFAULT_SIZES), help="Comma-separated lengths, e.g. 1k,1M,100M")
+    parser.add_argument("--stages", default=','.join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic genome seed")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best is kept)")
+    parser.add_argument("--max_records", type=int, default=DEFAULT_MAX_RECORDS,
+                        help="Site cap for stages that build one dict per site")
+    parser.add_argument("--no_memory", action="store_true", help="Skip the peak-memory pass")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    parser.add_argument("--compare", nargs='?', const=DEFAULT_BASELINE, default=None,
+                        help="Baseline JSON to compare against (default: the stored baseline)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown / memory growth")
+    args = parser.parse_args(argv)
+
+    stages = [stage for stage in args.stages.split(',') if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size]
+
+    print(f"{'stage':<15} {'size':>6} {'sites':>10}  {'seconds':>10} {'sites/s':>12} {'peak MiB':>9}")
+    report = run_benchmarks(sizes, args.seed, args.repeat, not args.no_memory, args.max_records, stages,
+                            log=print)
+    if any(r['truncated'] for r in report['results']):
+        print(f"* ran on the first {args.max_records} sites")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regression(s) against {args.compare} "
+              f"({baseline['environment'].get('commit') or 'unknown commit'})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""Seeded synthetic genomes for benchmarks."""
+
+import numpy as np
+
+# Generation block size; keeps temporaries small for 100 Mb sequences
+_BLOCK = 1 << 22
+
+
+def parse_size(text: str) -> int:
+    """Parse a length such as ``1500``, ``10k``, ``2.5M`` or ``1G``."""
+    text = text.strip().lower().rstrip('b')
+    scale = {'k': 10 ** 3, 'm': 10 ** 6, 'g': 10 ** 9}.get(text[-1:], 1)
+    number = text[:-1] if scale > 1 else text
+    return int(float(number) * scale)
+
+
+def format_size(length: int) -> str:
+    """Inverse of :func:`parse_size` for round lengths (``1000000`` -> ``1M``)."""
+    for suffix, scale in (('G', 10 ** 9), ('M', 10 ** 6), ('k', 10 ** 3)):
+        if length >= scale and length % scale == 0:
+            return f"{length // scale}{suffix}"
+    return str(length)
+
+
+def synthetic_sequence(length: int, seed: int = 0, gc_content: float = 0.41) -> str:
+    """Random upper-case DNA with the given GC fraction; identical for identical arguments.
+
+    The default GC fraction matches the human genome average.
+    """
+    rng = np.random.default_rng(seed)
+    p_gc, p_at = gc_content / 2, (1 - gc_content) / 2
+    alphabet = np.frombuffer(b'ACGT', dtype=np.uint8)
+    blocks = []
+    for start in range(0, length, _BLOCK):
+        size = min(_BLOCK, length - start)
+        blocks.append(alphabet[rng.choice(4, size=size, p=[p_at, p_gc, p_gc, p_at])].tobytes())
+    return b''.join(blocks).decode('ascii')
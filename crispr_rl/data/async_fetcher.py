@@ -0,0 +1,117 @@
+"""Non-blocking sequence fetching with caching and request coalescing."""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Union
+from ..utils.cache import LRUCache
+from ..utils.config import Config
+from .fetchers import SequenceFetcher
+from .genome_store import SequenceWindow
+
+
+class AsyncSequenceFetcher:
+    """Async front end for :class:`SequenceFetcher`.
+
+    Blocking fetches run on a bounded thread pool sharing the fetcher's pooled
+    HTTP session, so they never stall the event loop. Results are kept in an
+    LRU+TTL cache bounded by ``config.sequence_cache_bytes`` bases (remote
+    fetches are optionally persisted to ``config.sequence_cache_dir``), and
+    concurrent requests for the same ID share a single upstream fetch.
+    """
+
+    def __init__(self, config: Config, fetcher: Optional[SequenceFetcher] = None):
+        self.config = config
+        self.fetcher = fetcher or SequenceFetcher(config)
+        self.cache = LRUCache(max_entries=config.sequence_cache_size, ttl=config.sequence_cache_ttl,
+                              max_bytes=config.sequence_cache_bytes, sizeof=len)
+        self.cache_dir = config.sequence_cache_dir
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=config.fetch_pool_size, thread_name_prefix="fetch")
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _disk_path(self, gene_id: str) -> str:
+        digest = hashlib.sha1(gene_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.fa")
+
+    def _read_disk(self, gene_id: str) -> Optional[str]:
+        """Load a persisted sequence if present and younger than the TTL."""
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(gene_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.config.sequence_cache_ttl:
+                return None
+            with open(path, 'r') as f:
+                header, _, sequence = f.read().partition('\n')
+        except OSError:
+            return None
+        return sequence if header == f">{gene_id}" and sequence else None
+
+    def _write_disk(self, gene_id: str, sequence: str):
+        """Persist a sequence atomically (write to a temp file, then rename)."""
+        if not self.cache_dir:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(f">{gene_id}\n{sequence}")
+            os.replace(tmp_path, self._disk_path(gene_id))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _fetch_blocking(self, gene_id: str) -> Optional[str]:
+        """Local genome store, disk lookup, then upstream fetch; runs on the executor."""
+        sequence = self.fetcher.fetch_local_sequence(gene_id)
+        if sequence:
+            return sequence  # Already a local file; never copied into the disk cache
+        sequence = self._read_disk(gene_id)
+        if sequence:
+            return sequence
+        sequence = self.fetcher.fetch_sequence(gene_id)
+        if sequence:
+            self._write_disk(gene_id, sequence)
+        return sequence
+
+    async def fetch_sequence(self, gene_id: str) -> Optional[str]:
+        """Fetch a sequence without blocking the event loop."""
+        sequence = self.cache.get(gene_id)
+        if sequence is not None:
+            return sequence
+        future = self._inflight.get(gene_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self._fetch_blocking, gene_id)
+            self._inflight[gene_id] = future
+            future.add_done_callback(lambda f: self._finish(gene_id, f))
+        return await asyncio.shield(future)
+
+    async def fetch_region(self, gene_id: str, start: int = 0, end: Optional[int] = None,
+                           flank: int = 0) -> Optional[Union[str, SequenceWindow]]:
+        """A region of a sequence: just a :class:`SequenceWindow` of it for local contigs, else the whole sequence.
+
+        Local windows are read straight from the memory-mapped reference and
+        are not cached.
+        """
+        if start or end is not None:
+            loop = asyncio.get_running_loop()
+            window = await loop.run_in_executor(self.executor, self.fetcher.fetch_window, gene_id, start, end, flank)
+            if window is not None:
+                return window
+        return await self.fetch_sequence(gene_id)
+
+    def _finish(self, gene_id: str, future: asyncio.Future):
+        """Publish a completed fetch to the cache and release the in-flight slot."""
+        self._inflight.pop(gene_id, None)
+        if not future.cancelled() and future.exception() is None and future.result():
+            self.cache.put(gene_id, future.result())
+
+    def close(self):
+        """Shut down the worker pool and HTTP session."""
+        self.executor.shutdown(wait=False)
+        self.fetcher.session.close()
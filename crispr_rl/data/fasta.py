@@ -0,0 +1,93 @@
+"""Minimal FASTA reading utilities for local reference files."""
+
+import gzip
+from typing import Iterator, Tuple, List, NamedTuple
+
+
+def _open(path: str):
+    """Open plain or gzip-compressed FASTA in binary mode."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def iter_fasta(path: str) -> Iterator[Tuple[str, bytes]]:
+    """Yield ``(name, sequence)`` records; the name is the header up to the first space."""
+    name = None
+    chunks = []
+    with _open(path) as handle:
+        for line in handle:
+            line = line.rstrip(b'\r\n')
+            if line.startswith(b'>'):
+                if name is not None:
+                    yield name, b''.join(chunks)
+                name = line[1:].split(None, 1)[0].decode('ascii') if line[1:].strip() else ''
+                chunks = []
+            elif line:
+                chunks.append(line)
+    if name is not None:
+        yield name, b''.join(chunks)
+
+
+class FaidxEntry(NamedTuple):
+    """One record of a samtools-style ``.fai`` index."""
+    name: str
+    length: int
+    offset: int
+    line_bases: int
+    line_width: int
+
+
+def build_faidx(path: str) -> List[FaidxEntry]:
+    """Index an uncompressed FASTA whose records use a fixed line width."""
+    if path.endswith('.gz'):
+        raise ValueError("Cannot index a compressed FASTA; decompress it first")
+    entries = []
+    name = None
+    position = 0
+
+    def finish():
+        if name is not None:
+            entries.append(FaidxEntry(name, length, offset, line_bases or length, line_width or length))
+
+    with open(path, 'rb') as handle:
+        for line in handle:
+            if line.startswith(b'>'):
+                finish()
+                name = line[1:].split(None, 1)[0].decode('ascii') if line[1:].strip() else ''
+                offset = position + len(line)
+                length = line_bases = line_width = 0
+                short_line_seen = False
+            elif name is not None:
+                bases = len(line.rstrip(b'\r\n'))
+                if bases:
+                    if short_line_seen or (line_bases and bases > line_bases):
+                        raise ValueError(f"Record {name!r} in {path} has inconsistent line lengths")
+                    if not line_bases:
+                        line_bases, line_width = bases, len(line)
+                    elif bases < line_bases:
+                        short_line_seen = True
+                    length += bases
+                else:
+                    short_line_seen = True
+            position += len(line)
+    finish()
+    return entries
+
+
+def write_faidx(entries: List[FaidxEntry], path: str):
+    """Write entries in ``.fai`` format."""
+    with open(path, 'w') as f:
+        for e in entries:
+            f.write(f"{e.name}\t{e.length}\t{e.offset}\t{e.line_bases}\t{e.line_width}\n")
+
+
+def read_faidx(path: str) -> List[FaidxEntry]:
+    """Read a ``.fai`` index."""
+    entries = []
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) >= 5:
+                entries.append(FaidxEntry(fields[0], *(int(x) for x in fields[1:5])))
+    return entries
@@ -1,21 +1,52 @@
 """Gene sequence fetchers from various databases."""
 
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional
 from ..utils.config import Config
+from ..utils.tracing import traced
+from .genome_store import LocalGenomeStore, SequenceWindow, parse_region
 
 
 class SequenceFetcher:
-    """Fetches gene sequences from external APIs."""
+    """Fetches gene sequences from local references and external APIs."""
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, genome_store: Optional[LocalGenomeStore] = None):
         self.config = config
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=config.fetch_pool_size, pool_maxsize=config.fetch_pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.genome_store = genome_store
+        if self.genome_store is None and config.genome_fasta:
+            self.genome_store = LocalGenomeStore(config.genome_fasta)
 
+    @traced("fetch.local")
+    def fetch_local_sequence(self, gene_id: str) -> Optional[str]:
+        """Fetch a contig or ``contig:start-end`` region from the local genome store."""
+        if self.genome_store is None:
+            return None
+        region = parse_region(gene_id)
+        if region and region[0] in self.genome_store:
+            return self.genome_store.fetch_region(*region)
+        if gene_id in self.genome_store:
+            return self.genome_store.fetch_region(gene_id)
+        return None
+
+    @traced("fetch.local")
+    def fetch_window(self, gene_id: str, start: int = 0, end: Optional[int] = None,
+                     flank: int = 0) -> Optional[SequenceWindow]:
+        """Only ``[start, end)`` (plus ``flank``) of a local contig, or ``None`` if it is not one."""
+        if self.genome_store is None or gene_id not in self.genome_store:
+            return None
+        return self.genome_store.fetch_window(gene_id, start, end, flank)
+
+    @traced("fetch.uniprot")
     def fetch_uniprot_sequence(self, gene_id: str) -> Optional[str]:
         """Fetch FASTA sequence from UniProt."""
-        url = f"https://www.uniprot.org/uniprot/{gene_id}.fasta"
+        url = f"{self.config.uniprot_url}/{gene_id}.fasta"
         try:
-            response = requests.get(url)
+            response = self.session.get(url, timeout=self.config.fetch_timeout)
             if response.status_code == 200:
                 lines = response.text.strip().split('\n')
                 return ''.join(lines[1:])  # Skip header
@@ -28,8 +59,12 @@ class SequenceFetcher:
         # Implement NCBI API call if needed
         return None
 
+    @traced("fetch")
     def fetch_sequence(self, gene_id: str) -> Optional[str]:
-        """Fetch sequence, trying UniProt first."""
+        """Fetch sequence, trying the local genome store, then UniProt."""
+        seq = self.fetch_local_sequence(gene_id)
+        if seq:
+            return seq
         seq = self.fetch_uniprot_sequence(gene_id)
         if seq:
             return seq
@@ -0,0 +1,140 @@
+"""Memory-mapped access to local reference assemblies."""
+
+import mmap
+import os
+import re
+from typing import Dict, Optional, Tuple
+import numpy as np
+from ..utils.encoding import encode_sequence
+from .fasta import FaidxEntry, build_faidx, read_faidx, write_faidx
+
+_REGION_RE = re.compile(r'^(?P<contig>[^:]+):(?P<start>[\d,]+)-(?P<end>[\d,]+)$')
+
+
+def parse_region(spec: str) -> Optional[Tuple[str, int, int]]:
+    """Parse a samtools-style ``contig:start-end`` (1-based, inclusive) region.
+
+    Returns 0-based half-open ``(contig, start, end)`` or None if ``spec`` is not a region.
+    """
+    match = _REGION_RE.match(spec.strip())
+    if not match:
+        return None
+    start = int(match.group('start').replace(',', ''))
+    end = int(match.group('end').replace(',', ''))
+    return match.group('contig'), max(start - 1, 0), end
+
+
+class SequenceWindow:
+    """Bases ``[offset, offset + len(bases))`` of a longer sequence, addressed in its coordinates.
+
+    ``len()`` is the full sequence length and slices take full-sequence
+    coordinates, so a window can stand in for the whole sequence wherever
+    only the bases it covers are read. Slicing outside it raises
+    ``IndexError``.
+    """
+
+    def __init__(self, bases: str, offset: int, length: int):
+        self.bases = bases
+        self.offset = offset
+        self.length = length
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.bases)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __bool__(self) -> bool:
+        return bool(self.bases)
+
+    def __getitem__(self, key: slice) -> str:
+        start, stop, step = key.indices(self.length)
+        if step != 1 or start < self.offset or (stop > self.end and stop > start):
+            raise IndexError(f"[{start}, {stop}) is outside the window [{self.offset}, {self.end})")
+        return self.bases[start - self.offset:stop - self.offset]
+
+
+class LocalGenomeStore:
+    """Serves region reads from a FASTA file via mmap and a ``.fai`` index.
+
+    Only the bytes covering a requested region are touched; records are never
+    loaded whole. The index is read from ``<fasta>.fai`` and built (and written
+    next to the FASTA when possible) if it is missing.
+    """
+
+    def __init__(self, fasta_path: str):
+        self.fasta_path = fasta_path
+        self.index: Dict[str, FaidxEntry] = {e.name: e for e in self._load_index(fasta_path)}
+        self._file = open(fasta_path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    @staticmethod
+    def _load_index(fasta_path: str):
+        fai_path = fasta_path + '.fai'
+        if os.path.exists(fai_path) and os.path.getmtime(fai_path) >= os.path.getmtime(fasta_path):
+            return read_faidx(fai_path)
+        entries = build_faidx(fasta_path)
+        try:
+            write_faidx(entries, fai_path)
+        except OSError:
+            pass  # Read-only reference directory; keep the index in memory
+        return entries
+
+    def close(self):
+        """Release the mapping and file handle."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __contains__(self, contig: str) -> bool:
+        return contig in self.index
+
+    def contig_length(self, contig: str) -> int:
+        """Length of a contig in bases."""
+        return self.index[contig].length
+
+    def region_bytes(self, contig: str, start: int = 0, end: int = None) -> np.ndarray:
+        """Raw ASCII bases of ``[start, end)`` as a uint8 array.
+
+        Regions inside a single FASTA line are returned as a zero-copy view of
+        the mapping; longer regions are compacted into one region-sized copy.
+        """
+        entry = self.index[contig]
+        if end is None or end > entry.length:
+            end = entry.length
+        start = max(start, 0)
+        if start >= end:
+            return np.empty(0, dtype=np.uint8)
+        bases, width = entry.line_bases, entry.line_width
+        first_line, first_col = divmod(start, bases)
+        last_line, last_col = divmod(end - 1, bases)
+        byte_start = entry.offset + first_line * width + first_col
+        if first_line == last_line:
+            return np.frombuffer(self._mmap, dtype=np.uint8, count=end - start, offset=byte_start)
+
+        head = np.frombuffer(self._mmap, dtype=np.uint8, count=bases - first_col, offset=byte_start)
+        full_lines = last_line - first_line - 1
+        body_offset = entry.offset + (first_line + 1) * width
+        body = np.frombuffer(self._mmap, dtype=np.uint8, count=full_lines * width,
+                             offset=body_offset).reshape(full_lines, width)[:, :bases]
+        tail = np.frombuffer(self._mmap, dtype=np.uint8, count=last_col + 1,
+                             offset=body_offset + full_lines * width)
+        return np.concatenate([head, body.ravel(), tail])
+
+    def fetch_region(self, contig: str, start: int = 0, end: int = None) -> str:
+        """Bases of ``[start, end)`` as an upper-case string."""
+        return self.region_bytes(contig, start, end).tobytes().decode('ascii').upper()
+
+    def fetch_region_codes(self, contig: str, start: int = 0, end: int = None) -> np.ndarray:
+        """Encoded bases of ``[start, end)`` (see :mod:`crispr_rl.utils.encoding`)."""
+        return encode_sequence(self.region_bytes(contig, start, end))
+
+    def fetch_window(self, contig: str, start: int = 0, end: int = None, flank: int = 0) -> SequenceWindow:
+        """``[start, end)`` plus ``flank`` bases either side, as a :class:`SequenceWindow` of the contig."""
+        length = self.contig_length(contig)
+        lo = max(start - flank, 0)
+        hi = length if end is None else min(end + flank, length)
+        return SequenceWindow(self.fetch_region(contig, lo, hi), lo, length)
@@ -0,0 +1,264 @@
+"""On-disk seed k-mer index for genome-wide off-target enumeration."""
+
+import json
+import os
+from typing import List, Dict, Any, Optional, Tuple, Union, Sequence
+import numpy as np
+from ..utils.config import Config
+from ..utils.encoding import encode_sequence, pack_kmers, count_mismatches, UNKNOWN
+from ..features.pam_scanner import PAMScanner
+from ..scoring.specificity import SpecificityModel
+from ..utils.tracing import traced
+from .fasta import iter_fasta
+
+METADATA_FILE = "index.json"
+FORMAT_VERSION = 1
+# Seed candidates gathered and verified at once; bounds search memory on genome-scale indexes
+MAX_CANDIDATES = 1 << 21
+
+
+def _segments(guide_length: int, max_mismatches: int) -> List[Tuple[int, int]]:
+    """Split a guide into ``max_mismatches + 1`` seeds as ``(offset, length)`` pairs.
+
+    By the pigeonhole principle any site within ``max_mismatches`` mismatches
+    of a guide matches it exactly on at least one seed.
+    """
+    count = max_mismatches + 1
+    bounds = np.linspace(0, guide_length, count + 1).round().astype(int)
+    return [(int(a), int(b - a)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def _seed_keys(packed: np.ndarray, guide_length: int, offset: int, length: int) -> np.ndarray:
+    """Extract the seed at ``offset`` from packed protospacers as integer keys."""
+    shift = np.uint64(2 * (guide_length - offset - length))
+    mask = np.uint64((1 << (2 * length)) - 1)
+    return ((packed >> shift) & mask).astype(np.uint32)
+
+
+class OffTargetIndex:
+    """Memory-mapped index of every PAM-adjacent protospacer in a reference.
+
+    The index stores each protospacer 2-bit packed into a uint64 together with
+    its contig, PAM start and strand, plus one sorted seed table per pigeonhole
+    segment. Queries look up candidate sites by exact seed match and verify
+    them with XOR/popcount mismatch counting.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, METADATA_FILE), 'r') as f:
+            self.metadata: Dict[str, Any] = json.load(f)
+        if self.metadata.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported off-target index format in {index_dir}")
+        self.contigs: List[str] = self.metadata['contigs']
+        self.guide_length: int = self.metadata['guide_length']
+        self.pam_sequence: str = self.metadata['pam_sequence']
+        self.max_mismatches: int = self.metadata['max_mismatches']
+        self.segments = [tuple(s) for s in self.metadata['segments']]
+        self.protospacers = self._load('protospacers')
+        self.contig_ids = self._load('contig_ids')
+        self.positions = self._load('positions')
+        self.strands = self._load('strands')
+        self.seed_keys = [self._load(f'seed{i}_keys') for i in range(len(self.segments))]
+        self.seed_sites = [self._load(f'seed{i}_sites') for i in range(len(self.segments))]
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.index_dir, f"{name}.npy"), mmap_mode='r')
+
+    @classmethod
+    def load(cls, index_dir: str) -> 'OffTargetIndex':
+        """Open an existing index (arrays are memory-mapped, not read)."""
+        return cls(index_dir)
+
+    @classmethod
+    def build(cls, fasta_path: str, index_dir: str, config: Config,
+              max_mismatches: int = None) -> 'OffTargetIndex':
+        """Scan a FASTA reference for PAM sites and write the index to ``index_dir``."""
+        if max_mismatches is None:
+            max_mismatches = config.offtarget_max_mismatches
+        guide_length = config.guide_length
+        scanner = PAMScanner(config)
+        os.makedirs(index_dir, exist_ok=True)
+
+        contigs, packed, contig_ids, positions, strands = [], [], [], [], []
+        for contig_id, (name, sequence) in enumerate(iter_fasta(fasta_path)):
+            contigs.append(name)
+            codes = encode_sequence(sequence)
+            sites = scanner.scan(codes)
+            guides = sites.guide_codes(codes)
+            valid = ~(guides == UNKNOWN).any(axis=1)
+            packed.append(pack_kmers(guides[valid]))
+            positions.append(sites.pam_starts[valid])
+            strands.append(sites.strands[valid])
+            contig_ids.append(np.full(int(valid.sum()), contig_id, dtype=np.uint32))
+
+        arrays = {
+            'protospacers': np.concatenate(packed) if packed else np.empty(0, dtype=np.uint64),
+            'contig_ids': np.concatenate(contig_ids) if contig_ids else np.empty(0, dtype=np.uint32),
+            'positions': np.concatenate(positions) if positions else np.empty(0, dtype=np.int64),
+            'strands': np.concatenate(strands) if strands else np.empty(0, dtype=np.int8),
+        }
+        segments = _segments(guide_length, max_mismatches)
+        site_dtype = np.uint32 if len(arrays['protospacers']) < 2 ** 32 else np.int64
+        for i, (offset, length) in enumerate(segments):
+            keys = _seed_keys(arrays['protospacers'], guide_length, offset, length)
+            order = np.argsort(keys, kind='stable')
+            arrays[f'seed{i}_keys'] = keys[order]
+            arrays[f'seed{i}_sites'] = order.astype(site_dtype)
+
+        for name, array in arrays.items():
+            np.save(os.path.join(index_dir, f"{name}.npy"), array)
+        metadata = {
+            'format_version': FORMAT_VERSION,
+            'source': os.path.abspath(fasta_path),
+            'contigs': contigs,
+            'pam_sequence': config.pam_sequence,
+            'guide_length': guide_length,
+            'max_mismatches': max_mismatches,
+            'segments': segments,
+            'num_sites': int(len(arrays['protospacers'])),
+        }
+        with open(os.path.join(index_dir, METADATA_FILE), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        return cls(index_dir)
+
+    def __len__(self) -> int:
+        return len(self.protospacers)
+
+    def _pack_guides(self, guides: Union[Sequence[str], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Pack guides, returning packed values and a validity mask."""
+        if isinstance(guides, np.ndarray) and guides.ndim == 2:
+            codes = guides
+        else:
+            codes = np.array([encode_sequence(g) for g in guides], dtype=np.uint8).reshape(-1, self.guide_length)
+        if codes.shape[1] != self.guide_length:
+            raise ValueError(f"Index was built for {self.guide_length}-nt guides, got {codes.shape[1]}")
+        valid = ~(codes == UNKNOWN).any(axis=1)
+        return pack_kmers(np.where(valid[:, None], codes, 0)), valid
+
+    def search_pairs(self, guides: Union[Sequence[str], np.ndarray], max_mismatches: int = None,
+                     max_candidates: int = MAX_CANDIDATES) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Every (guide, indexed site) pair within ``max_mismatches``, for all guides at once.
+
+        Returns ``(guide_index, site_index, mismatches, packed_guides)``,
+        sorted by guide then site. Seed candidates are gathered and verified
+        in vectorized passes over blocks of guides holding at most
+        ``max_candidates`` candidates (a guide with more gets a block of its
+        own), so memory stays bounded however many guides are queried.
+        """
+        if max_mismatches is None:
+            max_mismatches = self.max_mismatches
+        if max_mismatches > self.max_mismatches:
+            raise ValueError(f"Index supports at most {self.max_mismatches} mismatches")
+        packed, valid = self._pack_guides(guides)
+
+        # Seed table range [lo, lo + count) of every guide, per segment
+        ranges = []
+        for (offset, length), keys in zip(self.segments, self.seed_keys):
+            guide_keys = _seed_keys(packed, self.guide_length, offset, length)
+            lo = np.searchsorted(keys, guide_keys, 'left')
+            ranges.append((lo, np.where(valid, np.searchsorted(keys, guide_keys, 'right') - lo, 0)))
+        cumulative = np.cumsum(sum(counts for _, counts in ranges)) if ranges else np.zeros(len(packed), np.int64)
+
+        blocks = []
+        start = 0
+        while start < len(packed):
+            base = cumulative[start - 1] if start else 0
+            stop = max(int(np.searchsorted(cumulative, base + max_candidates, 'right')), start + 1)
+            blocks.append(self._verify_block(packed, ranges, start, stop, max_mismatches))
+            start = stop
+        if not blocks:
+            blocks.append(self._verify_block(packed, ranges, 0, 0, max_mismatches))
+        guide_index, site_index, mismatches = (np.concatenate(parts) for parts in zip(*blocks))
+        return guide_index, site_index, mismatches, packed
+
+    def _verify_block(self, packed: np.ndarray, ranges: List[Tuple[np.ndarray, np.ndarray]], start: int, stop: int,
+                      max_mismatches: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Gather and verify the seed candidates of guides ``[start, stop)``."""
+        guide_parts, site_parts = [], []
+        for (lo, counts), sites in zip(ranges, self.seed_sites):
+            lo, counts = lo[start:stop], counts[start:stop]
+            # Concatenate the ranges [lo, lo + count) of every guide
+            offsets = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+            guide_parts.append(np.repeat(np.arange(start, stop), counts))
+            site_parts.append(sites[offsets + np.arange(len(offsets))].astype(np.int64))
+        # A site sharing several seeds with a guide is one candidate
+        n = max(len(self), 1)
+        pairs = np.unique(np.concatenate(guide_parts) * n + np.concatenate(site_parts))
+        guide_index, site_index = np.divmod(pairs, n)
+        mismatches = count_mismatches(self.protospacers[site_index], packed[guide_index])
+        keep = mismatches <= max_mismatches
+        return guide_index[keep], site_index[keep], mismatches[keep]
+
+    def search(self, guides: Union[Sequence[str], np.ndarray],
+               max_mismatches: int = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Find every indexed site within ``max_mismatches`` of each guide.
+
+        Returns one ``(site_indices, mismatches)`` pair per guide.
+        """
+        guide_index, site_index, mismatches, packed = self.search_pairs(guides, max_mismatches)
+        bounds = np.searchsorted(guide_index, np.arange(len(packed) + 1))
+        return [(site_index[lo:hi], mismatches[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    def count_hits(self, guides: Union[Sequence[str], np.ndarray], max_mismatches: int = None) -> np.ndarray:
+        """Hit counts per guide, one column per mismatch count ``0..max_mismatches``."""
+        if max_mismatches is None:
+            max_mismatches = self.max_mismatches
+        guide_index, _, mismatches, packed = self.search_pairs(guides, max_mismatches)
+        return self._hit_counts(guide_index, mismatches, len(packed), max_mismatches)
+
+    @staticmethod
+    def _hit_counts(guide_index: np.ndarray, mismatches: np.ndarray, n_guides: int,
+                    max_mismatches: int) -> np.ndarray:
+        width = max_mismatches + 1
+        flat = np.bincount(guide_index * width + mismatches, minlength=n_guides * width)
+        return flat.reshape(n_guides, width).astype(np.int64)
+
+    @traced("offtarget")
+    def off_target_counts(self, guides: Union[Sequence[str], np.ndarray], max_mismatches: int = None,
+                          exclude_self: bool = True) -> np.ndarray:
+        """Total off-target hits per guide, discounting the on-target perfect match."""
+        counts = self.count_hits(guides, max_mismatches)
+        total = counts.sum(axis=1)
+        if exclude_self:
+            total -= (counts[:, 0] > 0)
+        return total
+
+    @traced("offtarget")
+    def off_target_scores(self, guides: Union[Sequence[str], np.ndarray], model: Optional[SpecificityModel],
+                          max_mismatches: int = None) -> Dict[str, np.ndarray]:
+        """Off-target hit counts and, given a ``model``, position-weighted specificity from one search.
+
+        Returns ``off_target_hits`` (as :meth:`off_target_counts`) and
+        ``specificity`` (see :meth:`SpecificityModel.specificity`) columns.
+        """
+        if max_mismatches is None:
+            max_mismatches = self.max_mismatches
+        guide_index, site_index, mismatches, packed = self.search_pairs(guides, max_mismatches)
+        counts = self._hit_counts(guide_index, mismatches, len(packed), max_mismatches)
+        columns = {'off_target_hits': counts.sum(axis=1) - (counts[:, 0] > 0)}
+        if model is not None:
+            if model.guide_length != self.guide_length:
+                raise ValueError(f"Specificity model is for {model.guide_length}-nt guides, "
+                                 f"index for {self.guide_length}")
+            scores = model.hit_scores(packed[guide_index], self.protospacers[site_index])
+            columns['specificity'] = model.specificity(guide_index, scores, len(packed))
+        return columns
+
+    def describe(self, site_indices: np.ndarray, mismatches: np.ndarray = None) -> List[Dict[str, Any]]:
+        """Genomic coordinates of indexed sites."""
+        site_indices = np.asarray(site_indices, dtype=np.int64)
+        contig_ids = self.contig_ids[site_indices].tolist()
+        positions = self.positions[site_indices].tolist()
+        strands = self.strands[site_indices].tolist()
+        sites = []
+        for i, (contig_id, position, strand) in enumerate(zip(contig_ids, positions, strands)):
+            site = {
+                'contig': self.contigs[contig_id],
+                'pam_start': position,
+                'strand': '+' if strand > 0 else '-',
+            }
+            if mismatches is not None:
+                site['mismatches'] = int(mismatches[i])
+            sites.append(site)
+        return sites
@@ -2,10 +2,28 @@
 
 from typing import Dict, Any
 import math
+import numpy as np
+from ..utils.encoding import UNKNOWN, encode_sequence
+from ..utils.tracing import traced
+from .thermo import NearestNeighborModel
+
+# PAM-proximal bases whose hybrid stability is reported as ``seed_stability``
+SEED_LENGTH = 10
 
 
 class FeatureExtractor:
-    """Extracts features from guide sequences."""
+    """Extracts features from guide sequences.
+
+    Stability features come from a nearest-neighbour model of the guide
+    RNA:target DNA hybrid: ``thermodynamic`` is -dG at 37 C in kcal/mol
+    (higher is more stable), ``tm`` the melting temperature, and
+    ``seed_stability`` -dG of the ``seed_length`` PAM-proximal bases.
+    ``self_fold`` counts the base pairs of the guide's longest hairpin stem.
+    """
+
+    def __init__(self, thermo: NearestNeighborModel = None, seed_length: int = SEED_LENGTH):
+        self.thermo = thermo or NearestNeighborModel()
+        self.seed_length = seed_length
 
     @staticmethod
     def calculate_gc_content(sequence: str) -> float:
@@ -15,13 +33,15 @@ class FeatureExtractor:
         gc_count = sequence.count('G') + sequence.count('C')
         return (gc_count / len(sequence)) * 100
 
-    @staticmethod
-    def thermodynamic_stability(sequence: str) -> float:
-        """Simple thermodynamic proxy (placeholder)."""
-        # Placeholder: count AT vs GC pairs
-        at_count = sequence.count('A') + sequence.count('T')
-        gc_count = sequence.count('G') + sequence.count('C')
-        return gc_count - at_count  # Higher GC more stable
+    def thermodynamic_stability(self, sequence: str) -> float:
+        """Hybrid stability -dG (kcal/mol) of a guide; higher is more stable."""
+        dh, ds = self.thermo.sequence_terms(sequence)
+        return -float(self.thermo.delta_g(dh, ds, len(sequence)))
+
+    def melting_temperature(self, sequence: str) -> float:
+        """Hybrid melting temperature (degrees C) of a guide."""
+        dh, ds = self.thermo.sequence_terms(sequence)
+        return float(self.thermo.melting_temperature(dh, ds, len(sequence)))
 
     @staticmethod
     def contextual_weight(position: int, sequence_length: int) -> float:
@@ -31,12 +51,77 @@ class FeatureExtractor:
         distance = abs(position - center)
         return 1 / (1 + distance / 10)
 
-    def extract_features(self, guide_seq: str, pam_seq: str, locus: int, seq_len: int) -> Dict[str, Any]:
+    def extract_features(self, guide_seq: str, pam_seq: str, locus: int, seq_len: int,
+                         pam_side: str = '3prime') -> Dict[str, Any]:
         """Extract all features for a guide."""
+        seed_len = min(self.seed_length, len(guide_seq))
+        seed = guide_seq[len(guide_seq) - seed_len:] if pam_side == '3prime' else guide_seq[:seed_len]
         return {
             'gc_content': self.calculate_gc_content(guide_seq),
             'thermodynamic': self.thermodynamic_stability(guide_seq),
+            'tm': self.melting_temperature(guide_seq),
+            'seed_stability': self.thermodynamic_stability(seed),
+            'self_fold': int(self.thermo.hairpin_stems(encode_sequence(guide_seq)[None, :])[0]),
             'context_weight': self.contextual_weight(locus, seq_len),
             'guide_length': len(guide_seq),
             'pam_gc': self.calculate_gc_content(pam_seq),
-        }
\ No newline at end of file
+        }
+
+    def prefix_sums(self, codes: np.ndarray) -> Dict[str, np.ndarray]:
+        """Cumulative GC and AT counts (length n + 1) and nearest-neighbour stack sums of an encoded sequence."""
+        gc = np.zeros(len(codes) + 1, dtype=np.int32)
+        at = np.zeros(len(codes) + 1, dtype=np.int32)
+        is_gc = (codes == 1) | (codes == 2)
+        np.cumsum(is_gc, out=gc[1:])
+        np.cumsum(~is_gc & (codes != UNKNOWN), out=at[1:])
+        return {'gc': gc, 'at': at, **self.thermo.prefix_sums(codes)}
+
+    @traced("extract")
+    def extract_batch(self, codes: np.ndarray, guide_starts: np.ndarray, pam_starts: np.ndarray,
+                      guide_length: int, pam_length: int, seq_len: int = None,
+                      prefix: Dict[str, np.ndarray] = None, offset: int = 0,
+                      strands: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Extract features for many guides at once as NumPy columns.
+
+        Window counts and stacking energies come from prefix sums built once
+        per sequence (pass ``prefix`` to reuse them), so the cost is
+        O(sequence + guides); only the hairpin proxy looks at each guide's
+        bases. Columns match the keys of :meth:`extract_features`.
+        ``strands`` marks reverse-strand guides (-1), whose stability is that
+        of the reverse complement. The seed is the end of the guide next to
+        its PAM. When ``codes`` is a window of a longer sequence, ``offset``
+        is the window start and ``seq_len`` the full length, so positional
+        features stay absolute.
+        """
+        if prefix is None:
+            prefix = self.prefix_sums(codes)
+        if seq_len is None:
+            seq_len = len(codes)
+        gc = prefix['gc']
+        guide_starts = np.asarray(guide_starts, dtype=np.int64)
+        pam_starts = np.asarray(pam_starts, dtype=np.int64)
+        guide_gc = gc[guide_starts + guide_length] - gc[guide_starts]
+        pam_gc = gc[pam_starts + pam_length] - gc[pam_starts]
+        center = seq_len / 2 - offset
+
+        dh, ds = self.thermo.window_terms(prefix, guide_starts, guide_length, strands)
+        seed_length = min(self.seed_length, guide_length)
+        seed_starts = np.where(pam_starts > guide_starts, guide_starts + guide_length - seed_length, guide_starts)
+        seed_dh, seed_ds = self.thermo.window_terms(prefix, seed_starts, seed_length, strands)
+        windows = codes[guide_starts[:, None] + np.arange(guide_length)]
+        return {
+            'gc_content': guide_gc * (100 / guide_length) if guide_length else np.zeros(len(guide_starts)),
+            'thermodynamic': -self.thermo.delta_g(dh, ds, guide_length),
+            'tm': self.thermo.melting_temperature(dh, ds, guide_length),
+            'seed_stability': -self.thermo.delta_g(seed_dh, seed_ds, seed_length),
+            'self_fold': self.thermo.hairpin_stems(windows),
+            'context_weight': 1 / (1 + np.abs(pam_starts - center) / 10),
+            'guide_length': np.full(len(guide_starts), guide_length, dtype=np.int64),
+            'pam_gc': pam_gc * (100 / pam_length) if pam_length else np.zeros(len(pam_starts)),
+        }
+
+    def extract_sites(self, codes: np.ndarray, sites, seq_len: int = None,
+                      prefix: Dict[str, np.ndarray] = None, offset: int = 0) -> Dict[str, np.ndarray]:
+        """Batch features for a :class:`PAMSites` scan result."""
+        return self.extract_batch(codes, sites.guide_starts, sites.pam_starts,
+                                  sites.guide_length, sites.pam_length, seq_len, prefix, offset, sites.strands)
\ No newline at end of file
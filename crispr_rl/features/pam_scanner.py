@@ -1,41 +1,247 @@
 """PAM site detection and guide extraction."""
 
-import re
-from typing import List, Dict, Tuple
+from typing import Any, List, Dict, Optional, Sequence, Tuple, Union
+import numpy as np
 from ..utils.config import Config
+from ..utils.tracing import traced
+from ..utils.encoding import (
+    encode_sequence, decode_sequence, reverse_complement_codes,
+    reverse_complement_iupac, code_bits, iupac_masks, UNKNOWN,
+)
+
+# Positions scanned per block; bounds the temporaries on chromosome-scale input
+DEFAULT_CHUNK_SIZE = 1 << 22
+PAM_SIDES = ('3prime', '5prime')
+
+
+class NucleaseProfile:
+    """PAM (IUPAC), the side of the protospacer it sits on, and the guide length of one nuclease."""
+
+    def __init__(self, name: str, pam: str, pam_side: str = '3prime', guide_length: int = 20):
+        if pam_side not in PAM_SIDES:
+            raise ValueError(f"pam_side must be one of {PAM_SIDES}, got {pam_side!r}")
+        if guide_length <= 0:
+            raise ValueError(f"guide_length must be positive, got {guide_length}")
+        self.name = name
+        self.pam = pam.upper()
+        self.pam_side = pam_side
+        self.guide_length = guide_length
+        self.forward_masks = iupac_masks(self.pam)
+        self.reverse_masks = iupac_masks(reverse_complement_iupac(self.pam))
+
+    @classmethod
+    def from_config(cls, config: Config, name: str = 'config') -> 'NucleaseProfile':
+        """The single profile described by ``pam_sequence``, ``pam_side`` and ``guide_length``."""
+        return cls(name, config.pam_sequence, config.pam_side, config.guide_length)
+
+    def guide_offsets(self) -> Tuple[int, int]:
+        """Guide start relative to the PAM start, for forward and reverse sites."""
+        pam_len, guide_len = len(self.pam), self.guide_length
+        # A 3' PAM follows the guide on its own strand, so on the forward
+        # strand the guide lies left of it; reverse-strand sites mirror that
+        if self.pam_side == '3prime':
+            return -guide_len, pam_len
+        return pam_len, -guide_len
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'pam': self.pam, 'pam_side': self.pam_side, 'guide_length': self.guide_length}
+
+
+# Built-in profiles, selectable by name
+NUCLEASES: Dict[str, NucleaseProfile] = {
+    'SpCas9': NucleaseProfile('SpCas9', 'NGG', '3prime', 20),
+    'SaCas9': NucleaseProfile('SaCas9', 'NNGRRT', '3prime', 21),
+    'Cas12a': NucleaseProfile('Cas12a', 'TTTV', '5prime', 23),
+}
+
+
+def nuclease_profile(spec: Union[str, Dict[str, Any], NucleaseProfile]) -> NucleaseProfile:
+    """Resolve a built-in profile name, a profile dict or a profile."""
+    if isinstance(spec, NucleaseProfile):
+        return spec
+    if isinstance(spec, dict):
+        return NucleaseProfile(spec.get('name') or spec['pam'], spec['pam'], spec.get('pam_side', '3prime'),
+                               int(spec.get('guide_length', 20)))
+    if spec not in NUCLEASES:
+        raise ValueError(f"Unknown nuclease {spec!r}; expected one of {', '.join(NUCLEASES)} or a profile")
+    return NUCLEASES[spec]
+
+
+class PAMSites:
+    """Array-backed PAM hits on both strands, sorted by PAM start.
+
+    Coordinates are 0-based on the forward strand. ``strands`` holds +1 for
+    sites read on the forward strand and -1 for the reverse strand.
+    """
+
+    def __init__(self, pam_starts: np.ndarray, guide_starts: np.ndarray, strands: np.ndarray,
+                 pam_length: int, guide_length: int):
+        self.pam_starts = pam_starts
+        self.guide_starts = guide_starts
+        self.strands = strands
+        self.pam_length = pam_length
+        self.guide_length = guide_length
+
+    @property
+    def loci(self) -> np.ndarray:
+        """Locus of each site (PAM start)."""
+        return self.pam_starts
+
+    def __len__(self) -> int:
+        return len(self.pam_starts)
+
+    def __getitem__(self, index) -> 'PAMSites':
+        return PAMSites(self.pam_starts[index], self.guide_starts[index], self.strands[index],
+                        self.pam_length, self.guide_length)
+
+    def guide_codes(self, codes: np.ndarray) -> np.ndarray:
+        """Encoded guides (rows, 5'->3' on their own strand)."""
+        return _oriented_windows(codes, self.guide_starts, self.guide_length, self.strands)
+
+    def pam_codes(self, codes: np.ndarray) -> np.ndarray:
+        """Encoded PAMs (rows, 5'->3' on their own strand)."""
+        return _oriented_windows(codes, self.pam_starts, self.pam_length, self.strands)
+
+    def context_codes(self, codes: np.ndarray, flank5: int, flank3: int) -> np.ndarray:
+        """Encoded protospacer + PAM with ``flank5``/``flank3`` extra bases, 5'->3' on each site's strand.
+
+        Positions beyond the ends of ``codes`` read as unknown.
+        """
+        lo = np.minimum(self.guide_starts, self.pam_starts)
+        # The 5' flank of a reverse-strand site lies to its right on the forward strand
+        starts = lo - np.where(self.strands > 0, flank5, flank3)
+        length = self.guide_length + self.pam_length + flank5 + flank3
+        return _oriented_windows(codes, starts, length, self.strands, pad=True)
+
+
+def _oriented_windows(codes: np.ndarray, starts: np.ndarray, length: int, strands: np.ndarray,
+                      pad: bool = False) -> np.ndarray:
+    """Gather fixed-length windows, reverse complementing reverse-strand rows.
+
+    With ``pad``, positions outside ``codes`` read as unknown.
+    """
+    index = starts[:, None] + np.arange(length)
+    if pad:
+        outside = (index < 0) | (index >= len(codes))
+        windows = codes[np.clip(index, 0, max(len(codes) - 1, 0))] if len(codes) else np.full(index.shape, UNKNOWN)
+        windows = windows.astype(np.uint8)
+        windows[outside] = UNKNOWN
+    else:
+        windows = codes[index]
+    reverse = strands < 0
+    if reverse.any():
+        windows[reverse] = reverse_complement_codes(windows[reverse])
+    return windows
 
 
 class PAMScanner:
-    """Scans sequences for PAM sites and extracts guide RNAs."""
+    """Scans sequences for PAM sites and extracts guide RNAs.
 
-    def __init__(self, config: Config):
+    By default the scanner looks for the single nuclease described by the
+    config. Given ``profiles``, :meth:`scan_profiles` finds the sites of all
+    of them in one pass: each block of the sequence is converted to base
+    bitmasks once and every profile's PAM masks are matched against it.
+    :meth:`scan` always reports the first profile.
+    """
+
+    def __init__(self, config: Config, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 profiles: Optional[Sequence[Union[str, Dict[str, Any], NucleaseProfile]]] = None):
         self.config = config
-        self.pam_pattern = self._build_pam_pattern()
+        self.chunk_size = chunk_size
+        self.profiles = [nuclease_profile(p) for p in profiles] if profiles else [NucleaseProfile.from_config(config)]
+        names = [profile.name for profile in self.profiles]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate nuclease profile names: {names}")
+        self.forward_masks, self.reverse_masks = self.profiles[0].forward_masks, self.profiles[0].reverse_masks
+
+    @staticmethod
+    def _match(bits: np.ndarray, masks: np.ndarray, count: int) -> np.ndarray:
+        """Boolean array of the first ``count`` offsets where ``masks`` matches."""
+        hit = (bits[:count] & masks[0]) != 0
+        for j in range(1, len(masks)):
+            hit &= (bits[j:j + count] & masks[j]) != 0
+        return hit
 
-    def _build_pam_pattern(self) -> str:
-        """Build regex pattern for PAM sequence."""
-        pam = self.config.pam_sequence
-        # Replace N with [ATCG]
-        pam_regex = pam.replace('N', '[ATCG]')
-        return pam_regex
+    @traced("scan")
+    def scan(self, sequence: Union[str, np.ndarray], start: int = 0, end: int = None) -> PAMSites:
+        """Find every (overlapping) PAM site on both strands within region.
+
+        A site is reported when its PAM lies entirely inside ``[start, end)``
+        and its guide fits inside the sequence.
+        """
+        return self._scan(sequence, start, end, self.profiles[:1])[self.profiles[0].name]
+
+    @traced("scan")
+    def scan_profiles(self, sequence: Union[str, np.ndarray], start: int = 0,
+                      end: int = None) -> Dict[str, PAMSites]:
+        """Sites of every profile, keyed by profile name, from a single pass (see :meth:`scan`)."""
+        return self._scan(sequence, start, end, self.profiles)
+
+    def _scan(self, sequence: Union[str, np.ndarray], start: int, end: Optional[int],
+              profiles: List[NucleaseProfile]) -> Dict[str, PAMSites]:
+        codes = encode_sequence(sequence) if isinstance(sequence, (str, bytes)) else sequence
+        n = len(codes)
+        start = max(start or 0, 0)
+        end = n if end is None else min(end, n)
+        max_pam_len = max(len(profile.pam) for profile in profiles)
+        min_pam_len = min(len(profile.pam) for profile in profiles)
+
+        hits = {profile.name: ([], []) for profile in profiles}
+        for chunk_start in range(start, end - min_pam_len + 1, self.chunk_size):
+            bits = code_bits(codes[chunk_start:min(chunk_start + self.chunk_size + max_pam_len - 1, end)])
+            for profile in profiles:
+                # Last admissible PAM start is end - len(pam)
+                count = min(self.chunk_size, end - len(profile.pam) + 1 - chunk_start)
+                if count <= 0:
+                    continue
+                forward, reverse = hits[profile.name]
+                forward.append(np.flatnonzero(self._match(bits, profile.forward_masks, count)) + chunk_start)
+                reverse.append(np.flatnonzero(self._match(bits, profile.reverse_masks, count)) + chunk_start)
+
+        return {profile.name: self._sites(profile, *hits[profile.name], n) for profile in profiles}
+
+    @staticmethod
+    def _sites(profile: NucleaseProfile, forward: List[np.ndarray], reverse: List[np.ndarray],
+               n: int) -> PAMSites:
+        """Combine both strands' PAM hits, keeping sites whose guide fits in the sequence."""
+        guide_len = profile.guide_length
+        fwd_offset, rev_offset = profile.guide_offsets()
+        fwd = np.concatenate(forward) if forward else np.empty(0, dtype=np.int64)
+        rev = np.concatenate(reverse) if reverse else np.empty(0, dtype=np.int64)
+        fwd = fwd[(fwd + fwd_offset >= 0) & (fwd + fwd_offset + guide_len <= n)]
+        rev = rev[(rev + rev_offset >= 0) & (rev + rev_offset + guide_len <= n)]
+
+        pam_starts = np.concatenate([fwd, rev]).astype(np.int64)
+        guide_starts = np.concatenate([fwd + fwd_offset, rev + rev_offset]).astype(np.int64)
+        strands = np.concatenate([np.ones(len(fwd), dtype=np.int8), -np.ones(len(rev), dtype=np.int8)])
+        order = np.argsort(pam_starts, kind='stable')
+        return PAMSites(pam_starts[order], guide_starts[order], strands[order], len(profile.pam), guide_len)
 
     def find_pam_sites(self, sequence: str, start: int = 0, end: int = None) -> List[Dict]:
         """Find all PAM sites in the sequence within region."""
-        if end is None:
-            end = len(sequence)
-        region = sequence[start:end]
-        sites = []
-        for match in re.finditer(self.pam_pattern, region):
-            pam_start = start + match.start()
-            guide_start = pam_start - self.config.guide_length
-            if guide_start >= 0:
-                guide_seq = sequence[guide_start:pam_start]
-                pam_seq = sequence[pam_start:pam_start + len(self.config.pam_sequence)]
-                sites.append({
-                    'locus': pam_start,
-                    'guide_sequence': guide_seq,
-                    'pam_sequence': pam_seq,
-                    'pam_start': pam_start,
-                    'guide_start': guide_start,
-                })
-        return sites
\ No newline at end of file
+        codes = encode_sequence(sequence)
+        return self.site_records(codes, self.scan(codes, start, end))
+
+    @staticmethod
+    def site_records(codes: np.ndarray, sites: PAMSites, offset: int = 0) -> List[Dict]:
+        """Materialize scan results as one dict per site.
+
+        ``offset`` is added to reported coordinates when ``codes`` is a window
+        starting at that position.
+        """
+        guides = sites.guide_codes(codes)
+        pams = sites.pam_codes(codes)
+        return [
+            {
+                'locus': pam_start,
+                'guide_sequence': decode_sequence(guide),
+                'pam_sequence': decode_sequence(pam),
+                'pam_start': pam_start,
+                'guide_start': guide_start,
+                'strand': '+' if strand > 0 else '-',
+            }
+            for pam_start, guide_start, strand, guide, pam in zip(
+                (sites.pam_starts + offset).tolist(), (sites.guide_starts + offset).tolist(),
+                sites.strands.tolist(), guides, pams
+            )
+        ]
@@ -0,0 +1,141 @@
+"""Nearest-neighbour thermodynamics of guide RNA:target DNA hybrids."""
+
+import math
+from typing import Dict, Tuple
+import numpy as np
+from ..utils.encoding import encode_sequence
+
+# RNA/DNA hybrid stacks (Sugimoto et al., 1995), keyed by the RNA dinucleotide
+# 5'->3' written in DNA letters: (dH kcal/mol, dS cal/(K mol)) at 1 M NaCl
+NN_PARAMS: Dict[str, Tuple[float, float]] = {
+    'AA': (-7.8, -21.9), 'AC': (-5.9, -12.3), 'AG': (-9.1, -23.5), 'AT': (-8.3, -23.9),
+    'CA': (-9.0, -26.1), 'CC': (-9.3, -23.2), 'CG': (-16.3, -47.1), 'CT': (-7.0, -19.7),
+    'GA': (-5.5, -13.5), 'GC': (-8.0, -17.1), 'GG': (-12.8, -31.9), 'GT': (-7.8, -21.6),
+    'TA': (-7.8, -23.2), 'TC': (-8.6, -22.9), 'TG': (-10.4, -28.4), 'TT': (-11.5, -36.4),
+}
+INITIATION = (1.9, -3.9)
+GAS_CONSTANT = 1.987  # cal/(K mol)
+# Shortest hairpin loop counted by the self-folding proxy
+MIN_HAIRPIN_LOOP = 3
+
+
+def _stack_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """dH and dS (in tenths, so rolling sums stay exact) per dinucleotide code ``5 * a + b``.
+
+    Row 0 is for guides read off the forward strand; row 1 for guides that
+    are the reverse complement of the forward window, where forward stack
+    ``ab`` is the guide stack ``comp(b) comp(a)``. Stacks touching an unknown
+    base contribute nothing.
+    """
+    complement = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
+    tables = np.zeros((2, 2, 25), dtype=np.int32)
+    for pair, params in NN_PARAMS.items():
+        forward = 5 * 'ACGT'.index(pair[0]) + 'ACGT'.index(pair[1])
+        reverse = 5 * 'ACGT'.index(complement[pair[1]]) + 'ACGT'.index(complement[pair[0]])
+        for k, value in enumerate(params):
+            tables[0, k, forward] = round(value * 10)
+            tables[1, k, reverse] = round(value * 10)
+    return tables[:, 0], tables[:, 1]
+
+
+_DH, _DS = _stack_tables()
+# Rows: forward dH, reverse dH, forward dS, reverse dS; one lookup per dinucleotide fills all four
+_STACKS = np.concatenate([_DH, _DS])
+
+# Watson-Crick partner of each base code; unknown bases get a code no base has
+_PARTNER = np.array([3, 2, 1, 0, 255], dtype=np.uint8)
+
+
+class NearestNeighborModel:
+    """Table-driven hybrid dG/Tm for every guide window of a sequence at once.
+
+    :meth:`prefix_sums` turns the encoded sequence into cumulative dH/dS over
+    its dinucleotide codes, once per sequence, for each strand orientation;
+    any window's totals are then two lookups (:meth:`window_terms`).
+    """
+
+    def __init__(self, temperature: float = 37.0, sodium: float = 1.0, strand_conc: float = 2.5e-7):
+        self.temperature = temperature + 273.15
+        self.sodium = sodium
+        self.strand_conc = strand_conc
+
+    @staticmethod
+    def prefix_sums(codes: np.ndarray) -> Dict[str, np.ndarray]:
+        """Cumulative stack dH/dS (tenths) per orientation, length ``max(n, 1)``.
+
+        Sums are int32 and may wrap on long sequences; window differences
+        (see :meth:`window_terms`) are still exact, as no window comes close
+        to the int32 range.
+        """
+        codes = np.asarray(codes, dtype=np.uint8)
+        dinucleotides = codes[:-1] * np.uint8(5) + codes[1:] if len(codes) > 1 else np.empty(0, np.uint8)
+        cumulative = np.zeros((4, len(dinucleotides) + 1), dtype=np.int32)
+        for row in range(4):
+            stacks = cumulative[row, 1:]
+            np.take(_STACKS[row], dinucleotides, out=stacks)
+            np.cumsum(stacks, out=stacks)
+        return {'dh': cumulative[:2], 'ds': cumulative[2:]}
+
+    @staticmethod
+    def window_terms(prefix: Dict[str, np.ndarray], starts: np.ndarray, length: int,
+                     strands: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Stack dH (kcal/mol) and dS (cal/(K mol)) of windows ``[start, start + length)``.
+
+        Reverse-strand (``strands < 0``) windows are evaluated as their
+        reverse complement, the sequence the guide actually carries.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        row = (np.asarray(strands) < 0).astype(np.intp) if strands is not None else np.zeros(len(starts), np.intp)
+        end = starts + max(length - 1, 0)
+        dh = (prefix['dh'][row, end] - prefix['dh'][row, starts]).astype(np.int32) / 10
+        ds = (prefix['ds'][row, end] - prefix['ds'][row, starts]).astype(np.int32) / 10
+        return dh + INITIATION[0], ds + INITIATION[1]
+
+    def _salt_entropy(self, length) -> np.ndarray:
+        return 0.368 * (np.asarray(length) - 1) * math.log(self.sodium)
+
+    def delta_g(self, dh: np.ndarray, ds: np.ndarray, length) -> np.ndarray:
+        """Free energy (kcal/mol) at the model temperature and salt; negative is stable."""
+        return dh - self.temperature * (ds + self._salt_entropy(length)) / 1000
+
+    def melting_temperature(self, dh: np.ndarray, ds: np.ndarray, length) -> np.ndarray:
+        """Two-state melting temperature (degrees C) for non-self-complementary strands."""
+        total_ds = ds + self._salt_entropy(length) + GAS_CONSTANT * math.log(self.strand_conc / 4)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total_ds < 0, 1000 * dh / np.where(total_ds < 0, total_ds, -1.0) - 273.15, 0.0)
+
+    @staticmethod
+    def hairpin_stems(windows: np.ndarray, min_loop: int = MIN_HAIRPIN_LOOP) -> np.ndarray:
+        """Base pairs in the longest perfect hairpin stem of each row of encoded guides.
+
+        A self-folding proxy: contiguous Watson-Crick pairs ``(i, j), (i+1, j-1), ...``
+        closing a loop of at least ``min_loop`` bases. Pairing is symmetric
+        under reverse complement, so either strand's window gives the same value.
+        """
+        windows = np.asarray(windows, dtype=np.uint8)
+        n, length = windows.shape if windows.ndim == 2 else (0, 0)
+        if length < min_loop + 2:
+            return np.zeros(n, dtype=np.int64)
+        # Position-major, so every step works on contiguous rows of all guides
+        bases = np.ascontiguousarray(windows.T)
+        partners = _PARTNER[bases]
+        # run[j] is the length of the stem whose innermost pair is (i, j);
+        # each step extends the stems of i - 1 along the anti-diagonals
+        run = np.zeros((length + 1, n), dtype=np.uint8)
+        step = np.zeros_like(run)
+        peak = np.zeros((length, n), dtype=np.uint8)
+        for i in range(length - min_loop - 1):
+            lo = i + 1  # only j > i can pair with i
+            np.add(run[lo + 1:], 1, out=step[lo:length])
+            step[lo:length] *= bases[lo:] == partners[i]
+            step[:lo] = 0
+            run, step = step, run
+            closed = i + min_loop + 1
+            np.maximum(peak[closed:], run[closed:length], out=peak[closed:])
+        return peak.max(axis=0).astype(np.int64)
+
+    def sequence_terms(self, sequence: str) -> Tuple[float, float]:
+        """Stack dH/dS of one guide string (as it reads 5'->3')."""
+        codes = encode_sequence(sequence)
+        dh, ds = self.window_terms(self.prefix_sums(codes), np.zeros(1, dtype=np.int64), len(codes))
+        return float(dh[0]), float(ds[0])
@@ -0,0 +1,250 @@
+"""Array-backed tables of designed guides."""
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from .utils.encoding import UNKNOWN
+
+# Columns locating a site; guide and PAM codes are stored packed
+LOCATION_FIELDS = ('pam_start', 'guide_start', 'strand')
+PACKED_FIELDS = ('guide', 'guide_unknown', 'pam', 'pam_unknown')
+
+# _UNPACK[byte] holds the four base codes packed into it, first base in the high bits
+_UNPACK = ((np.arange(256, dtype=np.uint8)[:, None] >> np.array([6, 4, 2, 0], dtype=np.uint8)) & 3).astype(np.uint8)
+_LETTERS = np.frombuffer(b"ACGTN", dtype=np.uint8)
+
+
+def candidate_id(gene_id: str, locus: int, strand: str, nuclease: Optional[str] = None) -> str:
+    """Stable candidate ID for a guide.
+
+    Reverse-strand IDs carry an ``_rc`` suffix, and guides designed for a
+    named nuclease profile end in ``_<nuclease>``.
+    """
+    return f"{gene_id}_{locus}" + ('' if strand == '+' else '_rc') + (f"_{nuclease}" if nuclease else '')
+
+
+def pack_bases(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack rows of base codes 2 bits per base, with a bitmask of unknown bases.
+
+    Returns ``(packed, unknown)``: ``(n, ceil(L / 4))`` and ``(n, ceil(L / 8))``
+    uint8 arrays. Unknown bases are stored as A in ``packed``.
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    if codes.ndim != 2:  # An empty column without a row width
+        codes = codes.reshape(len(codes), 0)
+    n, length = codes.shape
+    unknown = codes >= UNKNOWN
+    padded = np.zeros((n, -(-length // 4) * 4), dtype=np.uint8)
+    padded[:, :length] = np.where(unknown, 0, codes)
+    quads = padded.reshape(n, padded.shape[1] // 4, 4)
+    packed = (quads[..., 0] << 6) | (quads[..., 1] << 4) | (quads[..., 2] << 2) | quads[..., 3]
+    return packed, np.packbits(unknown, axis=1)
+
+
+def unpack_bases(packed: np.ndarray, unknown: np.ndarray, length: int) -> np.ndarray:
+    """Inverse of :func:`pack_bases`: ``(n, length)`` base codes."""
+    codes = _UNPACK[packed].reshape(len(packed), packed.shape[1] * 4)[:, :length]
+    codes[np.unpackbits(unknown, axis=1, count=length).astype(bool)] = UNKNOWN
+    return codes
+
+
+class GuideTable:
+    """Guides of one design as rows of a NumPy structured array.
+
+    Each row holds the site (``pam_start``, ``guide_start``, ``strand``), the
+    guide and PAM packed 2 bits per base with a bitmask of unknown bases, and
+    one field per feature and score column. A slice is a view and an index
+    array (a ranking) copies only the selected rows; guide dicts are built on
+    demand by :meth:`to_records`, and :meth:`to_json` writes the JSON a list
+    of those dicts would serialize to straight from the columns.
+    """
+
+    def __init__(self, data: np.ndarray, gene_id: str, guide_length: int, pam_length: int,
+                 nuclease: Optional[str] = None):
+        self.data = data
+        self.gene_id = gene_id
+        self.guide_length = guide_length
+        self.pam_length = pam_length
+        self.nuclease = nuclease
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray], gene_id: str, nuclease: Optional[str] = None,
+                     exclude: Sequence[str] = ()) -> 'GuideTable':
+        """Build a table from site columns (``pam_start``, ``guide_start``, ``strand``,
+        ``guide_codes``, ``pam_codes``) and 1-D feature/score columns; ``exclude``
+        names columns to leave out."""
+        guide, guide_unknown = pack_bases(columns['guide_codes'])
+        pam, pam_unknown = pack_bases(columns['pam_codes'])
+        packed = {'guide': guide, 'guide_unknown': guide_unknown, 'pam': pam, 'pam_unknown': pam_unknown}
+        skip = set(LOCATION_FIELDS) | {'guide_codes', 'pam_codes'} | set(exclude)
+        features = [key for key in columns if key not in skip]
+        dtype = ([(key, np.asarray(columns[key]).dtype) for key in LOCATION_FIELDS]
+                 + [(key, np.uint8, values.shape[1:]) for key, values in packed.items()]
+                 + [(key, np.asarray(columns[key]).dtype) for key in features])
+        data = np.empty(len(columns['pam_start']), dtype=dtype)
+        for key in LOCATION_FIELDS + tuple(features):
+            data[key] = columns[key]
+        for key, values in packed.items():
+            data[key] = values
+        return cls(data, gene_id, np.shape(columns['guide_codes'])[-1], np.shape(columns['pam_codes'])[-1],
+                   nuclease)
+
+    @classmethod
+    def concat(cls, tables: Sequence['GuideTable']) -> 'GuideTable':
+        """Rows of several tables of the same design, in order."""
+        first = tables[0]
+        return cls(np.concatenate([table.data for table in tables]), first.gene_id, first.guide_length,
+                   first.pam_length, first.nuclease)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index: Union[str, int, slice, np.ndarray]) -> Any:
+        """A column by name, one guide dict by position, or a sub-table for a slice or index array."""
+        if isinstance(index, str):
+            return self.data[index]
+        if isinstance(index, (int, np.integer)):
+            return self[index:index + 1 or None].to_records()[0]
+        return self.take(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.to_records())
+
+    def take(self, index: Union[slice, np.ndarray]) -> 'GuideTable':
+        """Rows ``index`` (a view for slices), in the given order."""
+        return GuideTable(self.data[index], self.gene_id, self.guide_length, self.pam_length, self.nuclease)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    @property
+    def feature_names(self) -> Tuple[str, ...]:
+        """Names of the feature and score fields, in column order."""
+        skip = set(LOCATION_FIELDS) | set(PACKED_FIELDS)
+        return tuple(name for name in self.data.dtype.names if name not in skip)
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Site and feature/score fields as column views."""
+        return {name: self.data[name] for name in LOCATION_FIELDS + self.feature_names}
+
+    def guide_codes(self) -> np.ndarray:
+        """Encoded guides, ``(n, guide_length)``."""
+        return unpack_bases(self.data['guide'], self.data['guide_unknown'], self.guide_length)
+
+    def pam_codes(self) -> np.ndarray:
+        """Encoded PAMs, ``(n, pam_length)``."""
+        return unpack_bases(self.data['pam'], self.data['pam_unknown'], self.pam_length)
+
+    @staticmethod
+    def _strings(codes: np.ndarray) -> List[str]:
+        """Decode rows of codes with one table lookup and one bytes decode for the whole table."""
+        width = codes.shape[1]
+        text = _LETTERS[codes].tobytes().decode('ascii')
+        return [text[i:i + width] for i in range(0, len(text), width)] if width else [''] * len(codes)
+
+    def guide_sequences(self) -> List[str]:
+        return self._strings(self.guide_codes())
+
+    def pam_sequences(self) -> List[str]:
+        return self._strings(self.pam_codes())
+
+    def _fields(self) -> List[Tuple[str, List[Any]]]:
+        """``(key, values)`` of every guide dict field, in record order."""
+        pam_starts = self.data['pam_start'].tolist()
+        strands = ['+' if strand > 0 else '-' for strand in self.data['strand'].tolist()]
+        fields = [
+            ('locus', pam_starts),
+            ('guide_sequence', self.guide_sequences()),
+            ('pam_sequence', self.pam_sequences()),
+            ('pam_start', pam_starts),
+            ('guide_start', self.data['guide_start'].tolist()),
+            ('strand', strands),
+        ]
+        fields += [(name, self.data[name].tolist()) for name in self.feature_names]
+        fields.append(('candidate_id', [candidate_id(self.gene_id, locus, strand, self.nuclease)
+                                        for locus, strand in zip(pam_starts, strands)]))
+        if self.nuclease:
+            fields.append(('nuclease', [self.nuclease] * len(self)))
+        return fields
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """One guide dict per row."""
+        fields = self._fields()
+        keys = [key for key, _ in fields]
+        return [dict(zip(keys, row)) for row in zip(*(values for _, values in fields))]
+
+    @staticmethod
+    def _json_numbers(column: np.ndarray) -> List[str]:
+        """JSON text of a numeric column, formatting each distinct value once."""
+        # Compare bit patterns so -0.0/0.0 and NaNs keep their own text
+        keys = column.view(f'u{column.itemsize}') if column.dtype.kind == 'f' else column
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        repeated = 2 * len(first) <= len(column)
+        values = (column[first] if repeated else column).tolist()
+        if column.dtype.kind == 'f' and np.isfinite(column).all():
+            text = list(map(float.__repr__, values))
+        elif column.dtype.kind in 'iu':
+            text = list(map(int.__repr__, values))
+        else:
+            text = [json.dumps(value) for value in values]
+        return np.array(text, dtype=object)[inverse.reshape(-1)].tolist() if repeated else text
+
+    def iter_json(self) -> Iterator[str]:
+        """JSON text of each guide dict (as ``json.dumps`` would write it), row by row.
+
+        Every field is converted to text column by column, distinct numbers
+        once each; rows are then filled into a single format template, so no
+        per-guide dicts are built.
+        """
+        def key_text(key: str) -> str:
+            return json.dumps(key).replace('%', '%%') + ': '
+
+        loci = list(map(int.__repr__, self.data['pam_start'].tolist()))
+        forward = self.data['strand'] > 0
+        template = [key_text(key) + '%s' for key in ('locus', 'guide_sequence', 'pam_sequence', 'pam_start',
+                                                      'guide_start', 'strand')]
+        # Sequences and strands are plain letters: nothing to escape
+        columns = [
+            loci,
+            [f'"{value}"' for value in self.guide_sequences()],
+            [f'"{value}"' for value in self.pam_sequences()],
+            loci,
+            list(map(int.__repr__, self.data['guide_start'].tolist())),
+            np.where(forward, '"+"', '"-"').tolist(),
+        ]
+        for name in self.feature_names:
+            template.append(key_text(name) + '%s')
+            columns.append(self._json_numbers(self.data[name]))
+        prefix = '"' + json.dumps(self.gene_id)[1:-1] + '_'
+        tag = '_' + json.dumps(self.nuclease)[1:-1] if self.nuclease else ''
+        suffixes = np.where(forward, tag + '"', '_rc' + tag + '"').tolist()
+        template.append(key_text('candidate_id') + '%s')
+        columns.append([prefix + locus + suffix for locus, suffix in zip(loci, suffixes)])
+        if self.nuclease:
+            template.append(key_text('nuclease') + json.dumps(self.nuclease).replace('%', '%%'))
+        template = '{' + ', '.join(template) + '}'
+        return (template % row for row in zip(*columns))
+
+    def to_json(self) -> str:
+        """The guides as a JSON array, identical to ``json.dumps(self.to_records())``."""
+        return '[' + ', '.join(self.iter_json()) + ']'
+
+    def to_ndjson(self) -> str:
+        """The guides as newline-delimited JSON, one object per line."""
+        return ''.join(row + '\n' for row in self.iter_json())
+
+
+def dumps(message: Dict[str, Any]) -> str:
+    """``json.dumps`` of a dict whose values may be :class:`GuideTable` objects.
+
+    Tables are written by :meth:`GuideTable.to_json`, so the text equals
+    ``json.dumps`` of the message with each table replaced by its records.
+    """
+    if not any(isinstance(value, GuideTable) for value in message.values()):
+        return json.dumps(message)
+    return '{' + ', '.join(
+        f"{json.dumps(key)}: {value.to_json() if isinstance(value, GuideTable) else json.dumps(value)}"
+        for key, value in message.items()
+    ) + '}'
@@ -0,0 +1,488 @@
+"""End-to-end guide design pipeline."""
+
+import hashlib
+import json
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import numpy as np
+from .utils.config import Config
+from .utils.cache import LRUCache
+from .utils.encoding import encode_sequence
+from .utils.metrics import MetricsCollector, StageTimer
+from .features.pam_scanner import PAMScanner, PAMSites, NucleaseProfile
+from .features.extractor import FeatureExtractor
+from .features.site_index import SiteIndex
+from .data.genome_store import SequenceWindow
+from .guide_table import GuideTable, candidate_id
+from .scoring.scorer import GuideScorer
+from .rl.optimizer import RLOptimizer
+from .rl.reranker import ParetoReranker
+
+# Columns describing where a site is; everything else in a column set is a feature
+SITE_COLUMNS = ('pam_start', 'guide_start', 'strand', 'guide_codes', 'pam_codes')
+# Config keys that change which sites are found or their features
+SCAN_CONFIG_KEYS = ('pam_sequence', 'pam_side', 'guide_length', 'offtarget_max_mismatches', 'on_target_model',
+                    'specificity_model')
+# Feature columns the scorer reads but guides are not served with
+INTERNAL_COLUMNS = ('context_codes',)
+# Bases featurized to estimate a site index's size before building it
+INDEX_SAMPLE_BASES = 10_000
+
+
+def config_fingerprint(config: Config, keys: Tuple[str, ...] = None) -> str:
+    """Short hash of ``config.to_dict()`` (optionally restricted to ``keys``)."""
+    values = config.to_dict()
+    if keys is not None:
+        values = {key: values.get(key) for key in keys}
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def concat_columns(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Concatenate chunk column sets row-wise."""
+    if not parts:
+        return {}
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+class DesignCache:
+    """Two-tier LRU cache of design work.
+
+    ``results`` holds finished responses keyed on the region, ``top_k`` and a
+    fingerprint of the config and policy, so any weight or policy change
+    misses. ``features`` holds one :class:`SiteIndex` per sequence, keyed on
+    the gene and the scan-relevant config only; a result miss for any region
+    of an indexed gene is sliced out of the index, re-scored and re-ranked
+    without fetching or scanning. The features tier is bounded by
+    ``max_bytes``; ``oversized`` remembers the sequences whose index would
+    not fit, so they are not scanned whole again.
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.results = LRUCache(max_entries)
+        self.features = LRUCache(max_entries, max_bytes=max_bytes, sizeof=lambda index: index.nbytes)
+        self.oversized = LRUCache(max_entries)
+        self.rescored = 0
+
+    def fits(self, nbytes: float) -> bool:
+        """Whether a site index of ``nbytes`` can be cached."""
+        return self.max_bytes is None or nbytes <= self.max_bytes
+
+    def invalidate(self, scan: bool = False):
+        """Drop cached results, and cached features too when ``scan`` is set."""
+        self.results.clear()
+        if scan:
+            self.features.clear()
+            self.oversized.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counts of both tiers."""
+        results = self.results.stats()
+        features = self.features.stats()
+        lookups = results['hits'] + results['misses']
+        return {
+            'hits': results['hits'],
+            'rescored': self.rescored,
+            'misses': results['misses'] - self.rescored,
+            'hit_rate': (results['hits'] + self.rescored) / lookups if lookups else 0.0,
+            'results': results,
+            'features': features,
+        }
+
+
+class DesignPipeline:
+    """Scans, featurizes, scores, optimizes and reranks guides for a sequence.
+
+    Regions are processed in chunks of ``config.design_chunk_size`` bases:
+    each chunk only encodes its own window of the sequence, and the candidate
+    pool carried between chunks is bounded by ``pool_size`` (raised to
+    ``top_k`` when smaller), so memory does not grow with the region. With a :class:`DesignCache`, sequences up to
+    ``config.site_index_max_length`` are scanned once into a
+    :class:`SiteIndex`, after which every region of them, and every repeated
+    design, is answered from cache (see :meth:`lookup`). With a
+    :class:`MetricsCollector`, per-stage times and the policy's own estimate
+    of its uplift are recorded for every design.
+    """
+
+    def __init__(self, config: Config, scanner: PAMScanner = None, extractor: FeatureExtractor = None,
+                 scorer: GuideScorer = None, optimizer: RLOptimizer = None, reranker: ParetoReranker = None,
+                 offtarget_index=None, cache: DesignCache = None, metrics: MetricsCollector = None):
+        self.config = config
+        self.scanner = scanner or PAMScanner(config)
+        self.extractor = extractor or FeatureExtractor()
+        self.scorer = scorer or GuideScorer(config)
+        self.optimizer = optimizer or RLOptimizer(config, self.scorer)
+        self.reranker = reranker or ParetoReranker()
+        self.offtarget_index = offtarget_index
+        self.cache = cache
+        self.metrics = metrics
+
+    def config_changed(self, scan: bool = False):
+        """Apply a config update: rebuild the scanner if ``scan`` and drop stale cache entries."""
+        if scan:
+            self.scanner = PAMScanner(self.config)
+        if self.cache is not None:
+            self.cache.invalidate(scan=scan)
+
+    @property
+    def context_flank(self) -> int:
+        """Bases either side of a region that its sites' guides and features can read."""
+        # Guides may sit on either side of the PAM; keep enough flank for both
+        return self.config.guide_length + len(self.scanner.forward_masks) + max(self.scorer.context_flanks or (0,))
+
+    def featurize_chunk(self, sequence: str, start: int, end: int,
+                        timer: StageTimer = None) -> Dict[str, np.ndarray]:
+        """Site and feature columns for every site whose PAM starts in ``[start, end)``."""
+        timer = timer or StageTimer()
+        n = len(sequence)
+        pam_length = len(self.scanner.forward_masks)
+        scan_end = min(end + pam_length - 1, n)
+        flank = self.context_flank
+        window_start, window_end = max(start - flank, 0), min(scan_end + flank, n)
+        with timer.stage('scan'):
+            codes = encode_sequence(sequence[window_start:window_end])
+            sites = self.scanner.scan(codes, start - window_start, scan_end - window_start)
+        return self._site_columns(codes, sites, window_start, n,
+                                  self._offtarget_applies(NucleaseProfile.from_config(self.config)), timer)
+
+    def featurize_nucleases(self, scanner: PAMScanner, sequence: str, start: int, end: int,
+                            region_end: Optional[int] = None,
+                            timer: StageTimer = None) -> Dict[str, Dict[str, np.ndarray]]:
+        """Columns per profile of ``scanner`` for sites whose PAM starts in ``[start, end)``.
+
+        All profiles come from a single scan of the chunk's window. PAMs
+        running past ``region_end`` are dropped.
+        """
+        timer = timer or StageTimer()
+        n = len(sequence)
+        region_end = n if region_end is None else min(region_end, n)
+        max_pam = max(len(profile.pam) for profile in scanner.profiles)
+        scan_end = min(end + max_pam - 1, region_end)
+        flank = (max(profile.guide_length + len(profile.pam) for profile in scanner.profiles)
+                 + max(self.scorer.context_flanks or (0,)))
+        window_start, window_end = max(start - flank, 0), min(scan_end + flank, n)
+        with timer.stage('scan'):
+            codes = encode_sequence(sequence[window_start:window_end])
+            found = scanner.scan_profiles(codes, start - window_start, scan_end - window_start)
+        columns = {}
+        for profile in scanner.profiles:
+            sites = found[profile.name]
+            sites = sites[sites.pam_starts < end - window_start]
+            columns[profile.name] = self._site_columns(codes, sites, window_start, n,
+                                                       self._offtarget_applies(profile), timer)
+        return columns
+
+    def _offtarget_applies(self, profile: NucleaseProfile) -> bool:
+        """Whether the off-target index was built for this profile's PAM and guide length."""
+        index = self.offtarget_index
+        return (index is not None and profile.pam == index.pam_sequence.upper()
+                and profile.guide_length == index.guide_length and profile.pam_side == '3prime')
+
+    def _site_columns(self, codes: np.ndarray, sites: PAMSites, window_start: int, n: int,
+                      offtarget: bool, timer: StageTimer) -> Dict[str, np.ndarray]:
+        with timer.stage('extract'):
+            columns = {
+                'pam_start': sites.pam_starts + window_start,
+                'guide_start': sites.guide_starts + window_start,
+                'strand': sites.strands,
+                'guide_codes': sites.guide_codes(codes),
+                'pam_codes': sites.pam_codes(codes),
+            }
+            columns.update(self.extractor.extract_sites(codes, sites, seq_len=n, offset=window_start))
+            model = self.scorer.model
+            if model is not None and model.accepts(sites.guide_length, sites.pam_length):
+                columns['context_codes'] = sites.context_codes(codes, model.flank5, model.flank3)
+        if offtarget:
+            with timer.stage('offtarget'):
+                model = self.scorer.specificity
+                if model is not None and model.guide_length != self.offtarget_index.guide_length:
+                    model = None
+                columns.update(self.offtarget_index.off_target_scores(columns['guide_codes'], model))
+        return columns
+
+    def score_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Feature columns plus the scorer's score columns."""
+        features = {key: values for key, values in columns.items() if key not in SITE_COLUMNS}
+        return {**columns, **self.scorer.score_batch(features)}
+
+    @staticmethod
+    def guide_table(columns: Dict[str, np.ndarray], gene_id: str, index: np.ndarray = None,
+                    nuclease: Optional[str] = None) -> GuideTable:
+        """Scored columns (optionally only rows ``index``) as a :class:`GuideTable`.
+
+        Guides of a named ``nuclease`` profile carry it as a field and in
+        their candidate ID.
+        """
+        if index is not None:
+            columns = {key: values[index] for key, values in columns.items()}
+        return GuideTable.from_columns(columns, gene_id, nuclease, exclude=INTERNAL_COLUMNS)
+
+    @classmethod
+    def guide_records(cls, columns: Dict[str, np.ndarray], gene_id: str, index: np.ndarray = None,
+                      nuclease: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Materialize scored columns (optionally only rows ``index``) as guide dicts."""
+        return cls.guide_table(columns, gene_id, index, nuclease).to_records()
+
+    def score_chunk(self, sequence: str, gene_id: str, start: int, end: int) -> List[Dict[str, Any]]:
+        """Scored guide dicts for every site whose PAM starts in ``[start, end)``."""
+        return self.guide_records(self.score_columns(self.featurize_chunk(sequence, start, end)), gene_id)
+
+    def _chunk_bounds(self, sequence: str, start: int, end: Optional[int], chunk_size: Optional[int],
+                      pam_length: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        start = max(start or 0, 0)
+        end = len(sequence) if end is None else min(end, len(sequence))
+        chunk_size = chunk_size or self.config.design_chunk_size
+        pam_length = pam_length or len(self.scanner.forward_masks)
+        for chunk_start in range(start, end, chunk_size):
+            # PAMs must end inside the region, so the last chunk stops early
+            chunk_end = min(chunk_start + chunk_size, end - pam_length + 1)
+            if chunk_end <= chunk_start:
+                break
+            yield chunk_start, chunk_end
+
+    def iter_chunks(self, sequence: str, gene_id: str, start: int = 0, end: Optional[int] = None,
+                    chunk_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield scored guides chunk by chunk across ``[start, end)``."""
+        for chunk_start, chunk_end in self._chunk_bounds(sequence, start, end, chunk_size):
+            yield self.score_chunk(sequence, gene_id, chunk_start, chunk_end)
+
+    def _merge_pool(self, pool: Optional[GuideTable], guides: GuideTable, pool_size: int) -> Optional[GuideTable]:
+        """Keep the policy's best ``pool_size`` guides seen so far."""
+        if not len(guides):
+            return pool
+        merged = guides if pool is None else GuideTable.concat([pool, guides])
+        return merged.take(self.optimizer.optimize_indices(merged.columns, top_k=pool_size))
+
+    def rank(self, pool: Optional[GuideTable], top_k: int, timer: StageTimer = None) -> List[Dict[str, Any]]:
+        """Final policy ranking and Pareto rerank of a candidate pool, as guide dicts."""
+        if pool is None or not len(pool):
+            return []
+        timer = timer or StageTimer()
+        with timer.stage('optimize'):
+            pool = pool.take(self.optimizer.optimize_indices(pool.columns, top_k=len(pool)))
+        with timer.stage('rerank'):
+            pool = pool.take(self.reranker.rerank_indices(pool.columns, len(pool), top_k=min(top_k, len(pool))))
+        with timer.stage('materialize'):
+            guides = pool.to_records()
+        self.optimizer.remember(guides)
+        return guides
+
+    def rank_columns(self, columns: Dict[str, np.ndarray], gene_id: str, top_k: int,
+                     pool_size: int, timer: StageTimer = None) -> List[Dict[str, Any]]:
+        """Score and rank a whole column set, materializing only the candidate pool."""
+        if not columns or not len(columns['pam_start']):
+            return []
+        timer = timer or StageTimer()
+        with timer.stage('score'):
+            scored = self.score_columns(columns)
+        with timer.stage('optimize'):
+            pool_index = self.optimizer.select_top_k(self.optimizer.context_matrix(scored), pool_size)
+        with timer.stage('materialize'):
+            pool = self.guide_table(scored, gene_id, pool_index)
+        return self.rank(pool, top_k, timer)
+
+    @staticmethod
+    def _top_composite(baseline: Optional[GuideTable], guides: GuideTable, top_k: int) -> Optional[GuideTable]:
+        """Best ``top_k`` guides by composite score so far (earlier guides win ties)."""
+        merged = guides if baseline is None else GuideTable.concat([baseline, guides])
+        return merged.take(np.argsort(-merged['composite_score'], kind='stable')[:top_k])
+
+    def _record(self, timer: StageTimer, guides: List[Dict[str, Any]], baseline: Optional[GuideTable]):
+        """Report stage times, and the policy's expected reward for the served vs scorer-only ranking."""
+        if self.metrics is None:
+            return
+        self.metrics.record_stages(timer.totals)
+        if guides and baseline is not None and len(baseline):
+            policy = self.optimizer.expected_rewards(self.optimizer.guide_contexts(guides)).mean()
+            reference = self.optimizer.expected_rewards(self.optimizer.context_matrix(baseline.columns)).mean()
+            self.metrics.record_estimated_uplift(float(policy), float(reference))
+
+    def _cache_keys(self, gene_id: str, start: int, end: Optional[int], top_k: int,
+                    pool_size: int) -> Tuple[tuple, tuple]:
+        result_key = (gene_id, start or 0, end, top_k, pool_size, config_fingerprint(self.config),
+                      self.optimizer.version)
+        return result_key, self._index_key(gene_id)
+
+    def _index_key(self, gene_id: str) -> tuple:
+        return gene_id, config_fingerprint(self.config, SCAN_CONFIG_KEYS)
+
+    def build_site_index(self, sequence: str, timer: StageTimer = None) -> SiteIndex:
+        """Scan and featurize a whole sequence, chunk by chunk, into a :class:`SiteIndex`."""
+        parts = [self.featurize_chunk(sequence, chunk_start, chunk_end, timer)
+                 for chunk_start, chunk_end in self._chunk_bounds(sequence, 0, None, None)]
+        columns = concat_columns(parts) if parts else self.featurize_chunk(sequence, 0, 0, timer)
+        return SiteIndex(columns, len(sequence), len(self.scanner.forward_masks))
+
+    def site_index(self, gene_id: str, sequence: Optional[str] = None,
+                   timer: StageTimer = None) -> Optional[SiteIndex]:
+        """The cached site index of a gene, built from ``sequence`` on a miss.
+
+        Returns ``None`` without a cache, or when the index is missing and
+        cannot be built (no sequence, only a :class:`SequenceWindow` of it,
+        or one longer than ``config.site_index_max_length``) or would not fit
+        the cache. The size is estimated from a sample of the sequence before
+        building, so callers fall back to scanning just their region.
+        """
+        if self.cache is None:
+            return None
+        key = self._index_key(gene_id)
+        index = self.cache.features.get(key)
+        if (index is None and sequence is not None and not isinstance(sequence, SequenceWindow)
+                and len(sequence) <= self.config.site_index_max_length and key not in self.cache.oversized):
+            if not self.cache.fits(self.estimate_index_bytes(sequence)):
+                self.cache.oversized.put(key, True)
+                return None
+            index = self.build_site_index(sequence, timer)
+            if not self.cache.fits(index.nbytes):
+                self.cache.oversized.put(key, True)  # The sample underestimated it; never rebuild it
+                return None
+            self.cache.features.put(key, index)
+        return index
+
+    def estimate_index_bytes(self, sequence: str) -> float:
+        """Size of the sequence's :class:`SiteIndex`, extrapolated from one sample from its middle."""
+        n = len(sequence)
+        sample = min(n, INDEX_SAMPLE_BASES)
+        if not sample:
+            return 0.0
+        start = (n - sample) // 2
+        columns = self.featurize_chunk(sequence, start, start + sample)
+        return sum(values.nbytes for values in columns.values()) * n / sample
+
+    def lookup(self, gene_id: str, start: int = 0, end: Optional[int] = None,
+               top_k: int = 10, pool_size: int = 20, timer: StageTimer = None) -> Optional[Dict[str, Any]]:
+        """Serve a design from cache without the sequence, or ``None`` on a miss.
+
+        Any region of a gene whose :class:`SiteIndex` is cached is sliced out
+        of the index, then scored and ranked under the current weights and
+        policy.
+        """
+        if self.cache is None:
+            return None
+        pool_size = max(pool_size, top_k)
+        result_key, index_key = self._cache_keys(gene_id, start, end, top_k, pool_size)
+        result = self.cache.results.get(result_key)
+        if result is not None:
+            return result
+        index = self.cache.features.get(index_key)
+        if index is None:
+            return None
+        timer = timer or StageTimer()
+        columns = index.query(start, end)
+        summary = {
+            "gene_id": gene_id,
+            "region": {"start": start, "end": end or index.seq_len},
+            "total_sites": len(columns['pam_start']),
+        }
+        result = {**summary, 'guides': self.rank_columns(columns, gene_id, top_k, pool_size, timer)}
+        if self.metrics is not None:
+            self.metrics.record_stages(timer.totals)
+        self.cache.rescored += 1
+        self.cache.results.put(result_key, result)
+        return result
+
+    def _summary(self, gene_id: str, sequence: str, start: int, end: Optional[int],
+                 total_sites: int) -> Dict[str, Any]:
+        return {
+            "gene_id": gene_id,
+            "region": {"start": start, "end": end or len(sequence)},
+            "total_sites": total_sites,
+        }
+
+    def design(self, sequence: str, gene_id: str, start: int = 0, end: Optional[int] = None,
+               top_k: int = 10, pool_size: int = 20, timer: StageTimer = None) -> Dict[str, Any]:
+        """Design guides for a region and return the final ranked summary."""
+        for message in self.iter_design(sequence, gene_id, start, end, top_k, pool_size, emit_chunks=False,
+                                        timer=timer):
+            message.pop("type")
+            return message
+
+    def design_nucleases(self, sequence: str, gene_id: str, nucleases: List[Any], start: int = 0,
+                         end: Optional[int] = None, top_k: int = 10, pool_size: int = 20,
+                         chunk_size: Optional[int] = None, timer: StageTimer = None) -> Dict[str, Any]:
+        """Design guides for several nuclease profiles from one scan per chunk.
+
+        ``nucleases`` holds built-in profile names, profile dicts or
+        :class:`NucleaseProfile` objects. The result has the usual ``gene_id``
+        and ``region``, plus per profile name the profile, its site count and
+        its ranked guides under ``nucleases``.
+        """
+        timer = timer or StageTimer()
+        pool_size = max(pool_size, top_k)
+        scanner = PAMScanner(self.config, profiles=nucleases)
+        pools: Dict[str, Optional[GuideTable]] = {profile.name: None for profile in scanner.profiles}
+        totals = dict.fromkeys(pools, 0)
+        min_pam = min(len(profile.pam) for profile in scanner.profiles)
+        region_end = len(sequence) if end is None else min(end, len(sequence))
+        for chunk_start, chunk_end in self._chunk_bounds(sequence, start, end, chunk_size, min_pam):
+            chunks = self.featurize_nucleases(scanner, sequence, chunk_start, chunk_end, region_end, timer)
+            for name, columns in chunks.items():
+                if not len(columns['pam_start']):
+                    continue
+                totals[name] += len(columns['pam_start'])
+                with timer.stage('score'):
+                    scored = self.score_columns(columns)
+                with timer.stage('optimize'):
+                    index = self.optimizer.select_top_k(self.optimizer.context_matrix(scored), pool_size)
+                with timer.stage('materialize'):
+                    guides = self.guide_table(scored, gene_id, index, nuclease=name)
+                with timer.stage('optimize'):
+                    pools[name] = self._merge_pool(pools[name], guides, pool_size)
+        result = {
+            "gene_id": gene_id,
+            "region": {"start": start, "end": end or len(sequence)},
+            "nucleases": {
+                profile.name: {
+                    "profile": profile.to_dict(),
+                    "total_sites": totals[profile.name],
+                    "guides": self.rank(pools[profile.name], top_k, timer),
+                }
+                for profile in scanner.profiles
+            },
+        }
+        if self.metrics is not None:
+            self.metrics.record_stages(timer.totals)
+        return result
+
+    def iter_design(self, sequence: str, gene_id: str, start: int = 0, end: Optional[int] = None,
+                    top_k: int = 10, pool_size: int = 20, chunk_size: Optional[int] = None,
+                    emit_chunks: bool = True, timer: StageTimer = None) -> Iterator[Dict[str, Any]]:
+        """Stream design results: one ``guides`` message per chunk, then a ``summary``.
+
+        Chunk messages carry a :class:`GuideTable` (serialize them with
+        :func:`crispr_rl.guide_table.dumps`); the summary's ranked guides are
+        dicts. Chunks are sliced out of the gene's cached :class:`SiteIndex` when
+        there is one (building it first if the sequence is short enough), and
+        scanned from the sequence otherwise, so streaming a long region stays
+        bounded in memory. Stage times accumulate in ``timer`` when one is
+        passed.
+        """
+        timer = timer or StageTimer()
+        pool_size = max(pool_size, top_k)
+        index = self.site_index(gene_id, sequence, timer)
+        pool: Optional[GuideTable] = None
+        baseline: Optional[GuideTable] = None  # Scorer-only top_k, the reference for uplift
+        total_sites = 0
+        for chunk_start, chunk_end in self._chunk_bounds(sequence, start, end, chunk_size):
+            if index is not None:
+                columns = index.slice(chunk_start, chunk_end)
+            else:
+                columns = self.featurize_chunk(sequence, chunk_start, chunk_end, timer)
+            with timer.stage('score'):
+                scored = self.score_columns(columns)
+            with timer.stage('materialize'):
+                guides = self.guide_table(scored, gene_id)
+            total_sites += len(guides)
+            with timer.stage('optimize'):
+                pool = self._merge_pool(pool, guides, pool_size)
+            if self.metrics is not None and len(guides):
+                baseline = self._top_composite(baseline, guides, top_k)
+            if guides and emit_chunks:
+                yield {"type": "guides", "guides": guides}
+
+        summary = self._summary(gene_id, sequence, start, end, total_sites)
+        result = {**summary, "guides": self.rank(pool, top_k, timer)}
+        self._record(timer, result["guides"], baseline)
+        if self.cache is not None:
+            result_key, _ = self._cache_keys(gene_id, start, end, top_k, pool_size)
+            self.cache.results.put(result_key, result)
+        yield {"type": "summary", **result}
@@ -2,45 +2,151 @@
 
 import json
 import os
-from typing import List, Dict, Any
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    candidate_id TEXT NOT NULL,
+    rating REAL NOT NULL,
+    notes TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS candidate_stats (
+    candidate_id TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL
+);
+"""
+
+_UPSERT_STATS = """
+INSERT INTO candidate_stats (candidate_id, count, total) VALUES (?, ?, ?)
+ON CONFLICT(candidate_id) DO UPDATE SET count = count + excluded.count, total = total + excluded.total
+"""
+
 
 class FeedbackManager:
-    """Manages user feedback for RL model updates."""
+    """Manages user feedback for RL model updates.
+
+    Feedback is appended to a SQLite database in WAL mode, so writes are O(1),
+    readers never block writers and several worker processes can share one
+    file. Per-candidate rating aggregates are maintained in the same
+    transaction as each insert. An existing ``feedback_log.json`` from the
+    previous file format is imported while the database is empty; the check
+    and the import share one transaction, so workers starting together
+    import it exactly once.
+    """
 
-    def __init__(self, feedback_file: str = "feedback_log.json"):
+    def __init__(self, feedback_file: str = "feedback_log.db", legacy_file: Optional[str] = "feedback_log.json"):
         self.feedback_file = feedback_file
-        self.feedbacks: List[Dict[str, Any]] = []
-        self.load_feedbacks()
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        if legacy_file and os.path.exists(legacy_file) and self.count() == 0:
+            self.import_json(legacy_file, if_empty=True)
 
-    def load_feedbacks(self):
-        """Load existing feedbacks."""
-        if os.path.exists(self.feedback_file):
-            with open(self.feedback_file, 'r') as f:
-                self.feedbacks = json.load(f)
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection (sqlite3 connections must not be shared across threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.feedback_file, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
 
-    def save_feedbacks(self):
-        """Save feedbacks to file."""
-        with open(self.feedback_file, 'w') as f:
-            json.dump(self.feedbacks, f, indent=2)
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _insert(self, rows: List[tuple], if_empty: bool = False) -> int:
+        """Append rows and fold them into the aggregates in one transaction.
+
+        With ``if_empty`` nothing is written (0 is returned) unless the log is
+        still empty once the write lock is held.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if if_empty and conn.execute("SELECT EXISTS (SELECT 1 FROM feedback)").fetchone()[0]:
+                conn.execute("ROLLBACK")
+                return 0
+            cursor = conn.executemany(
+                "INSERT INTO feedback (candidate_id, rating, notes, timestamp) VALUES (?, ?, ?, ?)", rows
+            )
+            totals: Dict[str, List[float]] = {}
+            for candidate_id, rating, _, _ in rows:
+                stats = totals.setdefault(candidate_id, [0, 0.0])
+                stats[0] += 1
+                stats[1] += rating
+            conn.executemany(_UPSERT_STATS, [(cid, c, t) for cid, (c, t) in totals.items()])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount
 
     def add_feedback(self, candidate_id: str, rating: float, notes: str = ""):
         """Add new feedback."""
-        feedback = {
-            "candidate_id": candidate_id,
-            "rating": rating,
-            "notes": notes,
-            "timestamp": datetime.now().isoformat(),
+        self._insert([(candidate_id, float(rating), notes, datetime.now().isoformat())])
+
+    def import_json(self, path: str, if_empty: bool = False) -> int:
+        """Import a legacy JSON feedback log; returns the number of entries imported.
+
+        With ``if_empty`` the log is only imported into an empty database.
+        """
+        with open(path, 'r') as f:
+            entries = json.load(f)
+        rows = [
+            (e['candidate_id'], float(e['rating']), e.get('notes', ""), e.get('timestamp') or datetime.now().isoformat())
+            for e in entries
+        ]
+        return self._insert(rows, if_empty) if rows else 0
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "candidate_id": row["candidate_id"],
+            "rating": row["rating"],
+            "notes": row["notes"],
+            "timestamp": row["timestamp"],
         }
-        self.feedbacks.append(feedback)
-        self.save_feedbacks()
 
-    def get_recent_feedbacks(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get recent feedbacks for retraining."""
-        return self.feedbacks[-limit:]
+    def count(self) -> int:
+        """Total number of feedback entries."""
+        return self._connection().execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+
+    def get_recent_feedbacks(self, limit: int = 100, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get recent feedbacks for retraining, oldest first.
+
+        Pass the smallest ``id`` of a page as ``before_id`` to fetch the page before it.
+        """
+        query = "SELECT * FROM feedback"
+        params: tuple = ()
+        if before_id is not None:
+            query += " WHERE id < ?"
+            params = (before_id,)
+        rows = self._connection().execute(query + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [self._to_dict(row) for row in reversed(rows)]
+
+    def get_feedbacks_after(self, after_id: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Feedback entries with ``id > after_id``, oldest first (for incremental consumers)."""
+        rows = self._connection().execute(
+            "SELECT * FROM feedback WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
 
     def get_average_rating(self, candidate_id: str) -> float:
         """Get average rating for a candidate."""
-        ratings = [f['rating'] for f in self.feedbacks if f['candidate_id'] == candidate_id]
-        return sum(ratings) / len(ratings) if ratings else 0.0
\ No newline at end of file
+        row = self._connection().execute(
+            "SELECT count, total FROM candidate_stats WHERE candidate_id = ?", (candidate_id,)
+        ).fetchone()
+        return row["total"] / row["count"] if row else 0.0
@@ -1,57 +1,254 @@
-"""RL-based guide optimizer using contextual bandit."""
+"""RL-based guide optimizer using a linear contextual bandit."""
 
-import random
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+import numpy as np
+from ..utils.cache import LRUCache
 from ..utils.config import Config
 from ..scoring.scorer import GuideScorer
+from ..utils.tracing import traced
+from .policy_store import PolicyStore, PolicyState, OffsetUpdate
+
+# Context features and the scale each is divided by before entering the model
+CONTEXT_FEATURES = (
+    ('gc_content', 100.0),
+    ('thermodynamic', 40.0),
+    ('context_weight', 1.0),
+    ('pam_gc', 100.0),
+    ('on_target_score', 1.0),
+    ('off_target_penalty', 1.0),
+    ('composite_score', 1.0),
+)
+# Context dimension: bias term plus the features above
+CONTEXT_DIM = len(CONTEXT_FEATURES) + 1
 
 
 class RLOptimizer:
-    """Reinforcement learning optimizer for guide selection."""
+    """Reinforcement learning optimizer for guide selection.
+
+    A linear contextual bandit over guide feature vectors: expected reward is
+    ``x @ theta`` with a ridge posterior ``theta ~ N(A^-1 b, A^-1)``. The prior
+    mean puts all weight on the scorer's composite score, so an untrained
+    policy ranks like the scorer and feedback learns corrections on top.
+    ``rl_policy`` selects upper-confidence (``linucb``) or Thompson sampling
+    (``thompson``) exploration.
 
-    def __init__(self, config: Config, scorer: GuideScorer):
+    The posterior is replaced, never mutated, on every update, so rankings
+    running on other threads see a consistent ``(A^-1, b)``. With a
+    :class:`PolicyStore` it lives in a file shared by every worker process:
+    updates are atomic across processes, and each ranking picks up the
+    latest version. Without one it is private to this process.
+    """
+
+    def __init__(self, config: Config, scorer: GuideScorer, store: Optional[PolicyStore] = None,
+                 served_cache_size: int = 100_000):
         self.config = config
         self.scorer = scorer
-        self.epsilon = config.rl_params['epsilon']
-        self.learning_rate = config.rl_params['learning_rate']
-        self.guides_memory: Dict[str, float] = {}  # Guide ID -> average reward
-        random.seed(config.seed)
-
-    def _get_guide_id(self, guide: Dict[str, Any]) -> str:
-        """Generate unique ID for guide."""
-        return f"{guide['locus']}_{guide['guide_sequence']}"
-
-    def select_action(self, candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Select guide using epsilon-greedy policy."""
-        if random.random() < self.epsilon or not self.guides_memory:
-            # Explore: random selection
-            return random.choice(candidates)
-
-        # Exploit: select highest average reward
-        best_guide = None
-        best_score = -float('inf')
-        for guide in candidates:
-            gid = self._get_guide_id(guide)
-            score = self.guides_memory.get(gid, 0)
-            if score > best_score:
-                best_score = score
-                best_guide = guide
-        return best_guide or random.choice(candidates)
+        self.policy = config.rl_policy
+        if self.policy not in ('linucb', 'thompson'):
+            raise ValueError(f"Unknown RL policy {self.policy!r}")
+        self.rng = np.random.default_rng(config.seed)
+        self.store = store
+        self.lock = threading.Lock()
+        # Contexts of served guides by candidate ID, when there is no store to keep them
+        self.served = LRUCache(max_entries=served_cache_size) if store is None else None
+        self.offsets: Dict[str, int] = {}  # Consumer offsets, when there is no store to keep them
+        if store is not None:
+            self._state: PolicyState = store.initialize(*self.prior())
+        else:
+            self._state = (0, *self.prior())
+            self.reset()
+
+    @property
+    def ridge(self) -> float:
+        """Prior precision, read from ``config.rl_params`` so updates apply to the next :meth:`reset`."""
+        return float(self.config.rl_params['ridge'])
+
+    def prior(self) -> Tuple[np.ndarray, np.ndarray]:
+        """``(A^-1, b)`` of the prior: all weight on the composite score."""
+        prior = np.zeros(CONTEXT_DIM)
+        prior[1 + [key for key, _ in CONTEXT_FEATURES].index('composite_score')] = 1.0
+        return np.eye(CONTEXT_DIM) / self.ridge, self.ridge * prior
+
+    def reset(self):
+        """Return the policy to its prior."""
+        a_inv, b = self.prior()
+        self.apply(lambda _a_inv, _b: (a_inv, b))
+
+    def apply(self, step: Optional[Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]],
+              offset: Optional[OffsetUpdate] = None) -> bool:
+        """Replace the posterior with ``step(A^-1, b)``, atomically across workers when there is a store.
+
+        ``offset`` advances a consumer offset with the update (see
+        :meth:`PolicyStore.transact`); returns ``False``, changing nothing,
+        if the offset had already moved. A ``step`` of ``None`` only moves
+        the offset.
+        """
+        if self.store is not None:
+            func = None if step is None else lambda current: step(*(current[1:] if current else self.prior()))
+            state = self.store.transact(func, offset)
+            if state is None:
+                return False
+            self._state = state
+            return True
+        with self.lock:
+            if offset is not None:
+                name, expected, new = offset
+                if self.offsets.get(name, 0) != expected:
+                    return False
+                self.offsets[name] = new
+            if step is not None:
+                version, a_inv, b = self._state
+                self._state = (version + 1, *step(a_inv, b))
+        return True
+
+    def offset(self, name: str) -> int:
+        """Current value of a consumer offset (0 if never set)."""
+        if self.store is not None:
+            return self.store.offset(name)
+        with self.lock:
+            return self.offsets.get(name, 0)
+
+    def state(self) -> PolicyState:
+        """``(version, A^-1, b)`` of the latest policy, reloaded when another worker has changed the store."""
+        state = self._state
+        if self.store is not None and self.store.version() != state[0]:
+            state = self._state = self.store.load()
+        return state
+
+    @property
+    def version(self) -> int:
+        """Bumped on every policy change, so cached rankings can tell they are stale."""
+        return self.state()[0]
+
+    @property
+    def A_inv(self) -> np.ndarray:
+        return self.state()[1]
+
+    @property
+    def b(self) -> np.ndarray:
+        return self.state()[2]
+
+    @property
+    def theta(self) -> np.ndarray:
+        """Posterior mean of the reward weights."""
+        _, a_inv, b = self.state()
+        return a_inv @ b
+
+    @staticmethod
+    def context_matrix(columns: Dict[str, Any]) -> np.ndarray:
+        """Build ``(n, CONTEXT_DIM)`` contexts from feature/score columns."""
+        n = len(next(iter(columns.values()))) if columns else 0
+        X = np.ones((n, CONTEXT_DIM))
+        for j, (key, scale) in enumerate(CONTEXT_FEATURES, start=1):
+            X[:, j] = np.asarray(columns[key], dtype=np.float64) / scale if key in columns else 0.0
+        return X
+
+    def guide_contexts(self, guides: List[Dict[str, Any]]) -> np.ndarray:
+        """Contexts for a list of guide dicts."""
+        keys = [key for key, _ in CONTEXT_FEATURES]
+        return self.context_matrix({key: [g.get(key, 0.0) for g in guides] for key in keys})
+
+    def expected_rewards(self, X: np.ndarray) -> np.ndarray:
+        """Posterior-mean reward of each context."""
+        return X @ self.theta
+
+    def selection_scores(self, X: np.ndarray) -> np.ndarray:
+        """Exploration-adjusted scores used for ranking."""
+        alpha = self.config.rl_params['alpha']
+        _, a_inv, b = self.state()
+        theta = a_inv @ b
+        if self.policy == 'thompson' and alpha > 0:
+            theta = self.rng.multivariate_normal(theta, alpha ** 2 * a_inv, method='cholesky')
+            return X @ theta
+        bonus = np.sqrt(np.maximum(((X @ a_inv) * X).sum(axis=1), 0.0))
+        return X @ theta + alpha * bonus
+
+    @traced("optimize.select")
+    def select_top_k(self, X: np.ndarray, top_k: int) -> np.ndarray:
+        """Indices of the ``top_k`` best contexts, best first."""
+        top_k = min(top_k, len(X))
+        if top_k <= 0:
+            return np.empty(0, dtype=np.int64)
+        scores = self.selection_scores(X)
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k] if top_k < len(X) else np.arange(len(X))
+        return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+    def update(self, x: np.ndarray, reward: float):
+        """Rank-one (Sherman-Morrison) posterior update for one observation."""
+        def step(a_inv: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            Ax = a_inv @ x
+            return a_inv - np.outer(Ax, Ax) / (1.0 + x @ Ax), b + reward * x
+        self.apply(step)
+
+    def batch_step(self, a_inv: np.ndarray, b: np.ndarray, X: np.ndarray, rewards: np.ndarray,
+                   decay: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Posterior after a batch of observations, with one inversion instead of one update each.
+
+        Evidence ages by ``decay`` per observation: the old posterior and
+        observation ``i`` of ``n`` are weighted by ``decay ** n`` and
+        ``decay ** (n - 1 - i)``, with the lost weight returned to the prior.
+        ``decay = 1`` gives exactly the sequential :meth:`update` result.
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, CONTEXT_DIM)
+        rewards = np.asarray(rewards, dtype=np.float64)
+        weights = decay ** np.arange(len(X) - 1, -1, -1, dtype=np.float64)
+        kept = decay ** len(X)
+        A = np.linalg.inv(a_inv)
+        if kept < 1.0:
+            prior_a_inv, prior_b = self.prior()
+            A = kept * A + (1 - kept) * np.linalg.inv(prior_a_inv)
+            b = kept * b + (1 - kept) * prior_b
+        A = A + (X * weights[:, None]).T @ X
+        A_inv = np.linalg.inv(A)
+        return (A_inv + A_inv.T) / 2, b + (weights * rewards) @ X
+
+    def update_batch(self, X: np.ndarray, rewards: np.ndarray, decay: float = 1.0,
+                     offset: Optional[OffsetUpdate] = None) -> bool:
+        """Fold a batch of observations into the policy in one atomic swap (see :meth:`batch_step`)."""
+        return self.apply(lambda a_inv, b: self.batch_step(a_inv, b, X, rewards, decay), offset)
 
     def update_policy(self, guide: Dict[str, Any], reward: float):
         """Update policy with feedback."""
-        gid = self._get_guide_id(guide)
-        current = self.guides_memory.get(gid, 0)
-        # Simple moving average update
-        self.guides_memory[gid] = current + self.learning_rate * (reward - current)
+        self.update(self.guide_contexts([guide])[0], reward)
+
+    def remember(self, guides: List[Dict[str, Any]]):
+        """Keep the context each served guide was ranked with, keyed by its ``candidate_id``."""
+        guides = [g for g in guides if 'candidate_id' in g]
+        if not guides:
+            return
+        ids = [g['candidate_id'] for g in guides]
+        X = self.guide_contexts(guides)
+        if self.store is not None:
+            self.store.remember(ids, X)
+        else:
+            for candidate_id, x in zip(ids, X):
+                self.served.put(candidate_id, x)
 
+    def contexts(self, candidate_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Remembered contexts of served candidates (unknown IDs are left out)."""
+        if self.store is not None:
+            return self.store.contexts(candidate_ids)
+        found = {cid: self.served.get(cid) for cid in candidate_ids}
+        return {cid: x for cid, x in found.items() if x is not None}
+
+    def update_from_feedback(self, candidate_id: str, reward: float) -> bool:
+        """Update the policy with a reward for a served candidate; ``False`` if its context is unknown."""
+        x = self.contexts([candidate_id]).get(candidate_id)
+        if x is None:
+            return False
+        self.update(x, reward)
+        return True
+
+    @traced("optimize")
     def optimize_guides(self, candidates: List[Dict[str, Any]], top_k: int = 10) -> List[Dict[str, Any]]:
         """Optimize and rank guides."""
-        selected = []
-        for _ in range(min(top_k, len(candidates))):
-            if not candidates:
-                break
-            guide = self.select_action(candidates)
-            candidates.remove(guide)
-            selected.append(guide)
-        return selected
\ No newline at end of file
+        if not candidates:
+            return []
+        order = self.select_top_k(self.guide_contexts(candidates), top_k)
+        return [candidates[i] for i in order.tolist()]
+
+    @traced("optimize")
+    def optimize_indices(self, columns: Dict[str, np.ndarray], top_k: int = 10) -> np.ndarray:
+        """:meth:`optimize_guides` over feature/score columns: indices of the best rows, best first."""
+        return self.select_top_k(self.context_matrix(columns), top_k)
@@ -0,0 +1,209 @@
+"""Bandit policy state shared by every worker process."""
+
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS policy (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    dim INTEGER NOT NULL,
+    a_inv BLOB NOT NULL,
+    b BLOB NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    version INTEGER PRIMARY KEY,
+    dim INTEGER NOT NULL,
+    a_inv BLOB NOT NULL,
+    b BLOB NOT NULL,
+    created TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contexts (
+    candidate_id TEXT PRIMARY KEY,
+    context BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS offsets (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# (name, expected value, new value) of a consumer offset advanced with a policy update
+OffsetUpdate = Tuple[str, int, int]
+
+# (version, A^-1, b) of a linear bandit posterior
+PolicyState = Tuple[int, np.ndarray, np.ndarray]
+
+
+def _decode(row: sqlite3.Row) -> PolicyState:
+    dim = row["dim"]
+    a_inv = np.frombuffer(row["a_inv"], dtype=np.float64).reshape(dim, dim)
+    return row["version"], a_inv, np.frombuffer(row["b"], dtype=np.float64)
+
+
+def _encode(a_inv: np.ndarray, b: np.ndarray) -> Tuple[int, bytes, bytes]:
+    a_inv = np.ascontiguousarray(a_inv, dtype=np.float64)
+    b = np.ascontiguousarray(b, dtype=np.float64)
+    return len(b), a_inv.tobytes(), b.tobytes()
+
+
+class PolicyStore:
+    """SQLite-backed bandit posterior, shared and updated atomically by all workers.
+
+    One row holds the current ``(version, A^-1, b)``; each update is a
+    read-modify-write inside a ``BEGIN IMMEDIATE`` transaction, so
+    concurrent workers serialize on it and no update is lost. Readers only
+    poll the integer ``version`` and reload the arrays when another worker
+    has changed them. Every ``snapshot_every`` versions the state is copied
+    to a snapshot (the newest ``keep_snapshots`` are kept) that
+    :meth:`restore` can roll back to. Named consumer offsets (such as the
+    last feedback ID folded into the policy) advance in the same
+    transaction as the policy they produced.
+
+    The store also remembers the context vector of every served guide by
+    candidate ID (the newest ``max_contexts``), so feedback on a guide can be
+    joined back to the features it was ranked with.
+    """
+
+    def __init__(self, path: str = "policy_state.db", snapshot_every: int = 100, keep_snapshots: int = 5,
+                 max_contexts: int = 1_000_000):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+        self.max_contexts = max_contexts
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection (sqlite3 connections must not be shared across threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def version(self) -> Optional[int]:
+        """Version of the stored policy, or ``None`` before it is initialized."""
+        row = self._connection().execute("SELECT version FROM policy WHERE id = 1").fetchone()
+        return row[0] if row else None
+
+    def load(self) -> Optional[PolicyState]:
+        """The stored policy, or ``None`` before it is initialized."""
+        row = self._connection().execute("SELECT * FROM policy WHERE id = 1").fetchone()
+        return _decode(row) if row else None
+
+    def _write(self, conn: sqlite3.Connection, version: int, a_inv: np.ndarray, b: np.ndarray):
+        now = datetime.now().isoformat()
+        conn.execute("INSERT OR REPLACE INTO policy (id, version, dim, a_inv, b, updated) VALUES (1, ?, ?, ?, ?, ?)",
+                     (version, *_encode(a_inv, b), now))
+        if self.snapshot_every and version % self.snapshot_every == 0:
+            conn.execute("INSERT OR REPLACE INTO snapshots (version, dim, a_inv, b, created) VALUES (?, ?, ?, ?, ?)",
+                         (version, *_encode(a_inv, b), now))
+            conn.execute("DELETE FROM snapshots WHERE version NOT IN "
+                         "(SELECT version FROM snapshots ORDER BY version DESC LIMIT ?)", (self.keep_snapshots,))
+
+    def offset(self, name: str) -> int:
+        """Current value of a consumer offset (0 if never set)."""
+        row = self._connection().execute("SELECT value FROM offsets WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def transact(self, func: Optional[Callable[[Optional[PolicyState]], Tuple[np.ndarray, np.ndarray]]],
+                 offset: Optional[OffsetUpdate] = None) -> Optional[PolicyState]:
+        """Atomically replace the policy with ``func(current_state)``; returns the new state.
+
+        ``func`` gets ``None`` when the store is empty. The version increases
+        by one on every write. With ``offset = (name, expected, new)`` the
+        named offset moves to ``new`` in the same transaction, and nothing is
+        written (``None`` is returned) if it no longer equals ``expected``,
+        i.e. another worker consumed the same input first. A ``func`` of
+        ``None`` only moves the offset and returns the unchanged state.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if offset is not None:
+                name, expected, new = offset
+                row = conn.execute("SELECT value FROM offsets WHERE name = ?", (name,)).fetchone()
+                if (row[0] if row else 0) != expected:
+                    conn.execute("ROLLBACK")
+                    return None
+                conn.execute("INSERT OR REPLACE INTO offsets (name, value) VALUES (?, ?)", (name, new))
+            row = conn.execute("SELECT * FROM policy WHERE id = 1").fetchone()
+            current = _decode(row) if row else None
+            if func is None:
+                conn.execute("COMMIT")
+                return current
+            a_inv, b = func(current)
+            version = (current[0] if current else 0) + 1
+            self._write(conn, version, a_inv, b)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return version, np.asarray(a_inv, dtype=np.float64), np.asarray(b, dtype=np.float64)
+
+    def initialize(self, a_inv: np.ndarray, b: np.ndarray) -> PolicyState:
+        """The stored policy, writing ``(a_inv, b)`` first if the store is empty (warm start)."""
+        state = self.load()
+        if state is not None:
+            return state
+        return self.transact(lambda current: (current[1], current[2]) if current else (a_inv, b))
+
+    def snapshots(self) -> List[int]:
+        """Versions of the kept snapshots, newest first."""
+        rows = self._connection().execute("SELECT version FROM snapshots ORDER BY version DESC").fetchall()
+        return [row[0] for row in rows]
+
+    def restore(self, version: Optional[int] = None) -> PolicyState:
+        """Roll the policy back to a snapshot (the newest by default), as a new version."""
+        query = "SELECT * FROM snapshots" + (" WHERE version = ?" if version is not None else "")
+        row = self._connection().execute(query + " ORDER BY version DESC LIMIT 1",
+                                         () if version is None else (version,)).fetchone()
+        if row is None:
+            raise KeyError("No policy snapshot" + (f" at version {version}" if version is not None else ""))
+        _, a_inv, b = _decode(row)
+        return self.transact(lambda current: (a_inv, b))
+
+    def remember(self, candidate_ids: Sequence[str], contexts: np.ndarray):
+        """Record the context each candidate was served with."""
+        if not len(candidate_ids):
+            return
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO contexts (candidate_id, context) VALUES (?, ?)",
+                             [(cid, np.asarray(x, dtype=np.float64).tobytes())
+                              for cid, x in zip(candidate_ids, contexts)])
+            # Replacing a row gives it a new rowid, so the oldest rows are the least recently served
+            conn.execute("DELETE FROM contexts WHERE rowid <= (SELECT MAX(rowid) FROM contexts) - ?",
+                         (self.max_contexts,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def contexts(self, candidate_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Remembered contexts of the given candidates (unknown IDs are left out)."""
+        found: Dict[str, np.ndarray] = {}
+        conn = self._connection()
+        ids = list(dict.fromkeys(candidate_ids))
+        for start in range(0, len(ids), 500):  # Stay below SQLite's bound-parameter limit
+            batch = ids[start:start + 500]
+            rows = conn.execute(f"SELECT candidate_id, context FROM contexts WHERE candidate_id IN "
+                                f"({','.join('?' * len(batch))})", batch).fetchall()
+            found.update((row[0], np.frombuffer(row[1], dtype=np.float64)) for row in rows)
+        return found
@@ -1,11 +1,27 @@
 """Pareto-aware reranker for guide diversity."""
 
-from typing import List, Dict, Any
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Sequence, Tuple
 import numpy as np
+from ..utils.tracing import traced
+
+# (feature key, maximize?) pairs ranked by default
+DEFAULT_OBJECTIVES: Tuple[Tuple[str, bool], ...] = (
+    ('on_target_score', True),
+    ('off_target_penalty', False),
+)
 
 
 class ParetoReranker:
-    """Reranks guides for diversity using Pareto front."""
+    """Reranks guides for diversity using Pareto fronts.
+
+    Objective arrays are ``(n, m)`` with every column oriented so that larger
+    is better; :meth:`objective_matrix` builds one from guide dicts and
+    :meth:`column_objectives` from feature/score columns.
+    """
+
+    def __init__(self, objectives: Sequence[Tuple[str, bool]] = DEFAULT_OBJECTIVES):
+        self.objectives = tuple(objectives)
 
     @staticmethod
     def dominates(a: Dict[str, float], b: Dict[str, float]) -> bool:
@@ -16,25 +32,261 @@ class ParetoReranker:
         b_off = b.get('off_target_penalty', 0)
         return a_on >= b_on and a_off <= b_off and (a_on > b_on or a_off < b_off)
 
+    def objective_matrix(self, guides: List[Dict[str, Any]]) -> np.ndarray:
+        """Stack guide objectives into a maximization-oriented ``(n, m)`` array."""
+        columns = [
+            np.array([g.get(key, 0) for g in guides], dtype=np.float64) * (1 if maximize else -1)
+            for key, maximize in self.objectives
+        ]
+        return np.column_stack(columns) if columns else np.empty((len(guides), 0))
+
+    def column_objectives(self, columns: Dict[str, np.ndarray], n: int) -> np.ndarray:
+        """:meth:`objective_matrix` for ``n`` rows of feature/score columns."""
+        objectives = [
+            (np.asarray(columns[key], dtype=np.float64) if key in columns else np.zeros(n)) * (1 if maximize else -1)
+            for key, maximize in self.objectives
+        ]
+        return np.column_stack(objectives) if objectives else np.empty((n, 0))
+
+    @staticmethod
+    def _lex_order(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Decreasing lexicographic order, and which sorted rows repeat their predecessor.
+
+        In this order a point can only be dominated by points before it, and
+        exact duplicates are adjacent.
+        """
+        order = np.lexsort(tuple(-points[:, j] for j in range(points.shape[1] - 1, -1, -1)))
+        ordered = points[order]
+        repeat = np.zeros(len(points), dtype=bool)
+        repeat[1:] = (ordered[1:] == ordered[:-1]).all(axis=1)
+        return order, repeat
+
+    @staticmethod
+    def pareto_front_indices(points: np.ndarray) -> np.ndarray:
+        """Indices of the non-dominated points (first front)."""
+        points = np.asarray(points, dtype=np.float64)
+        if len(points) == 0:
+            return np.empty(0, dtype=np.int64)
+        if points.shape[1] != 2:
+            return np.flatnonzero(ParetoReranker.non_dominated_sort(points) == 0)
+        # Sweep in decreasing first objective: a point is non-dominated iff it
+        # beats every earlier second objective (duplicates share the verdict).
+        order, repeat = ParetoReranker._lex_order(points)
+        second = points[order, 1]
+        best_before = np.empty(len(second))
+        best_before[0] = -np.inf
+        np.maximum.accumulate(second[:-1], out=best_before[1:])
+        keep = second > best_before
+        keep = keep[np.maximum.accumulate(np.where(repeat, 0, np.arange(len(keep))))]
+        return np.sort(order[keep])
+
+    @staticmethod
+    def _divide_and_conquer_ranks(points: np.ndarray, leaf: int = 64, brute_pairs: int = 1 << 16) -> np.ndarray:
+        """Front ranks of distinct points given in decreasing lexicographic order.
+
+        Jensen's divide and conquer, with Fortin's handling of ties: a point's
+        rank is one more than the highest rank among the points dominating it.
+        The first half of a block is ranked, lifts the ranks of the points of
+        the second half it dominates, then the second half is ranked. Lifting
+        splits both halves at the median of one objective; the high part of
+        the first half is at least as good as the low part of the second on
+        that objective, so it is dropped between them. Objectives the first
+        half always wins are dropped and ones it never reaches end the search,
+        a single objective left is a sorted sweep, and small problems are
+        compared all-pairs, giving O(n log^(m-1) n) vectorized steps.
+        """
+        n = len(points)
+        ranks = np.zeros(n, dtype=np.int64)
+        # Twice each point's dense rank per objective, best first; adding one
+        # marks a point being lifted, so it sorts after equal points lifting it
+        keys = np.column_stack([
+            2 * np.unique(-points[:, j], return_inverse=True)[1].reshape(-1) for j in range(points.shape[1])
+        ]) if n else np.empty((0, points.shape[1]), dtype=np.int64)
+
+        def covers(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+            # covered[i, k]: a[i] >= b[k] on every column, built a column at a time
+            covered = a[:, None, 0] >= b[None, :, 0]
+            for j in range(1, a.shape[1]):
+                covered &= a[:, None, j] >= b[None, :, j]
+            return covered
+
+        def lift(first: np.ndarray, second: np.ndarray, objectives: List[int]):
+            # Raise ranks[second] above every point of `first` dominating it; `first`
+            # is already at least as good on every objective not in `objectives`
+            if len(first) == 0 or len(second) == 0:
+                return
+            a, b = points[first][:, objectives], points[second][:, objectives]
+            if (a.max(axis=0) < b.min(axis=0)).any():
+                return
+            undecided = a.min(axis=0) < b.max(axis=0)
+            objectives = [j for j, keep in zip(objectives, undecided.tolist()) if keep]
+            if not objectives:
+                ranks[second] = np.maximum(ranks[second], ranks[first].max() + 1)
+                return
+            if len(objectives) == 1:
+                # Sweep: the best rank among `first` points at least as good on the one objective
+                j = objectives[0]
+                by_key = np.argsort(keys[first, j], kind='stable')
+                best = np.maximum.accumulate(ranks[first[by_key]])
+                reach = np.searchsorted(keys[first[by_key], j], keys[second, j], side='right')
+                lifted = np.where(reach > 0, best[np.maximum(reach - 1, 0)] + 1, 0)
+                ranks[second] = np.maximum(ranks[second], lifted)
+                return
+            if len(first) * len(second) <= brute_pairs:
+                dominated = covers(a[:, undecided], b[:, undecided])
+                lifted = np.where(dominated, ranks[first][:, None] + 1, 0).max(axis=0)
+                ranks[second] = np.maximum(ranks[second], lifted)
+                return
+            j = objectives[-1]
+            from_second = np.arange(len(first) + len(second)) >= len(first)
+            # Ties put `first` ahead, so a dominating point is never split below its target
+            order = np.argpartition(np.concatenate([keys[first, j], keys[second, j] + 1]), len(from_second) // 2)
+            high, low = order[:len(order) // 2], order[len(order) // 2:]
+            high_first, high_second = first[high[~from_second[high]]], second[high[from_second[high]] - len(first)]
+            low_first, low_second = first[low[~from_second[low]]], second[low[from_second[low]] - len(first)]
+            lift(high_first, high_second, objectives)
+            lift(low_first, low_second, objectives)
+            lift(high_first, low_second, objectives[:-1])
+
+        def solve(start: int, stop: int):
+            if stop - start <= leaf:
+                block = points[start:stop]
+                dominates = np.triu(covers(block, block), 1)
+                # Longest chain of dominators, one step per pass
+                while True:
+                    lifted = np.maximum(ranks[start:stop], np.where(
+                        dominates, ranks[start:stop, None] + 1, 0).max(axis=0))
+                    if (lifted == ranks[start:stop]).all():
+                        return
+                    ranks[start:stop] = lifted
+            mid = (start + stop) // 2
+            solve(start, mid)
+            lift(np.arange(start, mid), np.arange(mid, stop), list(range(1, points.shape[1])))
+            solve(mid, stop)
+
+        solve(0, n)
+        return ranks
+
+    @staticmethod
+    @traced("rerank.sort")
+    def non_dominated_sort(points: np.ndarray) -> np.ndarray:
+        """Front rank (0 = non-dominated) of every point.
+
+        Points are visited in decreasing lexicographic order, so each can only
+        be dominated by points already placed, and the front of each point is
+        found by binary search over the fronts built so far. With two
+        objectives a front is summarised by its best second objective and with
+        three by a staircase of its members, giving O(n log^2 n) at most; more
+        objectives are ranked by :meth:`_divide_and_conquer_ranks`.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        n = len(points)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        order, repeat = ParetoReranker._lex_order(points)
+        distinct = order[~repeat]
+        distinct_ranks = np.empty(len(distinct), dtype=np.int64)
+
+        if points.shape[1] == 2:
+            # keys[k] = -(best second objective in front k), kept ascending
+            keys: List[float] = []
+            for i, value in enumerate((-points[distinct, 1]).tolist()):
+                k = bisect_right(keys, value)
+                if k == len(keys):
+                    keys.append(value)
+                else:
+                    keys[k] = value
+                distinct_ranks[i] = k
+        elif points.shape[1] == 3:
+            # Each front keeps the staircase of its members projected onto
+            # objectives 2 and 3: ascending objective 2 (stairs_x) with
+            # descending objective 3 (stored negated, ascending, in stairs_y).
+            stairs_x: List[List[float]] = []
+            stairs_y: List[List[float]] = []
+            for i, (_, x, y) in enumerate(points[distinct].tolist()):
+                lo, hi = 0, len(stairs_x)
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    j = bisect_left(stairs_x[mid], x)
+                    if j < len(stairs_x[mid]) and -stairs_y[mid][j] >= y:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                if lo == len(stairs_x):
+                    stairs_x.append([])
+                    stairs_y.append([])
+                xs, ys = stairs_x[lo], stairs_y[lo]
+                end = bisect_right(xs, x)
+                start = bisect_left(ys, -y, 0, bisect_left(xs, x))
+                xs[start:end] = [x]
+                ys[start:end] = [-y]
+                distinct_ranks[i] = lo
+        else:
+            distinct_ranks = ParetoReranker._divide_and_conquer_ranks(points[distinct])
+
+        # Duplicates take the rank of the distinct point they repeat
+        sorted_ranks = distinct_ranks[np.cumsum(~repeat) - 1]
+        ranks = np.empty(n, dtype=np.int64)
+        ranks[order] = sorted_ranks
+        return ranks
+
+    @staticmethod
+    def crowding_distance(points: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+        """NSGA-II crowding distance of each point within its own front."""
+        points = np.asarray(points, dtype=np.float64)
+        n = len(points)
+        distance = np.zeros(n, dtype=np.float64)
+        if n == 0:
+            return distance
+        for j in range(points.shape[1]):
+            values = points[:, j]
+            order = np.lexsort((values, ranks))
+            sorted_ranks = ranks[order]
+            sorted_values = values[order]
+            first = np.concatenate([[True], sorted_ranks[1:] != sorted_ranks[:-1]])
+            last = np.concatenate([sorted_ranks[1:] != sorted_ranks[:-1], [True]])
+            # Objective range of each front, broadcast back to its members
+            front_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+            front_end = np.minimum.accumulate(np.where(last, np.arange(n), n)[::-1])[::-1]
+            span = sorted_values[front_end] - sorted_values[front_start]
+            gap = np.zeros(n)
+            interior = ~(first | last)
+            gap[interior] = sorted_values[2:][interior[1:-1]] - sorted_values[:-2][interior[1:-1]]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                contribution = np.where(span > 0, gap / span, 0.0)
+            contribution[first | last] = np.inf
+            distance[order] += contribution
+        return distance
+
+    def rank_indices(self, points: np.ndarray, tiebreak: np.ndarray = None, top_k: int = None) -> np.ndarray:
+        """Order points by front, then crowding distance, then ``tiebreak`` (all best first)."""
+        points = np.asarray(points, dtype=np.float64)
+        ranks = self.non_dominated_sort(points)
+        crowding = self.crowding_distance(points, ranks)
+        if tiebreak is None:
+            tiebreak = np.zeros(len(points))
+        order = np.lexsort((-np.asarray(tiebreak, dtype=np.float64), -crowding, ranks))
+        return order if top_k is None else order[:top_k]
+
     def pareto_front(self, guides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Extract Pareto front."""
-        front = []
-        for guide in guides:
-            dominated = False
-            front[:] = [f for f in front if not self.dominates(guide, f)]
-            if not any(self.dominates(f, guide) for f in front):
-                front.append(guide)
-        return front
+        if not guides:
+            return []
+        return [guides[i] for i in self.pareto_front_indices(self.objective_matrix(guides))]
 
+    @traced("rerank")
     def rerank(self, guides: List[Dict[str, Any]], top_k: int = 10) -> List[Dict[str, Any]]:
-        """Rerank for diversity."""
-        if len(guides) <= top_k:
-            return guides
-        front = self.pareto_front(guides)
-        if len(front) >= top_k:
-            return front[:top_k]
-        # Add remaining guides sorted by composite score
-        remaining = [g for g in guides if g not in front]
-        remaining.sort(key=lambda x: x.get('composite_score', 0), reverse=True)
-        front.extend(remaining[:top_k - len(front)])
-        return front
\ No newline at end of file
+        """Rerank for diversity: earlier fronts first, spread-out guides first within a front."""
+        if not guides:
+            return []
+        composite = np.array([g.get('composite_score', 0) for g in guides], dtype=np.float64)
+        order = self.rank_indices(self.objective_matrix(guides), composite, top_k)
+        return [guides[i] for i in order.tolist()]
+
+    @traced("rerank")
+    def rerank_indices(self, columns: Dict[str, np.ndarray], n: int, top_k: int = 10) -> np.ndarray:
+        """:meth:`rerank` over ``n`` rows of feature/score columns, as indices best first."""
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        composite = columns['composite_score'] if 'composite_score' in columns else np.zeros(n)
+        return self.rank_indices(self.column_objectives(columns, n), composite, top_k)
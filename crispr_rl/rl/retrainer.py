@@ -0,0 +1,140 @@
+"""Background policy retraining from the feedback log."""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from ..utils.config import Config
+from .feedback_manager import FeedbackManager
+from .optimizer import RLOptimizer, CONTEXT_DIM
+
+logger = logging.getLogger(__name__)
+
+# Name of the offset recording the last feedback ID folded into the policy
+FEEDBACK_OFFSET = "feedback"
+
+
+class PolicyRetrainer:
+    """Folds submitted feedback into the policy in batches, off the request path.
+
+    Each round tails the feedback log from the last applied entry ID, joins
+    every rating to the context its guide was served with (by
+    ``candidate_id``, see :meth:`RLOptimizer.remember`), and applies up to
+    ``batch_size`` of them as one :meth:`RLOptimizer.update_batch`. The
+    offset advances in the same atomic swap as the new posterior, so when
+    several workers share a :class:`PolicyStore` and each runs a retrainer,
+    every entry is applied exactly once. Ratings of candidates that were never
+    served, or whose context has aged out, are skipped.
+
+    Evidence is discounted by ``config.rl_params['decay']`` per observation;
+    :meth:`replay` rebuilds the policy from the prior over the whole log,
+    e.g. after the decay or the context features change.
+    """
+
+    def __init__(self, optimizer: RLOptimizer, feedback_manager: FeedbackManager, config: Config,
+                 interval: Optional[float] = None, batch_size: Optional[int] = None):
+        self.optimizer = optimizer
+        self.feedback_manager = feedback_manager
+        self.config = config
+        self.interval = interval if interval is not None else config.rl_retrain_interval
+        self.batch_size = batch_size or config.rl_retrain_batch
+        self.lock = threading.Lock()  # One round at a time in this process
+        self.applied = 0
+        self.skipped = 0
+        self.rounds = 0
+        self.last_round: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def decay(self) -> float:
+        return float(self.config.rl_params.get('decay', 1.0))
+
+    def _join(self, entries: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Contexts and normalized rewards of the entries whose candidate was served."""
+        contexts = self.optimizer.contexts([e['candidate_id'] for e in entries])
+        rows = [(contexts[e['candidate_id']], e['rating'] / 5.0) for e in entries if e['candidate_id'] in contexts]
+        if not rows:
+            return np.empty((0, CONTEXT_DIM)), np.empty(0)
+        X, rewards = zip(*rows)
+        return np.array(X), np.array(rewards)
+
+    def run_once(self) -> int:
+        """Apply all feedback past the stored offset; returns the number of ratings applied."""
+        applied = 0
+        with self.lock:
+            while True:
+                offset = self.optimizer.offset(FEEDBACK_OFFSET)
+                entries = self.feedback_manager.get_feedbacks_after(offset, self.batch_size)
+                if not entries:
+                    break
+                X, rewards = self._join(entries)
+                advance = (FEEDBACK_OFFSET, offset, entries[-1]['id'])
+                step = None
+                if len(X):
+                    step = lambda a_inv, b: self.optimizer.batch_step(a_inv, b, X, rewards, self.decay)
+                if not self.optimizer.apply(step, advance):
+                    continue  # Another worker applied this batch; re-read the offset
+                applied += len(X)
+                self.skipped += len(entries) - len(X)
+                if len(entries) < self.batch_size:
+                    break
+            self.applied += applied
+            self.rounds += 1
+            self.last_round = time.time()
+        return applied
+
+    def replay(self) -> int:
+        """Rebuild the policy from the prior over the whole feedback log; returns the ratings applied."""
+        with self.lock:
+            while True:
+                offset = self.optimizer.offset(FEEDBACK_OFFSET)
+                parts, last = [], 0
+                while True:
+                    entries = self.feedback_manager.get_feedbacks_after(last, self.batch_size)
+                    if not entries:
+                        break
+                    parts.append(self._join(entries))
+                    last = entries[-1]['id']
+                X = np.concatenate([X for X, _ in parts]) if parts else np.empty((0, CONTEXT_DIM))
+                rewards = np.concatenate([r for _, r in parts]) if parts else np.empty(0)
+                step = lambda _a_inv, _b: self.optimizer.batch_step(*self.optimizer.prior(), X, rewards, self.decay)
+                if self.optimizer.apply(step, (FEEDBACK_OFFSET, offset, max(last, offset))):
+                    return len(X)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Policy retraining round failed")
+        self.feedback_manager.close()
+        if self.optimizer.store is not None:
+            self.optimizer.store.close()
+
+    def start(self):
+        """Run :meth:`run_once` every ``interval`` seconds on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="policy-retrainer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Stop the background thread (a round in progress finishes first)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Progress counters of this process's retrainer."""
+        return {
+            'offset': self.optimizer.offset(FEEDBACK_OFFSET),
+            'policy_version': self.optimizer.version,
+            'applied': self.applied,
+            'skipped': self.skipped,
+            'rounds': self.rounds,
+            'last_round': self.last_round,
+        }
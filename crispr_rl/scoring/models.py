@@ -0,0 +1,240 @@
+"""Learned on-target models served from memory-mapped weight files.
+
+A model is a directory holding ``model.json`` (kind, context layout and
+scalar parameters) and one ``.npy`` file per weight array. Arrays are opened
+with ``mmap_mode='r'``, so processes serving the same model share its pages,
+and :func:`load_model` opens each directory once per process.
+
+Models score encoded context windows: the protospacer and PAM plus
+``flank5``/``flank3`` bases on either side, read 5'->3' on the guide's
+strand (the 30-mer of Rule Set 2 for SpCas9 is ``flank5=4, flank3=3``).
+Bases outside the sequence are unknown (code 4) and contribute nothing.
+"""
+
+import abc
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from ..utils.encoding import UNKNOWN
+
+METADATA_FILE = "model.json"
+FORMAT_VERSION = 1
+# Guides scored per inference batch; bounds the temporaries of convolutional models
+DEFAULT_BATCH_SIZE = 8192
+# Largest k-mer response table a convolutional model precomputes (bytes)
+KMER_TABLE_BYTES = 1 << 24
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-x))
+
+
+def _with_unknown_row(weights: np.ndarray) -> np.ndarray:
+    """Append a zero row so base code 4 (unknown) indexes a null weight."""
+    weights = np.asarray(weights, dtype=np.float32)
+    return np.concatenate([weights, np.zeros((1,) + weights.shape[1:], dtype=np.float32)])
+
+
+class OnTargetModel(abc.ABC):
+    """Base class: predicts on-target activity in ``[0, 1]`` from context windows."""
+
+    kind: str = ''
+    arrays: Tuple[str, ...] = ()
+
+    def __init__(self, model_dir: str, metadata: Dict[str, Any]):
+        self.model_dir = model_dir
+        self.metadata = metadata
+        self.flank5: int = metadata['flank5']
+        self.flank3: int = metadata['flank3']
+        self.guide_length: int = metadata['guide_length']
+        self.pam_length: int = metadata['pam_length']
+        self.context_length = self.flank5 + self.guide_length + self.pam_length + self.flank3
+        self.weights = {name: np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode='r')
+                        for name in self.arrays}
+
+    def accepts(self, guide_length: int, pam_length: int) -> bool:
+        """Whether sites of this guide and PAM length match the model's context layout."""
+        return (guide_length, pam_length) == (self.guide_length, self.pam_length)
+
+    def predict(self, contexts: np.ndarray, batch_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+        """Scores for rows of encoded contexts (``(n, context_length)`` base codes)."""
+        contexts = np.asarray(contexts, dtype=np.uint8)
+        if contexts.ndim != 2 or contexts.shape[1] != self.context_length:
+            raise ValueError(f"Expected contexts of width {self.context_length}, got shape {contexts.shape}")
+        scores = np.empty(len(contexts), dtype=np.float64)
+        for start in range(0, len(contexts), batch_size):
+            scores[start:start + batch_size] = self._predict_batch(contexts[start:start + batch_size])
+        return scores
+
+    @abc.abstractmethod
+    def _predict_batch(self, contexts: np.ndarray) -> np.ndarray:
+        """Scores for one batch of at most ``batch_size`` contexts."""
+
+
+class LinearModel(OnTargetModel):
+    """Position-specific nucleotide and dinucleotide weights with a logistic link (Rule Set 1/2 style).
+
+    Arrays: ``position_weights`` ``(L, 4)`` and optionally
+    ``dinucleotide_weights`` ``(L - 1, 16)``; metadata: ``intercept`` and
+    ``link`` (``logistic`` or ``identity``, clipped to [0, 1]).
+    """
+
+    kind = 'linear'
+    arrays = ('position_weights',)
+
+    def __init__(self, model_dir: str, metadata: Dict[str, Any]):
+        if os.path.exists(os.path.join(model_dir, 'dinucleotide_weights.npy')):
+            self.arrays = self.arrays + ('dinucleotide_weights',)
+        super().__init__(model_dir, metadata)
+        length = self.context_length
+        # Flattened lookup tables: one gather per position instead of a one-hot matmul
+        self._positions = _with_unknown_row(self.weights['position_weights'].T).T.reshape(-1)
+        self._position_offsets = np.arange(length, dtype=np.intp) * 5
+        self._dinucleotides = None
+        if 'dinucleotide_weights' in self.weights:
+            table = np.zeros((length - 1, 25), dtype=np.float32)
+            codes = np.arange(16)
+            table[:, 5 * (codes // 4) + codes % 4] = self.weights['dinucleotide_weights']
+            self._dinucleotides = table.reshape(-1)
+            self._dinucleotide_offsets = np.arange(length - 1, dtype=np.intp) * 25
+        self.intercept = float(metadata.get('intercept', 0.0))
+        self.link = metadata.get('link', 'logistic')
+
+    def _predict_batch(self, contexts: np.ndarray) -> np.ndarray:
+        codes = contexts.astype(np.intp)
+        total = self._positions[codes + self._position_offsets].sum(axis=1, dtype=np.float64)
+        if self._dinucleotides is not None:
+            pairs = codes[:, :-1] * 5 + codes[:, 1:]
+            total += self._dinucleotides[pairs + self._dinucleotide_offsets].sum(axis=1, dtype=np.float64)
+        total += self.intercept
+        return _sigmoid(total) if self.link == 'logistic' else np.clip(total, 0.0, 1.0)
+
+
+class ConvModel(OnTargetModel):
+    """Small 1-D CNN: convolution, ReLU, global max pool, one hidden layer, sigmoid output.
+
+    Arrays: ``conv_weights`` ``(filters, width, 4)``, ``conv_bias``
+    ``(filters,)``, ``dense_weights`` ``(filters, hidden)``, ``dense_bias``
+    ``(hidden,)``, ``output_weights`` ``(hidden,)``; metadata: ``output_bias``.
+    The convolution is a table lookup over the base codes, so no one-hot
+    tensor is built: for narrow filters, the response of every possible
+    k-mer is precomputed and each position costs one gather; otherwise one
+    gather per filter tap is summed.
+    """
+
+    kind = 'cnn'
+    arrays = ('conv_weights', 'conv_bias', 'dense_weights', 'dense_bias', 'output_weights')
+
+    def __init__(self, model_dir: str, metadata: Dict[str, Any]):
+        super().__init__(model_dir, metadata)
+        conv = np.asarray(self.weights['conv_weights'], dtype=np.float32)
+        # taps[t][code] is the (filters,) response of tap t to one base
+        self._taps = [_with_unknown_row(conv[:, t, :].T) for t in range(conv.shape[1])]
+        self.width = conv.shape[1]
+        self._kmers = None
+        if 5 ** self.width * conv.shape[0] * 4 <= KMER_TABLE_BYTES:
+            # Row k is the response to the k-mer whose base codes are k's base-5 digits
+            digits = np.indices((5,) * self.width).reshape(self.width, -1)
+            self._kmers = sum(tap[digits[t]] for t, tap in enumerate(self._taps))
+            self._kmers += np.asarray(self.weights['conv_bias'], dtype=np.float32)
+        self.output_bias = float(metadata.get('output_bias', 0.0))
+
+    def _convolve(self, contexts: np.ndarray) -> np.ndarray:
+        positions = contexts.shape[1] - self.width + 1
+        if self._kmers is not None:
+            codes = contexts.astype(np.intp)
+            kmers = codes[:, :positions].copy()
+            for t in range(1, self.width):
+                kmers *= 5
+                kmers += codes[:, t:t + positions]
+            return self._kmers[kmers]
+        response = self._taps[0][contexts[:, :positions]]
+        for t in range(1, self.width):
+            response += self._taps[t][contexts[:, t:t + positions]]
+        response += self.weights['conv_bias']
+        return response
+
+    def _predict_batch(self, contexts: np.ndarray) -> np.ndarray:
+        response = self._convolve(contexts)
+        pooled = np.maximum(response.max(axis=1), 0)  # max pool then ReLU (they commute)
+        hidden = np.maximum(pooled @ self.weights['dense_weights'] + self.weights['dense_bias'], 0)
+        return _sigmoid(hidden @ self.weights['output_weights'] + self.output_bias)
+
+
+MODELS = {model.kind: model for model in (LinearModel, ConvModel)}
+
+_loaded: Dict[str, OnTargetModel] = {}
+_load_lock = threading.Lock()
+
+
+def load_model(model_dir: str) -> OnTargetModel:
+    """Open a saved model, reusing the instance already open in this process."""
+    key = os.path.realpath(model_dir)
+    with _load_lock:
+        model = _loaded.get(key)
+        if model is None:
+            with open(os.path.join(model_dir, METADATA_FILE), 'r') as f:
+                metadata = json.load(f)
+            if metadata.get('format_version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported on-target model format in {model_dir}")
+            if metadata.get('kind') not in MODELS:
+                raise ValueError(f"Unknown on-target model kind {metadata.get('kind')!r} in {model_dir}")
+            model = _loaded[key] = MODELS[metadata['kind']](model_dir, metadata)
+        return model
+
+
+def save_model(model_dir: str, kind: str, arrays: Dict[str, np.ndarray], guide_length: int = 20,
+               pam_length: int = 3, flank5: int = 4, flank3: int = 3, **params) -> OnTargetModel:
+    """Write a model directory (weights as ``.npy``, the rest as JSON) and open it."""
+    if kind not in MODELS:
+        raise ValueError(f"Unknown on-target model kind {kind!r}")
+    os.makedirs(model_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(model_dir, f"{name}.npy"), np.asarray(array, dtype=np.float32))
+    metadata = {
+        'format_version': FORMAT_VERSION,
+        'kind': kind,
+        'guide_length': guide_length,
+        'pam_length': pam_length,
+        'flank5': flank5,
+        'flank3': flank3,
+        **params,
+    }
+    with open(os.path.join(model_dir, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    with _load_lock:
+        _loaded.pop(os.path.realpath(model_dir), None)
+    return load_model(model_dir)
+
+
+def fit_linear_model(contexts: np.ndarray, activity: np.ndarray, model_dir: str, ridge: float = 1.0,
+                     dinucleotides: bool = True, guide_length: int = 20, pam_length: int = 3,
+                     flank5: int = 4, flank3: int = 3) -> LinearModel:
+    """Fit a :class:`LinearModel` to measured activities in ``[0, 1]`` by ridge regression on the logit."""
+    contexts = np.asarray(contexts, dtype=np.intp)
+    n, length = contexts.shape
+    columns = [np.eye(5, dtype=np.float64)[contexts][:, :, :4].reshape(n, -1)]
+    if dinucleotides:
+        pairs = np.where((contexts[:, :-1] < UNKNOWN) & (contexts[:, 1:] < UNKNOWN),
+                         contexts[:, :-1] * 4 + contexts[:, 1:], 16)
+        columns.append(np.eye(17, dtype=np.float64)[pairs][:, :, :16].reshape(n, -1))
+    X = np.hstack([np.ones((n, 1))] + columns)
+    y = np.clip(np.asarray(activity, dtype=np.float64), 1e-3, 1 - 1e-3)
+    y = np.log(y / (1 - y))
+    penalty = ridge * np.eye(X.shape[1])
+    penalty[0, 0] = 0.0  # Leave the intercept unpenalized
+    w = np.linalg.solve(X.T @ X + penalty, X.T @ y)
+    arrays = {'position_weights': w[1:1 + 4 * length].reshape(length, 4)}
+    if dinucleotides:
+        arrays['dinucleotide_weights'] = w[1 + 4 * length:].reshape(length - 1, 16)
+    return save_model(model_dir, 'linear', arrays, guide_length, pam_length, flank5, flank3,
+                      intercept=float(w[0]), link='logistic')
+
+
+def on_target_model(name: Optional[str]) -> Optional[OnTargetModel]:
+    """The model selected by ``Config.on_target_model``: ``None`` for ``heuristic``, else a model directory."""
+    if not name or name == 'heuristic':
+        return None
+    return load_model(name)
@@ -2,25 +2,64 @@
 
 from typing import Dict, Any
 import random
+import numpy as np
 from ..utils.config import Config
+from ..utils.tracing import traced
+from .models import on_target_model
+from .specificity import specificity_model
+
+# Guide hybrid stability (-dG, kcal/mol) mapped linearly onto a [0, 1] on-target term
+THERMO_RANGE = (10.0, 30.0)
 
 
 class GuideScorer:
-    """Scores CRISPR guides for efficiency."""
+    """Scores CRISPR guides for efficiency.
+
+    On-target activity comes from the learned model named by
+    ``config.on_target_model`` (see :mod:`crispr_rl.scoring.models`) for
+    guides that carry a ``context_codes`` feature matching its layout, and
+    from the GC/stability heuristic otherwise. The off-target penalty is
+    ``1 - specificity`` for guides with a position-weighted ``specificity``
+    (computed against off-target sites with :attr:`specificity`, see
+    :mod:`crispr_rl.scoring.specificity`), a saturating function of
+    ``off_target_hits`` without one, and a GC/position heuristic otherwise.
+    """
 
     def __init__(self, config: Config):
         self.config = config
+        self.model = on_target_model(config.on_target_model)
+        self.specificity = specificity_model(config.specificity_model, config.guide_length)
         random.seed(config.seed)
 
+    @property
+    def context_flanks(self):
+        """``(flank5, flank3)`` of the context windows the on-target model needs, or ``None``."""
+        return (self.model.flank5, self.model.flank3) if self.model is not None else None
+
+    def _model_applies(self, contexts: Any) -> bool:
+        return (self.model is not None and contexts is not None
+                and np.ndim(contexts) == 2 and np.shape(contexts)[1] == self.model.context_length)
+
     def score_on_target(self, features: Dict[str, Any]) -> float:
-        """Score on-target efficiency (placeholder model)."""
-        # Simple model: higher GC and thermodynamic stability better
+        """Score on-target efficiency."""
+        contexts = features.get('context_codes')
+        if contexts is not None and self._model_applies(np.asarray(contexts)[None]):
+            return float(self.model.predict(np.asarray(contexts)[None])[0])
+        # Heuristic: higher GC and thermodynamic stability better
         gc_score = min(features.get('gc_content', 50) / 50, 1.0)
-        thermo_score = min((features.get('thermodynamic', 0) + 10) / 20, 1.0)
+        low, high = THERMO_RANGE
+        thermo = features.get('thermodynamic', (low + high) / 2)
+        thermo_score = min(max((thermo - low) / (high - low), 0.0), 1.0)
         return (gc_score + thermo_score) / 2
 
     def score_off_target(self, features: Dict[str, Any]) -> float:
         """Score off-target penalty (lower is better)."""
+        if features.get('specificity') is not None:
+            return 1.0 - features['specificity']
+        if features.get('off_target_hits') is not None:
+            # Genome-wide hit count from the off-target index, saturating towards 1
+            hits = features['off_target_hits']
+            return hits / (1 + hits)
         # Penalty for high GC (more specific) and position weight
         gc_penalty = features.get('gc_content', 50) / 100
         pos_weight = features.get('context_weight', 1.0)
@@ -36,6 +75,58 @@ class GuideScorer:
         on_target = self.score_on_target(features)
         off_target = self.score_off_target(features)
         reward = self.calculate_reward(on_target, off_target)
+        return {
+            'on_target_score': on_target,
+            'off_target_penalty': off_target,
+            'composite_score': reward,
+        }
+
+    @staticmethod
+    def _column(features: Dict[str, Any], key: str, default: float, size: int) -> np.ndarray:
+        """Feature column as a float array, broadcasting the scalar default if absent."""
+        if key in features:
+            return np.asarray(features[key], dtype=np.float64)
+        return np.full(size, default, dtype=np.float64)
+
+    @staticmethod
+    def _batch_size(features: Dict[str, Any]) -> int:
+        return len(next(iter(features.values()))) if features else 0
+
+    def score_on_target_batch(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """Vectorized :meth:`score_on_target` over feature columns."""
+        n = self._batch_size(features)
+        if self._model_applies(features.get('context_codes')):
+            return self.model.predict(features['context_codes'])
+        gc_score = np.minimum(self._column(features, 'gc_content', 50, n) / 50, 1.0)
+        low, high = THERMO_RANGE
+        thermo = self._column(features, 'thermodynamic', (low + high) / 2, n)
+        thermo_score = np.clip((thermo - low) / (high - low), 0.0, 1.0)
+        return (gc_score + thermo_score) / 2
+
+    def score_off_target_batch(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """Vectorized :meth:`score_off_target` over feature columns."""
+        n = self._batch_size(features)
+        if features.get('specificity') is not None:
+            return 1.0 - self._column(features, 'specificity', 1.0, n)
+        if features.get('off_target_hits') is not None:
+            hits = self._column(features, 'off_target_hits', 0, n)
+            return hits / (1 + hits)
+        gc_penalty = self._column(features, 'gc_content', 50, n) / 100
+        pos_weight = self._column(features, 'context_weight', 1.0, n)
+        return gc_penalty * (1 - pos_weight)
+
+    def calculate_reward_batch(self, on_target: np.ndarray, off_target: np.ndarray,
+                               coverage: Any = 1.0) -> np.ndarray:
+        """Vectorized :meth:`calculate_reward`."""
+        w = self.config.weights
+        return w['on_target'] * on_target - w['off_target'] * off_target + w['coverage'] * np.asarray(coverage)
+
+    @traced("score")
+    def score_batch(self, features: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Score many guides in one vectorized pass (columns as in :meth:`score_guide`)."""
+        on_target = self.score_on_target_batch(features)
+        off_target = self.score_off_target_batch(features)
+        reward = self.calculate_reward_batch(on_target, off_target)
         return {
             'on_target_score': on_target,
             'off_target_penalty': off_target,
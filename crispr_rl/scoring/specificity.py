@@ -0,0 +1,187 @@
+"""Bit-parallel mismatch counting and position-weighted specificity scores.
+
+Guides and candidate sites are 2-bit packed into uint64 words (see
+:func:`crispr_rl.utils.encoding.pack_kmers`), so one XOR compares every
+base of a pair at once. Per-pair hit scores come from lookup tables over
+the packed bytes: each byte holds four bases, and a table indexed by the
+guide byte and the site byte holds the product of the four positions'
+mismatch penalties, so a 20-mer pair costs five gathers.
+
+Two models are built in:
+
+- ``mit``: the Hsu et al. (2013) position weights, with the MIT score's
+  mismatch-spacing and mismatch-count terms.
+- CFD-style: an ``(L, 4, 4)`` table of activities indexed by position,
+  guide base and site base (for example the Doench et al. 2016 CFD
+  matrix), multiplied over the mismatching positions.
+
+A guide's specificity aggregates the hit scores ``h`` of its off-target
+sites as ``1 / (1 + sum(h))``, the MIT/CRISPOR guide specificity scaled to
+``[0, 1]``.
+"""
+
+from typing import Optional
+import numpy as np
+from ..utils.encoding import mismatch_bits, popcount64
+
+# Hsu et al. 2013 mismatch weights for positions 1-20 of a 20-nt guide (5'->3')
+MIT_WEIGHTS = (0, 0, 0.014, 0, 0, 0.395, 0.317, 0, 0.389, 0.079,
+               0.445, 0.508, 0.613, 0.851, 0.732, 0.828, 0.615, 0.804, 0.685, 0.583)
+# Pairs compared per block by the all-against-all helpers; bounds their temporaries
+DEFAULT_BLOCK_PAIRS = 1 << 22
+
+_U = np.uint64
+# Masks for compacting the low bit of each 2-bit base into one bit per base
+_COMPACT = ((1, 0x3333333333333333), (2, 0x0F0F0F0F0F0F0F0F), (4, 0x00FF00FF00FF00FF),
+            (8, 0x0000FFFF0000FFFF), (16, 0x00000000FFFFFFFF))
+
+
+def mismatch_mask(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Mismatching positions of packed k-mers as a bitmask, bit ``j`` for the ``j``-th base from the 3' end."""
+    x = mismatch_bits(np.asarray(a, dtype=_U), np.asarray(b, dtype=_U))
+    for shift, mask in _COMPACT:
+        x = (x | (x >> _U(shift))) & _U(mask)
+    return x
+
+
+def _highest_bit(x: np.ndarray) -> np.ndarray:
+    """Index of the highest set bit of each (non-zero, < 2**53) value; -1 for zero."""
+    with np.errstate(divide='ignore'):
+        return np.where(x > 0, np.floor(np.log2(np.maximum(x, 1).astype(np.float64))), -1).astype(np.int64)
+
+
+def pairwise_mismatches(a: np.ndarray, b: np.ndarray, block_pairs: int = DEFAULT_BLOCK_PAIRS) -> np.ndarray:
+    """``(len(a), len(b))`` mismatch counts between every packed k-mer of ``a`` and of ``b``."""
+    a = np.asarray(a, dtype=_U)
+    b = np.asarray(b, dtype=_U)
+    counts = np.empty((len(a), len(b)), dtype=np.uint8)
+    rows = max(block_pairs // max(len(b), 1), 1)
+    for start in range(0, len(a), rows):
+        counts[start:start + rows] = popcount64(mismatch_bits(a[start:start + rows, None], b[None, :]))
+    return counts
+
+
+def self_similarity(packed: np.ndarray, max_mismatches: int = 3,
+                    block_pairs: int = DEFAULT_BLOCK_PAIRS) -> np.ndarray:
+    """Number of *other* guides of a library within ``max_mismatches`` of each guide."""
+    packed = np.asarray(packed, dtype=_U)
+    similar = np.zeros(len(packed), dtype=np.int64)
+    rows = max(block_pairs // max(len(packed), 1), 1)
+    for start in range(0, len(packed), rows):
+        block = pairwise_mismatches(packed[start:start + rows], packed, block_pairs)
+        similar[start:start + rows] = (block <= max_mismatches).sum(axis=1)
+    return similar - 1  # Every guide matches itself
+
+
+class SpecificityModel:
+    """Position-weighted off-target hit scores and guide specificity for packed ``guide_length``-mers.
+
+    ``activity[p, g, s]`` is the fraction of on-target activity left when
+    guide base ``g`` at position ``p`` (0 = 5' end) faces site base ``s``;
+    matches are 1. With ``mit_terms`` the product is further scaled by the
+    MIT mismatch-spacing and mismatch-count terms.
+    """
+
+    def __init__(self, activity: np.ndarray, mit_terms: bool = False, name: str = 'cfd'):
+        activity = np.array(activity, dtype=np.float64)
+        if activity.ndim != 3 or activity.shape[1:] != (4, 4) or not 0 < len(activity) <= 32:
+            raise ValueError(f"Activity table must have shape (L <= 32, 4, 4), got {activity.shape}")
+        activity[:, np.arange(4), np.arange(4)] = 1.0
+        self.activity = activity
+        self.guide_length = len(activity)
+        self.mit_terms = mit_terms
+        self.name = name
+        self._tables = self._byte_tables(activity)
+
+    @classmethod
+    def mit(cls, guide_length: int = 20) -> 'SpecificityModel':
+        """The MIT (Hsu et al. 2013) model, weights aligned to the PAM-proximal end."""
+        weights = np.zeros(guide_length)
+        span = min(guide_length, len(MIT_WEIGHTS))
+        weights[guide_length - span:] = MIT_WEIGHTS[len(MIT_WEIGHTS) - span:]
+        activity = np.broadcast_to((1 - weights)[:, None, None], (guide_length, 4, 4))
+        return cls(activity, mit_terms=True, name='mit')
+
+    @classmethod
+    def load(cls, path: str) -> 'SpecificityModel':
+        """A CFD-style model from an ``(L, 4, 4)`` activity table saved with ``np.save``."""
+        return cls(np.load(path), name='cfd')
+
+    @staticmethod
+    def _byte_tables(activity: np.ndarray) -> np.ndarray:
+        """``tables[c, (g << 8) | s]``: product of penalties over the four bases in byte ``c`` of a pair."""
+        length = len(activity)
+        n_bytes = -(-length // 4)
+        pairs = np.arange(1 << 16)
+        guide_bytes, site_bytes = pairs >> 8, pairs & 0xFF
+        tables = np.ones((n_bytes, 1 << 16))
+        for c in range(n_bytes):
+            for k in range(4):
+                position = length - 1 - (4 * c + k)  # Bases are packed 5' first, so byte 0 holds the 3' end
+                if position < 0:
+                    break
+                g = (guide_bytes >> (2 * k)) & 3
+                s = (site_bytes >> (2 * k)) & 3
+                tables[c] *= activity[position, g, s]
+        return tables
+
+    def hit_scores(self, guides: np.ndarray, sites: np.ndarray) -> np.ndarray:
+        """Hit score in ``[0, 1]`` of each (broadcast) pair of packed guide and site; 1 for a perfect match."""
+        guides, sites = np.broadcast_arrays(np.asarray(guides, dtype=_U), np.asarray(sites, dtype=_U))
+        scores = np.ones(guides.shape)
+        byte = _U(0xFF)
+        for c, table in enumerate(self._tables):
+            shift = _U(8 * c)
+            index = (((guides >> shift) & byte) << _U(8)) | ((sites >> shift) & byte)
+            scores *= table[index.astype(np.intp)]
+        if self.mit_terms:
+            mask = mismatch_mask(guides, sites)
+            count = popcount64(mask).astype(np.float64)
+            # Mean distance between consecutive mismatches is (last - first) / (count - 1);
+            # the two's-complement lowest bit wraps around harmlessly for a perfect match
+            with np.errstate(over='ignore'):
+                lowest = _highest_bit(mask & (~mask + _U(1)))
+            spread = (_highest_bit(mask) - lowest).astype(np.float64)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean_distance = np.where(count > 1, spread / (count - 1), 0.0)
+                longest = self.guide_length - 1  # Widest possible distance, 19 for 20-nt guides
+                spacing = np.where(count > 1, 1 / ((longest - mean_distance) / longest * 4 + 1), 1.0)
+                scores *= spacing / np.maximum(count, 1) ** 2
+        return scores
+
+    def specificity(self, guide_index: np.ndarray, scores: np.ndarray, n_guides: int,
+                    exclude_self: bool = True) -> np.ndarray:
+        """Per-guide specificity ``1 / (1 + sum of off-target hit scores)``.
+
+        ``guide_index`` names the guide of each scored pair. With
+        ``exclude_self`` one perfect match per guide is taken to be the
+        on-target site and left out.
+        """
+        totals = np.bincount(np.asarray(guide_index, dtype=np.intp), weights=scores, minlength=n_guides)
+        if exclude_self:
+            perfect = np.bincount(np.asarray(guide_index, dtype=np.intp),
+                                  weights=(scores >= 1.0).astype(np.float64), minlength=n_guides)
+            totals -= np.minimum(perfect, 1)
+        return 1 / (1 + np.maximum(totals, 0.0))
+
+    def library_specificity(self, packed: np.ndarray, max_mismatches: int = 4,
+                            block_pairs: int = DEFAULT_BLOCK_PAIRS) -> np.ndarray:
+        """Specificity of each guide of a library against the other guides as candidate sites."""
+        packed = np.asarray(packed, dtype=_U)
+        totals = np.zeros(len(packed))
+        rows = max(block_pairs // max(len(packed), 1), 1)
+        for start in range(0, len(packed), rows):
+            block = packed[start:start + rows, None]
+            scores = self.hit_scores(block, packed[None, :])
+            near = popcount64(mismatch_bits(block, packed[None, :])) <= max_mismatches
+            totals[start:start + rows] = np.where(near, scores, 0.0).sum(axis=1) - 1  # Minus the guide itself
+        return 1 / (1 + np.maximum(totals, 0.0))
+
+
+def specificity_model(name: Optional[str], guide_length: int = 20) -> Optional[SpecificityModel]:
+    """The model selected by ``Config.specificity_model``: ``mit``, a saved CFD-style table, or ``None`` for off."""
+    if not name or name == 'off':
+        return None
+    if name == 'mit':
+        return SpecificityModel.mit(guide_length)
+    return SpecificityModel.load(name)
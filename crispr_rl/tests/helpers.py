@@ -0,0 +1,9 @@
+"""Shared fixtures for the test modules."""
+
+import numpy as np
+
+
+def random_sequence(n, seed=0):
+    """A reproducible random ACGT sequence of length ``n``."""
+    rng = np.random.default_rng(seed)
+    return ''.join(rng.choice(list('ACGT'), size=n))
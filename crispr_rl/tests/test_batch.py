@@ -0,0 +1,53 @@
+"""Tests for multi-gene batch design."""
+
+import unittest
+from ..utils.config import Config
+from ..pipeline import DesignPipeline
+from ..batch import BatchDesigner, parse_job
+from .helpers import random_sequence
+
+
+class TestBatchDesigner(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.config.uniprot_url = "http://127.0.0.1:9"  # Refused immediately: unknown genes are not found
+
+    def test_parse_job(self):
+        self.assertEqual(parse_job("BRCA1"), {"gene_id": "BRCA1"})
+        self.assertEqual(parse_job("chr1 10 200"), {"gene_id": "chr1", "region_start": 10, "region_end": 200})
+        with self.assertRaises(ValueError):
+            parse_job("chr1 10")
+
+    def test_batch_matches_single_design_and_isolates_errors(self):
+        sequences = {f"G{i}": random_sequence(1500, seed=i) for i in range(6)}
+        jobs = [{"gene_id": gene_id, "sequence": seq} for gene_id, seq in sequences.items()]
+        jobs += ["MISSING", "bad spec here x", {"gene_id": "G0", "sequence": sequences["G0"], "region_start": "x"}]
+
+        with BatchDesigner(self.config, workers=2) as designer:
+            results = designer.design(jobs, top_k=5)
+
+        self.assertEqual([r["index"] for r in results], list(range(len(jobs))))
+        pipeline = DesignPipeline(self.config)
+        for job, result in zip(jobs[:6], results[:6]):
+            self.assertEqual(result["status"], "ok")
+            expected = pipeline.design(job["sequence"], job["gene_id"], top_k=5)
+            self.assertEqual(result["total_sites"], expected["total_sites"])
+            self.assertEqual([g["candidate_id"] for g in result["guides"]],
+                             [g["candidate_id"] for g in expected["guides"]])
+        self.assertEqual([r["status"] for r in results[6:]], ["error"] * 3)
+        self.assertIn("not found", results[6]["error"])
+
+    def test_config_changes_reach_workers(self):
+        jobs = [{"gene_id": "G", "sequence": random_sequence(1500, seed=7)}]
+        with BatchDesigner(self.config, workers=1) as designer:
+            before = designer.design(jobs, top_k=3)[0]
+            self.config.weights.update(on_target=0.0, off_target=0.0, coverage=1.0)
+            after = designer.design(jobs, top_k=3)[0]
+        expected = DesignPipeline(self.config).design(jobs[0]["sequence"], "G", top_k=3)
+        self.assertNotEqual(after["guides"], before["guides"])
+        self.assertEqual([g["composite_score"] for g in after["guides"]],
+                         [g["composite_score"] for g in expected["guides"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
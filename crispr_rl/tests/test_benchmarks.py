@@ -0,0 +1,42 @@
+"""Tests for the benchmark suite."""
+
+import copy
+import unittest
+from ..benchmarks.synthetic import synthetic_sequence, parse_size, format_size
+from ..benchmarks.suite import run_benchmarks, compare, STAGES
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_synthetic_sequence_is_seeded(self):
+        a = synthetic_sequence(5000, seed=1)
+        self.assertEqual(a, synthetic_sequence(5000, seed=1))
+        self.assertNotEqual(a, synthetic_sequence(5000, seed=2))
+        self.assertEqual(len(a), 5000)
+        gc = (a.count('G') + a.count('C')) / len(a)
+        self.assertAlmostEqual(gc, 0.41, delta=0.03)
+
+    def test_sizes(self):
+        self.assertEqual(parse_size('100M'), 100_000_000)
+        self.assertEqual(parse_size('2.5k'), 2500)
+        self.assertEqual(parse_size('1500'), 1500)
+        self.assertEqual(format_size(10_000_000), '10M')
+
+    def test_run_and_compare(self):
+        report = run_benchmarks([2000], repeat=1, max_records=50)
+        results = {r['stage']: r for r in report['results']}
+        self.assertEqual(set(results), set(STAGES))
+        self.assertTrue(results['optimize']['truncated'])
+        self.assertFalse(results['scan']['truncated'])
+        self.assertGreater(results['scan']['peak_bytes'], 0)
+        self.assertEqual(compare(report, report), [])
+
+        slower = copy.deepcopy(report)
+        slower['results'][0]['sites_per_sec'] /= 2
+        slower['results'][0]['seconds'] *= 2
+        self.assertEqual(len(compare(slower, report, min_time_delta=0)), 1)
+        # A slowdown of microseconds is noise
+        self.assertEqual(compare(slower, report, min_time_delta=1.0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
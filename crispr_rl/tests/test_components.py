@@ -0,0 +1,73 @@
+"""Tests for lazily built, timed components."""
+
+import asyncio
+import threading
+import time
+import unittest
+from ..utils.components import ComponentRegistry
+
+
+class TestComponentRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = ComponentRegistry()
+        self.builds = []
+
+    def _factory(self, name, delay=0.0, depends=()):
+        def build():
+            for dependency in depends:
+                self.registry.get(dependency)
+            time.sleep(delay)
+            self.builds.append(name)
+            return {'name': name, 'thread': threading.current_thread().name}
+        return build
+
+    def test_builds_once_on_first_use(self):
+        self.registry.register('index', self._factory('index', 0.05))
+        self.registry.register('pipeline', self._factory('pipeline', 0.01, depends=('index',)))
+        self.assertFalse(self.registry.ready)
+        self.assertIsNone(self.registry.peek('pipeline'))
+        pipeline = self.registry.get('pipeline')
+        self.assertIs(self.registry.get('pipeline'), pipeline)
+        self.assertEqual(self.builds, ['index', 'pipeline'])
+        self.assertTrue(self.registry.ready)
+        # Init times exclude the dependencies built along the way
+        self.assertGreaterEqual(self.registry.timings['index'], 0.05)
+        self.assertLess(self.registry.timings['pipeline'], 0.04)
+
+    def test_background_warm_up_and_readiness(self):
+        self.registry.register('slow', self._factory('slow', 0.1))
+        self.registry.register('lazy', self._factory('lazy'), warm=False)
+        self.registry.start_warm_up()
+        self.assertFalse(self.registry.status()['ready'])
+        # A request arriving mid warm-up waits for the build, off the event loop
+        slow = asyncio.run(self.registry.aget('slow'))
+        self.assertEqual(slow['thread'], 'warm-up')
+        self.registry._thread.join(5)
+        status = self.registry.status()
+        self.assertTrue(status['ready'])
+        self.assertFalse(status['components']['lazy']['ready'])
+        self.assertEqual(self.builds, ['slow'])
+
+    def test_failures_are_reported_and_retried(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("index missing")
+            return 'ok'
+
+        self.registry.register('index', flaky)
+        self.registry.register('none', lambda: None)
+        self.registry.warm_up()
+        status = self.registry.status()
+        self.assertFalse(status['ready'])
+        self.assertEqual(status['components']['index']['error'], "OSError: index missing")
+        self.assertEqual(self.registry.get('index'), 'ok')
+        self.assertNotIn('error', self.registry.status()['components']['index'])
+        self.assertIsNone(self.registry.get('none'))
+        self.assertTrue(self.registry.ready)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Tests for the bounded design executor."""
+
+import asyncio
+import threading
+import time
+import unittest
+from ..utils.executor import DesignExecutor, Saturated, DesignTimeout
+from ..utils.metrics import MetricsCollector
+from ..utils.tracing import start_trace, span, cprofile_jobs
+
+
+def _worker_function(n):
+    with span("work"):
+        return sum(range(n))
+
+
+class TestDesignExecutor(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsCollector()
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def _blocked(self):
+        self.release.wait(5)
+        return threading.current_thread().name
+
+    def test_run_records_stages_and_keeps_context(self):
+        executor = DesignExecutor(2, 2, metrics=self.metrics)
+
+        async def main():
+            with start_trace("request") as trace, cprofile_jobs(limit=50) as profile:
+                result = await executor.run(_worker_function, 1000)
+                await asyncio.sleep(0)  # Event loop work stays out of the dump
+            return result, trace, profile
+
+        result, trace, profile = asyncio.run(main())
+        executor.close()
+        self.assertEqual(result, sum(range(1000)))
+        self.assertEqual([s.name for s in trace.spans], ["work"])
+        self.assertIn("_worker_function", profile["stats"])
+        self.assertNotIn("sleep", profile["stats"])
+        self.assertEqual(set(self.metrics.get_summary()["stages"]), {"queue_wait", "run"})
+        self.assertEqual(executor.stats()["completed"], 1)
+
+    def test_rejects_when_saturated(self):
+        executor = DesignExecutor(1, 1, metrics=self.metrics)
+
+        async def main():
+            jobs = [asyncio.ensure_future(executor.run(self._blocked)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            self.assertTrue(executor.saturated)
+            stats = executor.stats()
+            self.assertEqual((stats["running"], stats["queued"]), (1, 1))
+            with self.assertRaises(Saturated):
+                await executor.run(self._blocked)
+            self.release.set()
+            return await asyncio.gather(*jobs)
+
+        names = asyncio.run(main())
+        executor.close()
+        self.assertTrue(all(name.startswith("design") for name in names))
+        stats = executor.stats()
+        self.assertEqual((stats["rejected"], stats["completed"]), (1, 2))
+        self.assertFalse(executor.saturated)
+
+    def test_timeout_keeps_slot_until_job_returns(self):
+        executor = DesignExecutor(1, 0, timeout=0.05)
+
+        async def main():
+            with self.assertRaises(DesignTimeout):
+                await executor.run(self._blocked)
+            # The timed-out job still occupies the only worker
+            with self.assertRaises(Saturated):
+                await executor.run(self._blocked)
+            self.release.set()
+            await asyncio.sleep(0.05)
+            return await executor.run(_worker_function, 10)
+
+        self.assertEqual(asyncio.run(main()), 45)
+        executor.close()
+        self.assertEqual(executor.stats()["timeouts"], 1)
+
+    def test_iterate_holds_one_slot(self):
+        executor = DesignExecutor(1, 0)
+
+        async def main():
+            items = []
+            async for item in executor.iterate(iter(range(5))):
+                self.assertTrue(executor.saturated)
+                items.append(item)
+            return items
+
+        self.assertEqual(asyncio.run(main()), list(range(5)))
+        self.assertFalse(executor.saturated)
+        executor.close()
+
+    def test_iterate_timeout_per_item(self):
+        executor = DesignExecutor(1, 0, timeout=0.1)
+
+        def slow_items():
+            for i in range(4):
+                time.sleep(0.04)
+                yield i
+
+        async def drain(per_item):
+            return [item async for item in executor.iterate(slow_items(), per_item=per_item)]
+
+        self.assertEqual(asyncio.run(drain(True)), list(range(4)))
+        with self.assertRaises(DesignTimeout):
+            asyncio.run(drain(False))
+        executor.close()
+
+    def test_close_cancels_queued_jobs(self):
+        executor = DesignExecutor(1, 2)
+
+        async def main():
+            jobs = [asyncio.ensure_future(executor.run(self._blocked)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            executor.close()
+            self.release.set()
+            return await asyncio.gather(*jobs, return_exceptions=True)
+
+        running, *queued = asyncio.run(main())
+        self.assertTrue(running.startswith("design"))
+        self.assertTrue(all(isinstance(result, asyncio.CancelledError) for result in queued))
+        self.assertEqual(executor.stats()["completed"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
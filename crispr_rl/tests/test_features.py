@@ -1,9 +1,13 @@
 """Tests for feature extraction."""
 
+import re
 import unittest
+import numpy as np
 from ..features.extractor import FeatureExtractor
-from ..features.pam_scanner import PAMScanner
+from ..features.pam_scanner import PAMScanner, NucleaseProfile
 from ..utils.config import Config
+from ..features.thermo import NearestNeighborModel, NN_PARAMS, INITIATION
+from ..utils.encoding import encode_sequence, reverse_complement_codes
 
 
 class TestFeatureExtractor(unittest.TestCase):
@@ -18,10 +22,65 @@ class TestFeatureExtractor(unittest.TestCase):
         self.assertAlmostEqual(gc, 50.0)
 
     def test_pam_scanning(self):
-        sequence = "ATCGATCGNGGATCG"
+        sequence = "ATCGATCGATCGATCGATCGAGGATCG"
         sites = self.scanner.find_pam_sites(sequence)
         self.assertGreater(len(sites), 0)
-        self.assertEqual(sites[0]['pam_sequence'], 'NGG')
+        self.assertEqual(sites[0]['pam_sequence'], 'AGG')
+        self.assertEqual(sites[0]['guide_sequence'], sequence[:20])
+
+    def test_pam_scanning_overlapping_and_reverse(self):
+        sequence = "CCCTACGTACGTACGTACGTACGTAGGGTT"
+        sites = self.scanner.scan(sequence)
+        forward = sites.pam_starts[sites.strands > 0].tolist()
+        reverse = sites.pam_starts[sites.strands < 0].tolist()
+        self.assertEqual(forward, [24, 25])
+        self.assertEqual(reverse, [0, 1])
+        dicts = self.scanner.find_pam_sites(sequence)
+        rev = [d for d in dicts if d['strand'] == '-'][0]
+        self.assertEqual(rev['pam_sequence'], 'GGG')
+        self.assertEqual(rev['guide_sequence'], 'CGTACGTACGTACGTACGTA')
+
+    def test_pam_scanning_chunked_matches_single_pass(self):
+        rng = np.random.default_rng(0)
+        sequence = ''.join(rng.choice(list('ACGT'), 5000))
+        whole = self.scanner.scan(sequence, 100, 4900)
+        chunked = PAMScanner(self.config, chunk_size=97).scan(sequence, 100, 4900)
+        np.testing.assert_array_equal(whole.pam_starts, chunked.pam_starts)
+        np.testing.assert_array_equal(whole.strands, chunked.strands)
+        regex = [m.start() for m in re.finditer(r'(?=[ACGT]GG)', sequence)]
+        expected = [p for p in regex if p >= 100 and p + 3 <= 4900]
+        self.assertEqual(whole.pam_starts[whole.strands > 0].tolist(), expected)
+
+    def test_multi_profile_scan_matches_separate_scans(self):
+        rng = np.random.default_rng(1)
+        sequence = ''.join(rng.choice(list('ACGT'), 4000))
+        scanner = PAMScanner(self.config, chunk_size=89, profiles=['SpCas9', 'SaCas9', 'Cas12a'])
+        found = scanner.scan_profiles(sequence, 50, 3950)
+        for profile in scanner.profiles:
+            alone = PAMScanner(self.config, profiles=[profile]).scan(sequence, 50, 3950)
+            np.testing.assert_array_equal(found[profile.name].pam_starts, alone.pam_starts)
+            np.testing.assert_array_equal(found[profile.name].guide_starts, alone.guide_starts)
+        sa = found['SaCas9']
+        expected = [m.start() for m in re.finditer(r'(?=..G[AG][AG]T)', sequence)]
+        expected = [p for p in expected if p >= 50 and p + 6 <= 3950]
+        self.assertEqual(sa.pam_starts[sa.strands > 0].tolist(), expected)
+
+    def test_five_prime_pam(self):
+        scanner = PAMScanner(self.config, profiles=[NucleaseProfile('Cas12a', 'TTTV', '5prime', 23)])
+        sequence = 'GG' + 'TTTA' + 'ACGTACGTACGTACGTACGTACG' + 'CC' + 'CGTACGTACGTACGTACGTACGT' + 'TAAA' + 'GG'
+        records = scanner.site_records(encode_sequence(sequence), scanner.scan(sequence))
+        forward = [r for r in records if r['strand'] == '+']
+        reverse = [r for r in records if r['strand'] == '-']
+        self.assertEqual([(r['pam_sequence'], r['guide_sequence']) for r in forward],
+                         [('TTTA', 'ACGTACGTACGTACGTACGTACG')])
+        self.assertEqual([(r['pam_sequence'], r['guide_sequence']) for r in reverse],
+                         [('TTTA', 'ACGTACGTACGTACGTACGTACG')])
+
+    def test_invalid_profile(self):
+        with self.assertRaises(ValueError):
+            PAMScanner(self.config, profiles=['Cas13'])
+        with self.assertRaises(ValueError):
+            NucleaseProfile('X', 'NGG', 'left')
 
     def test_feature_extraction(self):
         guide_seq = "ATCGATCGATCGATCG"
@@ -31,5 +90,58 @@ class TestFeatureExtractor(unittest.TestCase):
         self.assertIn('thermodynamic', features)
 
 
+    def test_batch_extraction_matches_scalar(self):
+        rng = np.random.default_rng(1)
+        sequence = ''.join(rng.choice(list('ACGTN'), 2000, p=[0.24, 0.24, 0.24, 0.24, 0.04]))
+        codes = encode_sequence(sequence)
+        sites = self.scanner.scan(codes)
+        batch = self.extractor.extract_sites(codes, sites)
+        for i, site in enumerate(self.scanner.find_pam_sites(sequence)):
+            scalar = self.extractor.extract_features(
+                site['guide_sequence'], site['pam_sequence'], site['locus'], len(sequence)
+            )
+            for key, value in scalar.items():
+                self.assertAlmostEqual(batch[key][i], value, msg=key)
+
+
+class TestNearestNeighborModel(unittest.TestCase):
+    def setUp(self):
+        self.model = NearestNeighborModel()
+
+    def test_stack_sums_match_table(self):
+        guide = 'GACGTTAGCCATGCAATCGG'
+        dh, ds = self.model.sequence_terms(guide)
+        stacks = [NN_PARAMS[guide[i:i + 2]] for i in range(len(guide) - 1)]
+        self.assertAlmostEqual(dh, sum(s[0] for s in stacks) + INITIATION[0])
+        self.assertAlmostEqual(ds, sum(s[1] for s in stacks) + INITIATION[1])
+        # Sugimoto et al. dG37 of rGCGG/dCGCC-type stacks is strongly negative
+        self.assertLess(self.model.delta_g(dh, ds, len(guide)), -15)
+
+    def test_reverse_strand_windows_use_reverse_complement(self):
+        rng = np.random.default_rng(2)
+        codes = rng.integers(0, 4, 500).astype(np.uint8)
+        starts = np.arange(0, 480, 7)
+        prefix = self.model.prefix_sums(codes)
+        dh, ds = self.model.window_terms(prefix, starts, 20, -np.ones(len(starts)))
+        for k, start in enumerate(starts):
+            guide = reverse_complement_codes(codes[start:start + 20])
+            expected = self.model.window_terms(self.model.prefix_sums(guide), np.zeros(1, dtype=np.int64), 20)
+            self.assertAlmostEqual(dh[k], expected[0][0])
+            self.assertAlmostEqual(ds[k], expected[1][0])
+
+    def test_tm_rises_with_gc(self):
+        extractor = FeatureExtractor()
+        self.assertGreater(extractor.melting_temperature('GCGCGGCCGCGGCCGCGCGG'),
+                           extractor.melting_temperature('ATATTAATATTTAATATAAT'))
+
+    def test_hairpin_stems(self):
+        # GGGG/CCCC close a 4 nt loop; GG/CC can only close GAC (the GGG/CCC
+        # stem would leave a 1 nt loop); poly-A cannot pair with itself
+        stems = self.model.hairpin_stems(np.stack([encode_sequence('GGGGAAAACCCCAAAA'),
+                                                   encode_sequence('AAAAAAAAAAAAAAAA'),
+                                                   encode_sequence('GGGACCCTTTTTTTTT')]))
+        self.assertEqual(stems.tolist(), [4, 0, 2])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""Tests for the feedback store."""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from ..rl.feedback_manager import FeedbackManager
+
+
+class TestFeedbackManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, 'feedback.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_aggregate(self):
+        manager = FeedbackManager(self.db, legacy_file=None)
+        manager.add_feedback('g1', 4)
+        manager.add_feedback('g1', 2, notes='weak')
+        manager.add_feedback('g2', 5)
+        self.assertEqual(manager.count(), 3)
+        self.assertAlmostEqual(manager.get_average_rating('g1'), 3.0)
+        self.assertEqual(manager.get_average_rating('missing'), 0.0)
+
+    def test_paging(self):
+        manager = FeedbackManager(self.db, legacy_file=None)
+        for i in range(10):
+            manager.add_feedback(f'g{i}', i % 5 + 1)
+        recent = manager.get_recent_feedbacks(limit=4)
+        self.assertEqual([f['candidate_id'] for f in recent], ['g6', 'g7', 'g8', 'g9'])
+        previous = manager.get_recent_feedbacks(limit=4, before_id=recent[0]['id'])
+        self.assertEqual([f['candidate_id'] for f in previous], ['g2', 'g3', 'g4', 'g5'])
+        after = manager.get_feedbacks_after(recent[1]['id'])
+        self.assertEqual([f['candidate_id'] for f in after], ['g8', 'g9'])
+
+    def test_imports_legacy_json_once(self):
+        legacy = os.path.join(self.tmp.name, 'feedback_log.json')
+        with open(legacy, 'w') as f:
+            json.dump([{'candidate_id': 'g1', 'rating': 5, 'notes': '', 'timestamp': '2024-01-01T00:00:00'},
+                       {'candidate_id': 'g1', 'rating': 3, 'notes': '', 'timestamp': '2024-01-02T00:00:00'}], f)
+        FeedbackManager(self.db, legacy_file=legacy)
+        manager = FeedbackManager(self.db, legacy_file=legacy)
+        self.assertEqual(manager.count(), 2)
+        self.assertAlmostEqual(manager.get_average_rating('g1'), 4.0)
+
+    def test_concurrent_starts_import_legacy_json_once(self):
+        legacy = os.path.join(self.tmp.name, 'feedback_log.json')
+        with open(legacy, 'w') as f:
+            json.dump([{'candidate_id': f'g{i}', 'rating': 4} for i in range(500)], f)
+        barrier = threading.Barrier(4)
+
+        def start():
+            barrier.wait()
+            FeedbackManager(self.db, legacy_file=legacy)
+
+        threads = [threading.Thread(target=start) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(FeedbackManager(self.db, legacy_file=None).count(), 500)
+
+    def test_concurrent_writers(self):
+        managers = [FeedbackManager(self.db, legacy_file=None) for _ in range(4)]
+
+        def write(manager):
+            for _ in range(50):
+                manager.add_feedback('shared', 4)
+
+        threads = [threading.Thread(target=write, args=(m,)) for m in managers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(managers[0].count(), 200)
+        self.assertAlmostEqual(managers[0].get_average_rating('shared'), 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
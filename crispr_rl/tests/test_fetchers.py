@@ -0,0 +1,114 @@
+"""Tests for sequence fetchers against a local stand-in server."""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ..data.async_fetcher import AsyncSequenceFetcher
+from ..data.fetchers import SequenceFetcher
+from ..data.genome_store import LocalGenomeStore
+from ..utils.config import Config
+
+SEQUENCES = {'P12345': 'ACGTACGTACGTACGTACGTAGG', 'Q99999': 'GGGCCCAAATTT'}
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        time.sleep(0.05)  # Keep requests in flight long enough to overlap
+        gene_id = self.path.rsplit('/', 1)[-1].replace('.fasta', '')
+        if gene_id not in SEQUENCES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = f">sp|{gene_id}|TEST\n{SEQUENCES[gene_id]}\n".encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAsyncSequenceFetcher(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+        self.server.hits = []
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = Config()
+        self.config.uniprot_url = f"http://127.0.0.1:{self.server.server_address[1]}/uniprot"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def _fetcher(self) -> AsyncSequenceFetcher:
+        fetcher = AsyncSequenceFetcher(self.config)
+        self.addCleanup(fetcher.close)
+        return fetcher
+
+    def test_sync_fetcher_uses_configured_url(self):
+        fetcher = SequenceFetcher(self.config)
+        self.assertEqual(fetcher.fetch_sequence('P12345'), SEQUENCES['P12345'])
+        self.assertIsNone(fetcher.fetch_sequence('MISSING'))
+
+    def test_concurrent_requests_are_coalesced(self):
+        fetcher = self._fetcher()
+
+        async def run():
+            return await asyncio.gather(*(fetcher.fetch_sequence('P12345') for _ in range(10)))
+
+        results = asyncio.run(run())
+        self.assertEqual(results, [SEQUENCES['P12345']] * 10)
+        self.assertEqual(len(self.server.hits), 1)
+        # Served from the cache afterwards
+        self.assertEqual(asyncio.run(fetcher.fetch_sequence('P12345')), SEQUENCES['P12345'])
+        self.assertEqual(len(self.server.hits), 1)
+
+    def test_missing_sequences_are_not_cached(self):
+        fetcher = self._fetcher()
+        self.assertIsNone(asyncio.run(fetcher.fetch_sequence('MISSING')))
+        self.assertIsNone(asyncio.run(fetcher.fetch_sequence('MISSING')))
+        self.assertEqual(len(self.server.hits), 2)
+
+    def test_ttl_expiry_refetches(self):
+        self.config.sequence_cache_ttl = 0.01
+        fetcher = self._fetcher()
+        asyncio.run(fetcher.fetch_sequence('Q99999'))
+        time.sleep(0.02)
+        asyncio.run(fetcher.fetch_sequence('Q99999'))
+        self.assertEqual(len(self.server.hits), 2)
+
+    def test_disk_cache_survives_restart(self):
+        self.config.sequence_cache_dir = self.tmp.name
+        asyncio.run(self._fetcher().fetch_sequence('Q99999'))
+        self.assertEqual(asyncio.run(self._fetcher().fetch_sequence('Q99999')), SEQUENCES['Q99999'])
+        self.assertEqual(len(self.server.hits), 1)
+
+    def test_cache_bounded_by_bases_and_local_hits_stay_off_disk(self):
+        self.config.sequence_cache_dir = os.path.join(self.tmp.name, 'cache')
+        self.config.sequence_cache_bytes = 30
+        fasta = os.path.join(self.tmp.name, 'ref.fa')
+        with open(fasta, 'w') as f:
+            f.write(">chr1\n" + "ACGT" * 10 + "\n")
+        store = LocalGenomeStore(fasta)
+        self.addCleanup(store.close)
+        fetcher = AsyncSequenceFetcher(self.config, SequenceFetcher(self.config, genome_store=store))
+        self.addCleanup(fetcher.close)
+        self.assertEqual(asyncio.run(fetcher.fetch_sequence('chr1')), "ACGT" * 10)
+        for gene_id in SEQUENCES:
+            asyncio.run(fetcher.fetch_sequence(gene_id))
+        self.assertNotIn('chr1', fetcher.cache)  # 40 bases never fit
+        self.assertNotIn('P12345', fetcher.cache)  # Evicted to make room
+        self.assertIn('Q99999', fetcher.cache)
+        self.assertEqual(len(os.listdir(self.config.sequence_cache_dir)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Tests for the memory-mapped local genome store."""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from ..data.fetchers import SequenceFetcher
+from ..data.genome_store import LocalGenomeStore, parse_region
+from ..pipeline import DesignPipeline
+from ..utils.config import Config
+from ..utils.encoding import encode_sequence
+
+
+class TestLocalGenomeStore(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.contigs = {
+            'chr1': ''.join(rng.choice(list('ACGTN'), 1003)),
+            'chr2': ''.join(rng.choice(list('acgt'), 250)),
+            'chrM': 'ACGT' * 5,
+        }
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fasta = os.path.join(self.tmp.name, 'ref.fa')
+        with open(self.fasta, 'w') as f:
+            for name, seq in self.contigs.items():
+                f.write(f">{name} description\n")
+                width = 60 if name != 'chrM' else 100
+                for i in range(0, len(seq), width):
+                    f.write(seq[i:i + width] + "\n")
+        self.store = LocalGenomeStore(self.fasta)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_index_written(self):
+        self.assertTrue(os.path.exists(self.fasta + '.fai'))
+        self.assertEqual(self.store.contig_length('chr1'), 1003)
+        self.assertEqual(self.store.contig_length('chrM'), 20)
+
+    def test_region_reads_match_reference(self):
+        rng = np.random.default_rng(0)
+        for name, seq in self.contigs.items():
+            for _ in range(50):
+                start, end = sorted(rng.integers(0, len(seq) + 1, 2))
+                self.assertEqual(self.store.fetch_region(name, start, end), seq[start:end].upper())
+        self.assertEqual(self.store.fetch_region('chr2'), self.contigs['chr2'].upper())
+
+    def test_single_line_region_is_zero_copy(self):
+        view = self.store.region_bytes('chr1', 5, 50)
+        self.assertFalse(view.flags.owndata)
+        self.assertFalse(view.flags.writeable)
+        np.testing.assert_array_equal(self.store.fetch_region_codes('chr1', 5, 50),
+                                      encode_sequence(self.contigs['chr1'][5:50]))
+
+    def test_fetcher_serves_local_regions(self):
+        fetcher = SequenceFetcher(Config(), genome_store=self.store)
+        self.assertEqual(parse_region('chr1:11-20'), ('chr1', 10, 20))
+        self.assertEqual(fetcher.fetch_sequence('chr1:11-20'), self.contigs['chr1'][10:20])
+        self.assertEqual(fetcher.fetch_sequence('chrM'), self.contigs['chrM'])
+
+    def test_region_design_reads_only_a_window(self):
+        fetcher = SequenceFetcher(Config(), genome_store=self.store)
+        pipeline = DesignPipeline(Config())
+        window = fetcher.fetch_window('chr1', 400, 700, pipeline.context_flank)
+        self.assertEqual((window.offset, window.end, len(window)), (400 - pipeline.context_flank,
+                                                                    700 + pipeline.context_flank, 1003))
+        self.assertEqual(window[420:450], self.contigs['chr1'][420:450])
+        with self.assertRaises(IndexError):
+            window[0:10]
+        self.assertIsNone(fetcher.fetch_window('chr1:11-20', 0, 5))
+        full = pipeline.design(fetcher.fetch_sequence('chr1'), 'chr1', 400, 700, top_k=5)
+        self.assertEqual(pipeline.design(window, 'chr1', 400, 700, top_k=5), full)
+
+
+if __name__ == '__main__':
+    unittest.main()
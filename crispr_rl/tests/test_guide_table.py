@@ -0,0 +1,78 @@
+"""Tests for the array-backed guide table."""
+
+import json
+import unittest
+import numpy as np
+from ..utils.config import Config
+from ..utils.encoding import decode_sequence
+from ..guide_table import GuideTable, pack_bases, unpack_bases, dumps
+from ..pipeline import DesignPipeline
+from .helpers import random_sequence
+
+
+class TestGuideTable(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = DesignPipeline(Config())
+        sequence = random_sequence(2000)
+        sequence = sequence[:300] + 'NNNNN' + sequence[305:]
+        self.columns = self.pipeline.score_columns(self.pipeline.featurize_chunk(sequence, 0, len(sequence)))
+        self.table = self.pipeline.guide_table(self.columns, 'G')
+
+    def test_pack_roundtrip(self):
+        for length in (1, 3, 4, 20, 23):
+            codes = np.random.default_rng(length).integers(0, 5, size=(50, length)).astype(np.uint8)
+            packed, unknown = pack_bases(codes)
+            self.assertEqual(packed.shape, (50, -(-length // 4)))
+            np.testing.assert_array_equal(unpack_bases(packed, unknown, length), codes)
+
+    def test_records_match_columns(self):
+        records = self.table.to_records()
+        self.assertEqual(len(records), len(self.columns['pam_start']))
+        self.assertTrue(any('N' in record['guide_sequence'] for record in records))
+        for i in (0, 7, len(records) - 1):
+            record = records[i]
+            self.assertEqual(record['guide_sequence'], decode_sequence(self.columns['guide_codes'][i]))
+            self.assertEqual(record['pam_start'], self.columns['pam_start'][i])
+            self.assertEqual(record['composite_score'], self.columns['composite_score'][i])
+            self.assertEqual(record, self.table[i])
+        self.assertEqual(list(records[0])[:6],
+                         ['locus', 'guide_sequence', 'pam_sequence', 'pam_start', 'guide_start', 'strand'])
+        self.assertEqual(list(records[0])[-1], 'candidate_id')
+
+    def test_json_matches_json_dumps(self):
+        records = self.table.to_records()
+        self.assertEqual(self.table.to_json(), json.dumps(records))
+        self.assertEqual(self.table.to_ndjson().splitlines(), [json.dumps(r) for r in records])
+        tagged = self.pipeline.guide_table(self.columns, 'gene "x" 100%', nuclease='SaCas9')
+        self.assertEqual(json.loads(tagged.to_json()), tagged.to_records())
+        self.assertTrue(tagged[0]['candidate_id'].endswith('_SaCas9'))
+        message = {'type': 'guides', 'guides': self.table[:5]}
+        self.assertEqual(dumps(message), json.dumps({'type': 'guides', 'guides': self.table[:5].to_records()}))
+
+    def test_slices_are_views_and_takes_reorder(self):
+        view = self.table[10:20]
+        self.assertTrue(np.shares_memory(view.data, self.table.data))
+        order = np.argsort(-self.table['composite_score'])[:5]
+        ranked = self.table.take(order)
+        self.assertEqual([g['candidate_id'] for g in ranked],
+                         [self.table[i]['candidate_id'] for i in order.tolist()])
+        merged = GuideTable.concat([self.table[:3], self.table[3:]])
+        self.assertEqual(merged.to_records(), self.table.to_records())
+        np.testing.assert_array_equal(merged.guide_codes(), self.columns['guide_codes'])
+
+    def test_empty_table(self):
+        empty = self.table[:0]
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.to_json(), '[]')
+        self.assertEqual(self.pipeline.guide_table(self.pipeline.featurize_chunk('ACGT', 0, 4), 'G').to_records(),
+                         [])
+
+    def test_compact(self):
+        per_guide = self.table.nbytes / len(self.table)
+        # 2-bit guide + PAM and a dozen numeric fields, far below a dict per guide
+        self.assertLess(per_guide, 128)
+        self.assertEqual(self.table.data['guide'].shape[1], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests for streaming metrics."""
+
+import unittest
+import numpy as np
+from ..utils.config import Config
+from ..utils.metrics import MetricsCollector, QuantileSketch, StageTimer
+from ..pipeline import DesignPipeline
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_quantiles_within_relative_accuracy(self):
+        values = np.random.default_rng(0).lognormal(-4, 1.5, size=20000)
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+        for q in (0.5, 0.95, 0.99):
+            exact = np.quantile(values, q, method='lower')
+            self.assertLess(abs(sketch.quantile(q) - exact) / exact, 0.03)
+        self.assertEqual(sketch.count, len(values))
+        self.assertAlmostEqual(sketch.sum, values.sum())
+
+    def test_merge_and_fixed_size(self):
+        a, b, both = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        size = len(a.counts)
+        for i, value in enumerate(np.linspace(1e-4, 2.0, 1000)):
+            (a if i % 2 else b).add(value)
+            both.add(value)
+        a.merge(b)
+        self.assertEqual(len(a.counts), size)
+        np.testing.assert_array_equal(a.counts, both.counts)
+        self.assertEqual(a.quantile(0.99), both.quantile(0.99))
+        a.add(1e9)  # Clamped into the last bucket
+        self.assertEqual(len(a.counts), size)
+
+
+class TestMetricsCollector(unittest.TestCase):
+    def test_summary_and_prometheus(self):
+        metrics = MetricsCollector()
+        for i in range(100):
+            metrics.record_request('/crispr/design', 0.01 * (i + 1), success=i != 0)
+        metrics.record_design('G', 50, 10, 0.5)
+        metrics.record_feedback(4)
+        metrics.record_stages({'scan': 0.02, 'score': 0.01})
+        summary = metrics.get_summary()
+        self.assertEqual(summary['total_requests'], 100)
+        self.assertAlmostEqual(summary['success_rate'], 0.99)
+        self.assertIsNone(summary['rl_estimated_uplift'])
+        design = summary['endpoints']['/crispr/design']
+        self.assertEqual(design['errors'], 1)
+        self.assertAlmostEqual(design['p50'], 0.5, delta=0.02)
+        self.assertAlmostEqual(design['p99'], 0.99, delta=0.03)
+        self.assertEqual(set(summary['stages']), {'scan', 'score'})
+
+        text = metrics.prometheus_text({'design_cache_hits': 3})
+        self.assertIn('crispr_requests_total{endpoint="/crispr/design",status="error"} 1', text)
+        self.assertIn('crispr_request_duration_seconds_count{endpoint="/crispr/design"} 100', text)
+        self.assertIn('crispr_stage_duration_seconds{stage="scan",quantile="0.95"}', text)
+        self.assertIn('crispr_design_cache_hits 3', text)
+
+    def test_pipeline_records_stages_and_estimated_uplift(self):
+        metrics = MetricsCollector()
+        pipeline = DesignPipeline(Config(), metrics=metrics)
+        sequence = ''.join(np.random.default_rng(2).choice(list('ACGT'), size=2000))
+        timer = StageTimer()
+        pipeline.design(sequence, 'G', timer=timer)
+        summary = metrics.get_summary()
+        self.assertTrue({'scan', 'extract', 'score', 'optimize', 'rerank'} <= set(summary['stages']))
+        self.assertEqual(set(timer.totals), set(summary['stages']))
+        self.assertIsNotNone(summary['rl_estimated_uplift'])
+
+
+if __name__ == '__main__':
+    unittest.main()
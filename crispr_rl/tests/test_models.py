@@ -0,0 +1,140 @@
+"""Tests for learned on-target models."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ..utils.config import Config
+from ..utils.encoding import encode_sequence, decode_sequence, reverse_complement_codes, UNKNOWN
+from ..features.pam_scanner import PAMScanner
+from ..scoring.models import OnTargetModel, save_model, load_model, fit_linear_model, on_target_model
+from ..scoring.scorer import GuideScorer
+from ..pipeline import DesignPipeline
+
+
+def _random_contexts(n, length=30, seed=0):
+    return np.random.default_rng(seed).integers(0, 4, size=(n, length)).astype(np.uint8)
+
+
+class TestOnTargetModels(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.rng = np.random.default_rng(1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _linear(self, name='linear'):
+        arrays = {'position_weights': self.rng.normal(size=(30, 4)),
+                  'dinucleotide_weights': self.rng.normal(size=(29, 16))}
+        return save_model(os.path.join(self.tmp, name), 'linear', arrays, intercept=0.3), arrays
+
+    def test_linear_matches_one_hot_reference(self):
+        model, arrays = self._linear()
+        contexts = _random_contexts(50)
+        contexts[0, :5] = UNKNOWN
+        one_hot = np.eye(5)[contexts][:, :, :4]
+        pairs = np.eye(17)[np.where((contexts[:, :-1] < 4) & (contexts[:, 1:] < 4),
+                                    contexts[:, :-1] * 4 + contexts[:, 1:], 16)][:, :, :16]
+        logit = (np.einsum('npk,pk->n', one_hot, arrays['position_weights'])
+                 + np.einsum('npk,pk->n', pairs, arrays['dinucleotide_weights']) + 0.3)
+        np.testing.assert_allclose(model.predict(contexts), 1 / (1 + np.exp(-logit)), rtol=1e-5)
+
+    def test_batches_agree(self):
+        model, _ = self._linear()
+        contexts = _random_contexts(100)
+        np.testing.assert_allclose(model.predict(contexts, batch_size=7), model.predict(contexts))
+        with self.assertRaises(ValueError):
+            model.predict(contexts[:, :20])
+
+    def test_cnn_scores_in_unit_interval(self):
+        arrays = {'conv_weights': self.rng.normal(size=(8, 4, 4)), 'conv_bias': self.rng.normal(size=8),
+                  'dense_weights': self.rng.normal(size=(8, 5)), 'dense_bias': self.rng.normal(size=5),
+                  'output_weights': self.rng.normal(size=5)}
+        model = save_model(os.path.join(self.tmp, 'cnn'), 'cnn', arrays, output_bias=-0.2)
+        contexts = _random_contexts(40)
+        scores = model.predict(contexts)
+        self.assertEqual(scores.shape, (40,))
+        self.assertTrue(np.all((scores > 0) & (scores < 1)))
+        np.testing.assert_allclose(model.predict(contexts, batch_size=3), scores, rtol=1e-5)
+        model._kmers = None  # Per-tap gathers give the same convolution
+        np.testing.assert_allclose(model.predict(contexts), scores, rtol=1e-5)
+
+    def test_fit_recovers_signal(self):
+        contexts = _random_contexts(2000, seed=3)
+        activity = np.where(contexts[:, 23] == 2, 0.8, 0.2)  # G at the PAM-proximal guide base
+        model = fit_linear_model(contexts, activity, os.path.join(self.tmp, 'fit'), dinucleotides=False)
+        scores = model.predict(contexts)
+        self.assertGreater(scores[activity > 0.5].min(), scores[activity < 0.5].max())
+
+    def test_load_is_cached(self):
+        model, _ = self._linear()
+        self.assertIs(load_model(model.model_dir), model)
+        self.assertIsNone(on_target_model('heuristic'))
+        with self.assertRaises((OSError, ValueError)):
+            load_model(os.path.join(self.tmp, 'missing'))
+
+    def test_model_without_inference_is_rejected(self):
+        class Incomplete(OnTargetModel):
+            kind = 'incomplete'
+
+        metadata = {'flank5': 4, 'flank3': 3, 'guide_length': 20, 'pam_length': 3}
+        with self.assertRaises(TypeError):
+            Incomplete(self.tmp, metadata)
+
+
+class TestModelScoring(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        rng = np.random.default_rng(2)
+        save_model(self.tmp, 'linear', {'position_weights': rng.normal(size=(30, 4))})
+        self.config = Config()
+        self.config.on_target_model = self.tmp
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_context_codes_oriented(self):
+        sequence = 'ACGTACGTTTAGCTAGCTAGGATCGATCGAGGCCATTGACCT'
+        codes = encode_sequence(sequence)
+        sites = PAMScanner(Config()).scan(codes)
+        contexts = sites.context_codes(codes, 4, 3)
+        self.assertEqual(contexts.shape, (len(sites), 30))
+        for i in range(len(sites)):
+            lo = min(sites.guide_starts[i], sites.pam_starts[i])
+            if sites.strands[i] > 0:
+                window = codes[max(lo - 4, 0):lo + 26]
+                expected = np.concatenate([np.full(30 - len(window), UNKNOWN), window]) if lo < 4 else window
+            else:
+                window = codes[max(lo - 3, 0):lo + 27]
+                expected = reverse_complement_codes(window)
+                if lo < 3:
+                    expected = np.concatenate([expected, np.full(30 - len(window), UNKNOWN)])
+            self.assertEqual(decode_sequence(contexts[i]), decode_sequence(expected[:30]))
+            # The protospacer sits after the 5' flank
+            guide = sites.guide_codes(codes)[i]
+            np.testing.assert_array_equal(contexts[i, 4:24], guide)
+
+    def test_pipeline_scores_with_model(self):
+        pipeline = DesignPipeline(self.config)
+        sequence = decode_sequence(_random_contexts(1, 3000, seed=5)[0])
+        result = pipeline.design(sequence, 'G', top_k=5)
+        self.assertNotIn('context_codes', result['guides'][0])
+        codes = encode_sequence(sequence)
+        sites = pipeline.scanner.scan(codes)
+        model = pipeline.scorer.model
+        expected = dict(zip(sites.pam_starts.tolist(), model.predict(sites.context_codes(codes, 4, 3))))
+        for guide in result['guides']:
+            self.assertAlmostEqual(guide['on_target_score'], expected[guide['pam_start']], places=6)
+
+    def test_scalar_and_batch_agree(self):
+        scorer = GuideScorer(self.config)
+        contexts = _random_contexts(5)
+        batch = scorer.score_on_target_batch({'context_codes': contexts, 'gc_content': np.full(5, 50.0)})
+        for row, expected in zip(contexts, batch):
+            self.assertAlmostEqual(scorer.score_on_target({'context_codes': row}), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Tests for the off-target seed index."""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from ..data.offtarget_index import OffTargetIndex
+from ..features.pam_scanner import PAMScanner
+from ..utils.config import Config
+
+
+def _mutate(guide: str, positions) -> str:
+    swap = {'A': 'C', 'C': 'G', 'G': 'T', 'T': 'A'}
+    return ''.join(swap[b] if i in positions else b for i, b in enumerate(guide))
+
+
+class TestOffTargetIndex(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        rng = np.random.default_rng(7)
+        self.contigs = {
+            'chr1': ''.join(rng.choice(list('ACGT'), 3000)),
+            'chr2': ''.join(rng.choice(list('ACGT'), 2000)) + 'NNNN' + ''.join(rng.choice(list('ACGT'), 500)),
+        }
+        self.tmp = tempfile.TemporaryDirectory()
+        fasta = os.path.join(self.tmp.name, 'ref.fa')
+        with open(fasta, 'w') as f:
+            for name, seq in self.contigs.items():
+                f.write(f">{name} test contig\n")
+                for i in range(0, len(seq), 60):
+                    f.write(seq[i:i + 60] + "\n")
+        self.index = OffTargetIndex.build(fasta, os.path.join(self.tmp.name, 'idx'), self.config, max_mismatches=3)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _all_protospacers(self):
+        scanner = PAMScanner(self.config)
+        sites = []
+        for name, seq in self.contigs.items():
+            for site in scanner.find_pam_sites(seq):
+                if 'N' not in site['guide_sequence']:
+                    sites.append((name, site['pam_start'], site['strand'], site['guide_sequence']))
+        return sites
+
+    def test_index_matches_brute_force(self):
+        reference = self._all_protospacers()
+        self.assertEqual(len(self.index), len(reference))
+        guide = reference[10][3]
+        queries = [guide, _mutate(guide, {0, 7}), _mutate(guide, {3, 11, 19})]
+        results = self.index.search(queries)
+        for query, (sites, mismatches) in zip(queries, results):
+            expected = sorted(
+                (name, pos, strand) for name, pos, strand, seq in reference
+                if sum(a != b for a, b in zip(seq, query)) <= 3
+            )
+            found = sorted((s['contig'], s['pam_start'], s['strand']) for s in self.index.describe(sites))
+            self.assertEqual(found, expected)
+            self.assertTrue(all(m <= 3 for m in mismatches))
+
+    def test_blocked_search_matches_single_pass(self):
+        queries = [site[3] for site in self._all_protospacers()[:40]] + ['N' * 20]
+        whole = self.index.search_pairs(queries)
+        for max_candidates in (1, 7, 100):
+            blocked = self.index.search_pairs(queries, max_candidates=max_candidates)
+            for expected, found in zip(whole, blocked):
+                np.testing.assert_array_equal(found, expected)
+        empty = self.index.search_pairs([])
+        self.assertEqual([len(part) for part in empty[:3]], [0, 0, 0])
+
+    def test_off_target_counts_exclude_self(self):
+        guide = self._all_protospacers()[0][3]
+        counts = self.index.count_hits([guide])
+        self.assertGreaterEqual(counts[0, 0], 1)
+        total = self.index.off_target_counts([guide])
+        self.assertEqual(total[0], counts.sum() - 1)
+
+    def test_reload_is_memory_mapped(self):
+        reloaded = OffTargetIndex.load(self.index.index_dir)
+        self.assertIsInstance(reloaded.protospacers, np.memmap)
+        self.assertEqual(reloaded.contigs, ['chr1', 'chr2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Tests for the contextual bandit optimizer."""
+
+import unittest
+import numpy as np
+from ..rl.optimizer import RLOptimizer, CONTEXT_DIM
+from ..scoring.scorer import GuideScorer
+from ..utils.config import Config
+
+
+def _guides(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'gc_content': float(gc), 'thermodynamic': float(th), 'context_weight': float(cw),
+            'pam_gc': 66.7, 'on_target_score': float(on), 'off_target_penalty': float(off),
+            'composite_score': float(0.5 * on - 0.3 * off + 0.2),
+        }
+        for gc, th, cw, on, off in zip(rng.uniform(20, 80, n), rng.uniform(-10, 10, n), rng.uniform(0, 1, n),
+                                       rng.uniform(0, 1, n), rng.uniform(0, 0.5, n))
+    ]
+
+
+class TestRLOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.config.rl_params['alpha'] = 0.0
+        self.optimizer = RLOptimizer(self.config, GuideScorer(self.config))
+
+    def test_prior_ranks_by_composite(self):
+        guides = _guides(50)
+        ranked = self.optimizer.optimize_guides(guides, top_k=10)
+        expected = sorted(guides, key=lambda g: g['composite_score'], reverse=True)[:10]
+        self.assertEqual(ranked, expected)
+        self.assertEqual(len(guides), 50)  # Candidates are not consumed
+
+    def test_feedback_shifts_ranking(self):
+        guides = _guides(200, seed=1)
+        X = self.optimizer.guide_contexts(guides)
+        # Users consistently prefer low-GC guides
+        for _ in range(5):
+            for g, x in zip(guides, X):
+                self.optimizer.update(x, 1.0 - g['gc_content'] / 100)
+        top = self.optimizer.optimize_guides(guides, top_k=20)
+        self.assertLess(np.mean([g['gc_content'] for g in top]), np.mean([g['gc_content'] for g in guides]) - 10)
+
+    def test_sherman_morrison_matches_direct_inverse(self):
+        X = self.optimizer.guide_contexts(_guides(30, seed=2))
+        for x in X:
+            self.optimizer.update(x, 0.5)
+        A = np.eye(CONTEXT_DIM) * self.config.rl_params['ridge'] + X.T @ X
+        np.testing.assert_allclose(self.optimizer.A_inv, np.linalg.inv(A), rtol=1e-8, atol=1e-10)
+
+    def test_ridge_updates_apply_on_reset(self):
+        self.config.rl_params['ridge'] = 4.0
+        self.optimizer.reset()
+        np.testing.assert_array_equal(self.optimizer.A_inv, np.eye(CONTEXT_DIM) / 4.0)
+
+    def test_thompson_is_deterministic_under_seed(self):
+        self.config.rl_policy = 'thompson'
+        self.config.rl_params['alpha'] = 0.5
+        guides = _guides(100, seed=3)
+        first = RLOptimizer(self.config, GuideScorer(self.config)).optimize_guides(guides, top_k=10)
+        second = RLOptimizer(self.config, GuideScorer(self.config)).optimize_guides(guides, top_k=10)
+        self.assertEqual(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+"""Tests for the chunked design pipeline."""
+
+import unittest
+from ..utils.config import Config
+from ..features.pam_scanner import PAMScanner
+from ..features.extractor import FeatureExtractor
+from ..scoring.scorer import GuideScorer
+from ..pipeline import DesignPipeline, DesignCache
+from .helpers import random_sequence
+
+
+class TestDesignPipeline(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.pipeline = DesignPipeline(self.config)
+        self.sequence = random_sequence(3000)
+
+    def _all_guides(self, chunk_size, start=0, end=None):
+        guides = []
+        for chunk in self.pipeline.iter_chunks(self.sequence, 'G', start, end, chunk_size):
+            guides.extend(chunk)
+        return guides
+
+    def test_chunking_preserves_sites_and_features(self):
+        whole = self._all_guides(10 ** 6)
+        for chunk_size in (7, 100, 997):
+            chunked = self._all_guides(chunk_size)
+            self.assertEqual(whole, chunked)
+
+    def test_matches_unchunked_scan(self):
+        scanner = PAMScanner(self.config)
+        extractor = FeatureExtractor()
+        scorer = GuideScorer(self.config)
+        records = scanner.find_pam_sites(self.sequence, 500, 2000)
+        guides = self._all_guides(64, 500, 2000)
+        self.assertEqual([r['locus'] for r in records], [g['locus'] for g in guides])
+        for record, guide in list(zip(records, guides))[::25]:
+            features = extractor.extract_features(record['guide_sequence'], record['pam_sequence'],
+                                                  record['locus'], len(self.sequence))
+            self.assertAlmostEqual(features['context_weight'], guide['context_weight'])
+            self.assertAlmostEqual(scorer.score_guide(features)['composite_score'], guide['composite_score'])
+
+    def test_stream_matches_design(self):
+        design = self.pipeline.design(self.sequence, 'G', top_k=5)
+        messages = list(self.pipeline.iter_design(self.sequence, 'G', top_k=5, chunk_size=250))
+        self.assertEqual(messages[-1]['type'], 'summary')
+        streamed = [g for m in messages[:-1] for g in m['guides']]
+        self.assertEqual(len(streamed), design['total_sites'])
+        self.assertEqual(messages[-1]['total_sites'], design['total_sites'])
+        self.assertEqual([g['candidate_id'] for g in messages[-1]['guides']],
+                         [g['candidate_id'] for g in design['guides']])
+        self.assertEqual(len(design['guides']), 5)
+
+    def test_design_nucleases_single_scan(self):
+        result = self.pipeline.design_nucleases(self.sequence, 'G', ['SpCas9', 'SaCas9', 'Cas12a'], 100, 2900,
+                                                top_k=5, chunk_size=700)
+        self.assertEqual(list(result['nucleases']), ['SpCas9', 'SaCas9', 'Cas12a'])
+        cas12a = result['nucleases']['Cas12a']['guides']
+        self.assertTrue(all(g['pam_sequence'][:3] == 'TTT' and len(g['guide_sequence']) == 23 for g in cas12a))
+        self.assertTrue(all(g['candidate_id'].endswith('_Cas12a') for g in cas12a))
+        # SpCas9 matches the default (NGG, 20 nt) design apart from the nuclease tag
+        default = self.pipeline.design(self.sequence, 'G', 100, 2900, top_k=5)
+        spcas9 = result['nucleases']['SpCas9']
+        self.assertEqual(spcas9['total_sites'], default['total_sites'])
+        self.assertEqual([g['locus'] for g in spcas9['guides']], [g['locus'] for g in default['guides']])
+
+    def test_top_k_beyond_pool_size(self):
+        result = self.pipeline.design(self.sequence, 'G', top_k=50, pool_size=20)
+        self.assertGreater(result['total_sites'], 50)
+        self.assertEqual(len(result['guides']), 50)
+
+    def test_empty_region(self):
+        result = self.pipeline.design('ACGT' * 3, 'G')
+        self.assertEqual(result['total_sites'], 0)
+        self.assertEqual(result['guides'], [])
+
+
+class TestDesignCache(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.pipeline = DesignPipeline(self.config, cache=DesignCache(max_entries=8))
+        self.sequence = random_sequence(2000, seed=1)
+
+    def test_repeat_design_hits_cache(self):
+        self.assertIsNone(self.pipeline.lookup('G', 0, 1500))
+        result = self.pipeline.design(self.sequence, 'G', 0, 1500)
+        self.assertEqual(self.pipeline.lookup('G', 0, 1500), result)
+        stats = self.pipeline.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_any_region_served_from_site_index(self):
+        self.pipeline.design(self.sequence, 'G', 0, 1500)
+        for start, end in [(0, 1000), (700, 1900), (1990, 2000), (0, None)]:
+            fresh = DesignPipeline(self.config).design(self.sequence, 'G', start, end)
+            self.assertEqual(self.pipeline.lookup('G', start, end), fresh)
+        self.assertEqual(self.pipeline.cache.stats()['rescored'], 4)
+
+    def test_long_sequence_not_indexed(self):
+        self.config.site_index_max_length = 1000
+        self.pipeline.design(self.sequence, 'G', 0, 1500)
+        self.assertIsNone(self.pipeline.site_index('G'))
+        self.assertIsNone(self.pipeline.lookup('G', 0, 1000))
+
+    def test_oversized_index_falls_back_to_region_scans(self):
+        pipeline = DesignPipeline(self.config, cache=DesignCache(max_entries=8, max_bytes=10_000))
+        builds = []
+        build = pipeline.build_site_index
+        pipeline.build_site_index = lambda *args: builds.append(1) or build(*args)
+        for start, end in [(0, 500), (500, 1000)]:
+            fresh = DesignPipeline(self.config).design(self.sequence, 'G', start, end)
+            self.assertEqual(pipeline.design(self.sequence, 'G', start, end), fresh)
+        self.assertEqual(builds, [])
+        self.assertIn(pipeline._index_key('G'), pipeline.cache.oversized)
+        self.assertEqual(pipeline.cache.features.stats()['entries'], 0)
+
+    def test_reweighting_rescores_cached_features(self):
+        self.pipeline.design(self.sequence, 'G', 0, 1500)
+        self.config.weights['on_target'] = 0.9
+        self.pipeline.config_changed()
+        rescored = self.pipeline.lookup('G', 0, 1500)
+        self.assertEqual(self.pipeline.cache.stats()['rescored'], 1)
+        fresh = DesignPipeline(self.config).design(self.sequence, 'G', 0, 1500)
+        self.assertEqual(rescored, fresh)
+
+    def test_pam_change_invalidates(self):
+        self.pipeline.design(self.sequence, 'G', 0, 1500)
+        self.config.pam_sequence = 'NAG'
+        self.pipeline.config_changed(scan=True)
+        self.assertIsNone(self.pipeline.lookup('G', 0, 1500))
+        result = self.pipeline.design(self.sequence, 'G', 0, 1500)
+        self.assertTrue(all(g['pam_sequence'].endswith('AG') for g in result['guides']))
+
+    def test_policy_update_misses_result_tier(self):
+        result = self.pipeline.design(self.sequence, 'G', 0, 1500)
+        self.pipeline.optimizer.update_policy(result['guides'][0], 1.0)
+        self.pipeline.lookup('G', 0, 1500)
+        self.assertEqual(self.pipeline.cache.stats()['rescored'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Tests for the shared bandit policy store."""
+
+import multiprocessing
+import os
+import tempfile
+import unittest
+import numpy as np
+from ..utils.config import Config
+from ..scoring.scorer import GuideScorer
+from ..rl.optimizer import RLOptimizer, CONTEXT_DIM
+from ..rl.policy_store import PolicyStore
+from ..pipeline import DesignPipeline
+
+
+def _contexts(n, seed):
+    X = np.random.default_rng(seed).uniform(0, 1, size=(n, CONTEXT_DIM))
+    X[:, 0] = 1.0
+    return X
+
+
+def _update_worker(path, seed):
+    config = Config()
+    optimizer = RLOptimizer(config, GuideScorer(config), PolicyStore(path))
+    for x in _contexts(20, seed):
+        optimizer.update(x, 0.5)
+
+
+class TestPolicyStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'policy.db')
+        self.config = Config()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _optimizer(self, **kwargs):
+        return RLOptimizer(self.config, GuideScorer(self.config), PolicyStore(self.path, **kwargs))
+
+    def test_workers_share_and_warm_start(self):
+        first, second = self._optimizer(), self._optimizer()
+        version = second.version
+        for x in _contexts(5, 0):
+            first.update(x, 1.0)
+        self.assertEqual(second.version, version + 5)
+        np.testing.assert_array_equal(second.A_inv, first.A_inv)
+        restarted = self._optimizer()
+        np.testing.assert_array_equal(restarted.theta, first.theta)
+        restarted.reset()
+        np.testing.assert_array_equal(first.b, first.prior()[1])
+
+    def test_concurrent_processes_lose_no_updates(self):
+        version = self._optimizer().version
+        processes = [multiprocessing.Process(target=_update_worker, args=(self.path, seed)) for seed in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+        optimizer = self._optimizer()
+        self.assertEqual(optimizer.version, version + 60)
+        X = np.concatenate([_contexts(20, seed) for seed in range(3)])
+        A = np.eye(CONTEXT_DIM) * self.config.rl_params['ridge'] + X.T @ X
+        np.testing.assert_allclose(optimizer.A_inv, np.linalg.inv(A), rtol=1e-8, atol=1e-10)
+
+    def test_snapshots_and_restore(self):
+        optimizer = self._optimizer(snapshot_every=4, keep_snapshots=2)
+        for x in _contexts(11, 1):  # Versions 2-12 after the prior
+            optimizer.update(x, 0.2)
+        self.assertEqual(optimizer.store.snapshots(), [12, 8])
+        theta = optimizer.theta
+        optimizer.update(_contexts(1, 2)[0], 1.0)
+        optimizer.store.restore()
+        np.testing.assert_array_equal(optimizer.theta, theta)
+        with self.assertRaises(KeyError):
+            optimizer.store.restore(4)
+
+    def test_feedback_joins_served_contexts(self):
+        optimizer = self._optimizer()
+        pipeline = DesignPipeline(self.config, optimizer=optimizer)
+        sequence = ''.join(np.random.default_rng(5).choice(list('ACGT'), 3000))
+        guides = pipeline.design(sequence, 'G', top_k=5)['guides']
+        other = RLOptimizer(self.config, GuideScorer(self.config), PolicyStore(self.path))
+        version = other.version
+        self.assertTrue(other.update_from_feedback(guides[0]['candidate_id'], 1.0))
+        self.assertFalse(other.update_from_feedback('unknown', 1.0))
+        self.assertEqual(optimizer.version, version + 1)
+        np.testing.assert_array_equal(other.contexts([guides[1]['candidate_id']])[guides[1]['candidate_id']],
+                                      optimizer.guide_contexts([guides[1]])[0])
+
+        store = PolicyStore(os.path.join(self.tmp.name, 'small.db'), max_contexts=3)
+        store.remember([f'c{i}' for i in range(5)], _contexts(5, 3))
+        store.remember(['c1'], _contexts(1, 4))
+        self.assertEqual(sorted(store.contexts([f'c{i}' for i in range(5)])), ['c1', 'c3', 'c4'])
+
+    def test_in_memory_policy_remembers_served_guides(self):
+        optimizer = RLOptimizer(self.config, GuideScorer(self.config))
+        guides = [{'candidate_id': 'a', 'composite_score': 0.5}]
+        optimizer.remember(guides)
+        self.assertTrue(optimizer.update_from_feedback('a', 0.8))
+        self.assertEqual(optimizer.version, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Tests for Pareto reranking."""
+
+import time
+import unittest
+import numpy as np
+from ..rl.reranker import ParetoReranker
+
+
+def _brute_force_ranks(points):
+    ranks = np.full(len(points), -1)
+    remaining = set(range(len(points)))
+    rank = 0
+    while remaining:
+        front = [i for i in remaining if not any(
+            np.all(points[j] >= points[i]) and np.any(points[j] > points[i]) for j in remaining
+        )]
+        ranks[front] = rank
+        remaining -= set(front)
+        rank += 1
+    return ranks
+
+
+class TestParetoReranker(unittest.TestCase):
+    def setUp(self):
+        self.reranker = ParetoReranker()
+
+    def test_non_dominated_sort_matches_brute_force(self):
+        rng = np.random.default_rng(5)
+        for m in (2, 3, 4):
+            for _ in range(10):
+                # Small integer grids produce plenty of ties and duplicates
+                points = rng.integers(0, 5, (40, m)).astype(float)
+                expected = _brute_force_ranks(points)
+                np.testing.assert_array_equal(self.reranker.non_dominated_sort(points), expected)
+                np.testing.assert_array_equal(self.reranker.pareto_front_indices(points),
+                                              np.flatnonzero(expected == 0))
+
+    def test_divide_and_conquer_matches_brute_force(self):
+        rng = np.random.default_rng(6)
+        for m in (4, 5):
+            for high in (3, 100):
+                points = rng.integers(0, high, (120, m)).astype(float)
+                order, repeat = self.reranker._lex_order(points)
+                distinct = points[order[~repeat]]
+                # Tiny thresholds exercise every branch of the recursion
+                ranks = self.reranker._divide_and_conquer_ranks(distinct, leaf=4, brute_pairs=16)
+                np.testing.assert_array_equal(ranks, _brute_force_ranks(distinct))
+
+    def test_many_objectives_scale(self):
+        rng = np.random.default_rng(7)
+
+        def timed(n):
+            # Anti-correlated objectives: most points are mutually non-dominated
+            points = rng.random((n, 4))
+            points = points / points.sum(axis=1, keepdims=True) + 0.01 * rng.random((n, 4))
+            start = time.perf_counter()
+            ranks = self.reranker.non_dominated_sort(points)
+            return time.perf_counter() - start, ranks
+
+        small, _ = timed(10_000)
+        large, ranks = timed(100_000)
+        self.assertGreater(ranks.max(), 0)
+        self.assertLess(large, 40 * small)  # A quadratic sort takes 100x as long
+
+    def test_crowding_distance_boundaries(self):
+        points = np.array([[0.0, 3.0], [1.0, 2.0], [2.0, 1.0], [3.0, 0.0]])
+        ranks = self.reranker.non_dominated_sort(points)
+        distance = self.reranker.crowding_distance(points, ranks)
+        self.assertTrue(np.isinf(distance[[0, 3]]).all())
+        np.testing.assert_allclose(distance[[1, 2]], [4 / 3, 4 / 3])
+
+    def test_pareto_front_and_rerank(self):
+        guides = [
+            {'on_target_score': 0.9, 'off_target_penalty': 0.5, 'composite_score': 0.3},
+            {'on_target_score': 0.8, 'off_target_penalty': 0.1, 'composite_score': 0.4},
+            {'on_target_score': 0.7, 'off_target_penalty': 0.4, 'composite_score': 0.2},
+            {'on_target_score': 0.6, 'off_target_penalty': 0.05, 'composite_score': 0.3},
+        ]
+        front = self.reranker.pareto_front(guides)
+        self.assertEqual(front, [guides[0], guides[1], guides[3]])
+        ranked = self.reranker.rerank(guides, top_k=4)
+        self.assertEqual(ranked[-1], guides[2])
+        self.assertEqual(len(self.reranker.rerank(guides, top_k=2)), 2)
+        columns = {key: np.array([g[key] for g in guides]) for key in guides[0]}
+        order = self.reranker.rerank_indices(columns, len(guides), top_k=4)
+        self.assertEqual([guides[i] for i in order.tolist()], ranked)
+
+    def test_extra_objectives(self):
+        reranker = ParetoReranker(objectives=(('on_target_score', True), ('off_target_hits', False)))
+        guides = [
+            {'on_target_score': 0.9, 'off_target_hits': 10},
+            {'on_target_score': 0.5, 'off_target_hits': 0},
+            {'on_target_score': 0.4, 'off_target_hits': 3},
+        ]
+        self.assertEqual(reranker.pareto_front(guides), guides[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
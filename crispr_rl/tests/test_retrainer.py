@@ -0,0 +1,107 @@
+"""Tests for background batched policy retraining."""
+
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+from ..utils.config import Config
+from ..scoring.scorer import GuideScorer
+from ..rl.optimizer import RLOptimizer, CONTEXT_DIM
+from ..rl.policy_store import PolicyStore
+from ..rl.feedback_manager import FeedbackManager
+from ..rl.retrainer import PolicyRetrainer, FEEDBACK_OFFSET
+
+
+def _contexts(n, seed):
+    X = np.random.default_rng(seed).uniform(0, 1, size=(n, CONTEXT_DIM))
+    X[:, 0] = 1.0
+    return X
+
+
+class TestPolicyRetrainer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = Config()
+        self.feedback = FeedbackManager(os.path.join(self.tmp.name, 'feedback.db'), legacy_file=None)
+        self.X = _contexts(30, 0)
+        self.ids = [f'cand{i}' for i in range(len(self.X))]
+
+    def tearDown(self):
+        self.feedback.close()
+        self.tmp.cleanup()
+
+    def _optimizer(self, store=True):
+        store = PolicyStore(os.path.join(self.tmp.name, 'policy.db')) if store else None
+        optimizer = RLOptimizer(self.config, GuideScorer(self.config), store)
+        if store is not None:
+            store.remember(self.ids, self.X)
+        else:
+            for cid, x in zip(self.ids, self.X):
+                optimizer.served.put(cid, x)
+        return optimizer
+
+    def test_batches_match_sequential_updates(self):
+        optimizer = self._optimizer()
+        reference = self._optimizer(store=False)
+        ratings = np.random.default_rng(1).uniform(1, 5, len(self.X))
+        for cid, rating in zip(self.ids, ratings):
+            self.feedback.add_feedback(cid, rating)
+        self.feedback.add_feedback('never-served', 5)
+        retrainer = PolicyRetrainer(optimizer, self.feedback, self.config, batch_size=7)
+        version = optimizer.version
+        self.assertEqual(retrainer.run_once(), len(self.X))
+        self.assertEqual(optimizer.version, version + 5)  # One swap per batch of 7
+        for x, rating in zip(self.X, ratings):
+            reference.update(x, rating / 5.0)
+        np.testing.assert_allclose(optimizer.A_inv, reference.A_inv, rtol=1e-8, atol=1e-12)
+        np.testing.assert_allclose(optimizer.b, reference.b)
+        self.assertEqual(retrainer.stats()['skipped'], 1)
+        self.assertEqual(retrainer.run_once(), 0)  # Nothing new
+
+    def test_shared_offset_applies_each_entry_once(self):
+        first, second = self._optimizer(), self._optimizer()
+        for cid in self.ids[:10]:
+            self.feedback.add_feedback(cid, 4)
+        a = PolicyRetrainer(first, self.feedback, self.config)
+        b = PolicyRetrainer(second, self.feedback, self.config)
+        self.assertEqual(a.run_once() + b.run_once(), 10)
+        self.assertEqual(first.offset(FEEDBACK_OFFSET), self.feedback.count())
+        for cid in self.ids[10:15]:
+            self.feedback.add_feedback(cid, 2)
+        self.assertEqual(b.run_once(), 5)
+        self.assertEqual(a.run_once(), 0)
+
+    def test_decay_and_replay(self):
+        self.config.rl_params['decay'] = 0.5
+        optimizer = self._optimizer()
+        for cid in self.ids:
+            self.feedback.add_feedback(cid, 5)
+        retrainer = PolicyRetrainer(optimizer, self.feedback, self.config, batch_size=1000)
+        retrainer.run_once()
+        # Only the last few observations keep noticeable weight
+        X = self.X[-10:]
+        A = np.eye(CONTEXT_DIM) * self.config.rl_params['ridge'] + (X * 0.5 ** np.arange(9, -1, -1)[:, None]).T @ X
+        np.testing.assert_allclose(optimizer.A_inv, np.linalg.inv(A), rtol=1e-2, atol=1e-3)
+        theta = optimizer.theta
+        self.config.rl_params['decay'] = 1.0
+        self.assertEqual(retrainer.replay(), len(self.X))
+        self.assertFalse(np.allclose(optimizer.theta, theta))
+        self.assertEqual(optimizer.offset(FEEDBACK_OFFSET), self.feedback.count())
+
+    def test_background_thread(self):
+        optimizer = self._optimizer()
+        retrainer = PolicyRetrainer(optimizer, self.feedback, self.config, interval=0.01)
+        retrainer.start()
+        try:
+            self.feedback.add_feedback(self.ids[0], 3)
+            deadline = time.time() + 5
+            while retrainer.applied < 1 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            retrainer.stop()
+        self.assertEqual(retrainer.applied, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 """Tests for scoring functions."""
 
 import unittest
+import numpy as np
 from ..scoring.scorer import GuideScorer
 from ..utils.config import Config
 
@@ -21,6 +22,12 @@ class TestGuideScorer(unittest.TestCase):
         penalty = self.scorer.score_off_target(features)
         self.assertGreaterEqual(penalty, 0)
 
+    def test_off_target_scoring_uses_index_hits(self):
+        features = {'gc_content': 50, 'context_weight': 0.8, 'off_target_hits': 3}
+        self.assertAlmostEqual(self.scorer.score_off_target(features), 0.75)
+        features['off_target_hits'] = 0
+        self.assertEqual(self.scorer.score_off_target(features), 0.0)
+
     def test_composite_reward(self):
         on_target = 0.8
         off_target = 0.2
@@ -41,5 +48,25 @@ class TestGuideScorer(unittest.TestCase):
         self.assertIn('composite_score', scores)
 
 
+    def test_batch_scoring_matches_scalar(self):
+        rng = np.random.default_rng(3)
+        columns = {
+            'gc_content': rng.uniform(0, 100, 50),
+            'thermodynamic': rng.integers(-20, 21, 50).astype(float),
+            'context_weight': rng.uniform(0, 1, 50),
+        }
+        batch = self.scorer.score_batch(columns)
+        for i in range(50):
+            scalar = self.scorer.score_guide({key: values[i] for key, values in columns.items()})
+            for key, value in scalar.items():
+                self.assertAlmostEqual(batch[key][i], value, msg=key)
+
+        columns['off_target_hits'] = rng.integers(0, 10, 50)
+        batch = self.scorer.score_batch(columns)
+        for i in range(50):
+            scalar = self.scorer.score_guide({key: values[i] for key, values in columns.items()})
+            self.assertAlmostEqual(batch['off_target_penalty'][i], scalar['off_target_penalty'])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""Tests for the per-sequence site index."""
+
+import unittest
+import numpy as np
+from ..utils.config import Config
+from ..features.site_index import SiteIndex
+from ..pipeline import DesignPipeline
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.sequence = ''.join(rng.choice(list('ACGT'), size=5000))
+        self.pipeline = DesignPipeline(Config())
+        self.index = self.pipeline.build_site_index(self.sequence)
+
+    def test_sorted_and_complete(self):
+        starts = self.index.columns['pam_start']
+        self.assertTrue(np.all(np.diff(starts) >= 0))
+        whole = self.pipeline.featurize_chunk(self.sequence, 0, len(self.sequence))
+        self.assertEqual(len(self.index), len(whole['pam_start']))
+
+    def test_query_matches_region_scan(self):
+        for start, end in [(0, 5000), (123, 987), (2500, 2503), (4990, 6000), (800, 800)]:
+            region = self.pipeline.featurize_chunk(self.sequence, start, max(min(end, 5000) - 2, start))
+            sliced = self.index.query(start, end)
+            self.assertEqual(self.index.count(start, end), len(region['pam_start']))
+            for key, values in region.items():
+                np.testing.assert_array_equal(sliced[key], values)
+
+    def test_query_is_a_view(self):
+        sliced = self.index.query(1000, 2000)
+        self.assertTrue(np.shares_memory(sliced['gc_content'], self.index.columns['gc_content']))
+
+    def test_unsorted_input_is_sorted(self):
+        columns = {'pam_start': np.array([9, 2, 5]), 'gc_content': np.array([0.9, 0.2, 0.5])}
+        index = SiteIndex(columns, 20, 3)
+        np.testing.assert_array_equal(index.query(0, 8)['gc_content'], [0.2, 0.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+"""Tests for bit-parallel mismatch counting and specificity scores."""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from ..utils.config import Config
+from ..utils.encoding import pack_kmers
+from ..scoring.specificity import (
+    SpecificityModel, MIT_WEIGHTS, mismatch_mask, pairwise_mismatches, self_similarity,
+)
+from ..scoring.scorer import GuideScorer
+from ..data.offtarget_index import OffTargetIndex
+from ..pipeline import DesignPipeline
+
+
+def _mit_hit_score(guide, site):
+    """Reference MIT hit score (as in CRISPOR's calcHitScore), scaled to [0, 1].
+
+    Longer guides pad the weights with zeros at the PAM-distal end.
+    """
+    weights = [0.0] * (len(guide) - len(MIT_WEIGHTS)) + list(MIT_WEIGHTS)
+    longest = len(guide) - 1
+    score, last, distances, count = 1.0, None, [], 0
+    for pos, (a, b) in enumerate(zip(guide, site)):
+        if a != b:
+            count += 1
+            if last is not None:
+                distances.append(pos - last)
+            score *= 1 - weights[pos]
+            last = pos
+    spacing = 1.0 if count < 2 else 1.0 / (((longest - sum(distances) / len(distances)) / longest) * 4 + 1)
+    return score * spacing / (count ** 2 if count else 1)
+
+
+class TestSpecificityKernel(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.guides = rng.integers(0, 4, size=(200, 20))
+        # Sites near each guide: 0-4 random substitutions
+        self.sites = self.guides.copy()
+        for row, n in zip(self.sites, rng.integers(0, 5, size=200)):
+            positions = rng.choice(20, n, replace=False)
+            row[positions] = (row[positions] + rng.integers(1, 4, n)) % 4
+        self.packed_guides = pack_kmers(self.guides)
+        self.packed_sites = pack_kmers(self.sites)
+
+    def test_mismatch_mask(self):
+        mask = mismatch_mask(self.packed_guides, self.packed_sites)
+        for guide, site, bits in zip(self.guides[:50], self.sites[:50], mask[:50].tolist()):
+            expected = sum(1 << (19 - p) for p in np.flatnonzero(guide != site))
+            self.assertEqual(bits, expected)
+
+    def test_mit_matches_reference(self):
+        scores = SpecificityModel.mit().hit_scores(self.packed_guides, self.packed_sites)
+        for guide, site, score in zip(self.guides, self.sites, scores):
+            self.assertAlmostEqual(score, _mit_hit_score(guide.tolist(), site.tolist()))
+
+    def test_mit_spacing_follows_guide_length(self):
+        rng = np.random.default_rng(9)
+        guides = rng.integers(0, 4, size=(100, 23))
+        sites = (guides + (rng.random((100, 23)) < 0.15) * rng.integers(1, 4, (100, 23))) % 4
+        scores = SpecificityModel.mit(23).hit_scores(pack_kmers(guides), pack_kmers(sites))
+        for guide, site, score in zip(guides, sites, scores):
+            self.assertAlmostEqual(score, _mit_hit_score(guide.tolist(), site.tolist()))
+
+    def test_perfect_match_scalar_pair(self):
+        guide = pack_kmers(self.guides[:1])[0]
+        with np.errstate(all='raise'):
+            self.assertEqual(SpecificityModel.mit().hit_scores(guide, guide), 1.0)
+
+    def test_cfd_table_product(self):
+        activity = np.random.default_rng(4).random((20, 4, 4))
+        scores = SpecificityModel(activity).hit_scores(self.packed_guides, self.packed_sites)
+        for guide, site, score in zip(self.guides, self.sites, scores):
+            expected = np.prod([activity[p, g, s] for p, (g, s) in enumerate(zip(guide, site)) if g != s])
+            self.assertAlmostEqual(score, expected)
+        with self.assertRaises(ValueError):
+            SpecificityModel(np.ones((20, 4)))
+
+    def test_pairwise_and_self_similarity(self):
+        counts = pairwise_mismatches(self.packed_guides[:30], self.packed_sites, block_pairs=100)
+        expected = (self.guides[:30, None, :] != self.sites[None, :, :]).sum(axis=2)
+        np.testing.assert_array_equal(counts, expected)
+        library = pack_kmers(np.concatenate([self.guides[:5], self.sites[:5]]))
+        similar = self_similarity(library, max_mismatches=4, block_pairs=7)
+        distances = (np.concatenate([self.guides[:5], self.sites[:5]])[:, None]
+                     != np.concatenate([self.guides[:5], self.sites[:5]])[None]).sum(axis=2)
+        np.testing.assert_array_equal(similar, (distances <= 4).sum(axis=1) - 1)
+
+    def test_specificity_aggregates_hits(self):
+        model = SpecificityModel.mit()
+        guide_index = np.array([0, 0, 0, 1])
+        scores = np.array([1.0, 0.5, 0.25, 0.1])
+        np.testing.assert_allclose(model.specificity(guide_index, scores, 3), [1 / 1.75, 1 / 1.1, 1.0])
+        library = model.library_specificity(self.packed_guides[:10])
+        self.assertTrue(np.all((library > 0) & (library <= 1)))
+
+
+class TestIndexSpecificity(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        rng = np.random.default_rng(8)
+        guide = ''.join(rng.choice(list('ACGT'), 20))
+        near = guide[:15] + ('A' if guide[15] != 'A' else 'C') + guide[16:]
+        # One guide with a 1-mismatch off-target elsewhere in the reference
+        self.sequence = (''.join(rng.choice(list('ACGT'), 400)) + guide + 'AGG'
+                         + ''.join(rng.choice(list('ACGT'), 400)) + near + 'TGG'
+                         + ''.join(rng.choice(list('ACGT'), 400)))
+        self.tmp = tempfile.TemporaryDirectory()
+        fasta = os.path.join(self.tmp.name, 'ref.fa')
+        with open(fasta, 'w') as f:
+            f.write(">chr1\n" + self.sequence + "\n")
+        self.index = OffTargetIndex.build(fasta, os.path.join(self.tmp.name, 'idx'), self.config)
+        self.guide, self.near = guide, near
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_scores_match_search(self):
+        model = SpecificityModel.mit()
+        queries = [self.guide, self.near, 'A' * 20]
+        columns = self.index.off_target_scores(queries, model)
+        np.testing.assert_array_equal(columns['off_target_hits'], self.index.off_target_counts(queries))
+        for query, specificity, (sites, _) in zip(queries, columns['specificity'], self.index.search(queries)):
+            hits = [_mit_hit_score(query, _site(self.index, s)) for s in sites.tolist()]
+            self.assertAlmostEqual(specificity, 1 / (1 + sum(hits) - (1.0 in hits)))
+        self.assertLess(columns['specificity'][0], 1.0)
+
+    def test_pipeline_penalizes_by_specificity(self):
+        pipeline = DesignPipeline(self.config, offtarget_index=self.index)
+        result = pipeline.design(self.sequence, 'chr1', top_k=500, pool_size=500)
+        by_guide = {g['guide_sequence']: g for g in result['guides']}
+        guide = by_guide[self.guide]
+        self.assertLess(guide['specificity'], 1.0)
+        self.assertAlmostEqual(guide['off_target_penalty'], 1 - guide['specificity'])
+        scorer = GuideScorer(self.config)
+        self.assertAlmostEqual(scorer.score_off_target({'specificity': 0.8, 'off_target_hits': 5}), 0.2)
+
+    def test_index_skipped_for_other_nucleases(self):
+        for pam_sequence, guide_length in (('NAG', 20), ('NGG', 18)):
+            self.config.pam_sequence, self.config.guide_length = pam_sequence, guide_length
+            pipeline = DesignPipeline(self.config, offtarget_index=self.index)
+            result = pipeline.design(self.sequence, 'chr1', top_k=50)
+            self.assertTrue(result['guides'])
+            for guide in result['guides']:
+                self.assertNotIn('specificity', guide)
+                self.assertNotIn('off_target_hits', guide)
+
+
+def _site(index, site):
+    """Decode an indexed protospacer."""
+    packed = int(index.protospacers[site])
+    return ''.join('ACGT'[(packed >> (2 * (19 - i))) & 3] for i in range(20))
+
+
+if __name__ == '__main__':
+    unittest.main()
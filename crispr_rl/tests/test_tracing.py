@@ -0,0 +1,44 @@
+"""Tests for span tracing and profiling hooks."""
+
+import unittest
+import numpy as np
+from ..utils.config import Config
+from ..utils.tracing import traced, span, start_trace, current_trace, cprofile
+from ..pipeline import DesignPipeline
+
+
+@traced("outer")
+def _outer(x):
+    with span("inner", size=x):
+        return x * 2
+
+
+class TestTracing(unittest.TestCase):
+    def test_disabled_by_default(self):
+        self.assertIsNone(current_trace())
+        self.assertEqual(_outer(3), 6)
+        with span("ignored") as s:
+            self.assertIsNone(s)
+
+    def test_nested_spans(self):
+        with start_trace("request") as trace:
+            _outer(2)
+            _outer(3)
+        self.assertIsNone(current_trace())
+        spans = trace.to_dict()['spans']
+        self.assertEqual([(s['name'], s['depth']) for s in spans],
+                         [('outer', 0), ('inner', 1), ('outer', 0), ('inner', 1)])
+        self.assertEqual(spans[1]['attrs'], {'size': 2})
+        self.assertGreaterEqual(trace.duration, trace.totals()['outer'])
+
+    def test_pipeline_spans_and_cprofile(self):
+        pipeline = DesignPipeline(Config())
+        sequence = ''.join(np.random.default_rng(3).choice(list('ACGT'), size=1000))
+        with start_trace("design") as trace, cprofile(limit=5) as profile:
+            pipeline.design(sequence, 'G')
+        self.assertTrue({'scan', 'extract', 'score', 'optimize', 'rerank'} <= set(trace.totals()))
+        self.assertIn('cumulative', profile['stats'])
+
+
+if __name__ == '__main__':
+    unittest.main()
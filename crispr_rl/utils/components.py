@@ -0,0 +1,116 @@
+"""Lazily built service components with warm-up and init timings."""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentRegistry:
+    """Named singletons built on first use or by a background warm-up.
+
+    ``register(name, factory)`` records a zero-argument factory, which should
+    do its own heavy imports so that they are deferred too. :meth:`get`
+    builds a component once (factories may ``get`` the components they
+    depend on) and records its init time, excluding the time spent building
+    those dependencies. :meth:`start_warm_up` builds every component
+    registered with ``warm=True`` on a background thread; :attr:`ready`
+    reports when it has finished.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._warm: List[str] = []
+        self._instances: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.lock = threading.RLock()
+        self._local = threading.local()
+        self._thread: Optional[threading.Thread] = None
+        self.warm_up_seconds: Optional[float] = None
+
+    def register(self, name: str, factory: Callable[[], Any], warm: bool = True):
+        """Add a component; ``warm`` includes it in the warm-up."""
+        self._factories[name] = factory
+        if warm:
+            self._warm.append(name)
+
+    def built(self, name: str) -> bool:
+        return name in self._instances
+
+    def peek(self, name: str) -> Optional[Any]:
+        """The component if it has been built, without building it."""
+        return self._instances.get(name)
+
+    def get(self, name: str) -> Any:
+        """The component, built now if necessary."""
+        instance = self._instances.get(name)
+        if instance is not None or name in self._instances:
+            return instance
+        with self.lock:
+            if name in self._instances:
+                return self._instances[name]
+            stack = getattr(self._local, 'stack', None)
+            if stack is None:
+                stack = self._local.stack = []
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                instance = self._factories[name]()
+            except Exception as e:
+                self.errors[name] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                dependencies = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+            self.timings[name] = elapsed - dependencies
+            self.errors.pop(name, None)
+            self._instances[name] = instance
+            return instance
+
+    async def aget(self, name: str) -> Any:
+        """:meth:`get` for coroutines: a component not yet built is built on a thread, not the event loop."""
+        if name in self._instances:
+            return self._instances[name]
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, name)
+
+    def warm_up(self):
+        """Build every warm component now; failures are logged and left for first use to retry."""
+        started = time.perf_counter()
+        for name in self._warm:
+            try:
+                self.get(name)
+            except Exception:
+                logger.exception("Warm-up of %s failed", name)
+        self.warm_up_seconds = time.perf_counter() - started
+
+    def start_warm_up(self):
+        """Run :meth:`warm_up` on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.warm_up, name="warm-up", daemon=True)
+            self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        """Whether every warm component has been built."""
+        return all(name in self._instances for name in self._warm)
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness plus, per component, whether it is built, its init time and any build error."""
+        return {
+            "ready": self.ready,
+            "warm_up_seconds": self.warm_up_seconds,
+            "components": {
+                name: {
+                    "ready": name in self._instances,
+                    "init_seconds": self.timings.get(name),
+                    **({"error": self.errors[name]} if name in self.errors else {}),
+                }
+                for name in self._factories
+            },
+        }
@@ -10,23 +10,57 @@ class Config:
     def __init__(self):
         self.seed = int(os.getenv("CRISPR_SEED", "42"))
         self.pam_sequence = os.getenv("PAM_SEQUENCE", "NGG")
+        self.pam_side = os.getenv("PAM_SIDE", "3prime")  # 3prime (Cas9) | 5prime (Cas12a)
         self.guide_length = int(os.getenv("GUIDE_LENGTH", "20"))
         self.weights = {
             "on_target": float(os.getenv("W1", "0.5")),
             "off_target": float(os.getenv("W2", "0.3")),
             "coverage": float(os.getenv("W3", "0.2")),
         }
+        self.rl_policy = os.getenv("RL_POLICY", "linucb")  # linucb | thompson
         self.rl_params = {
-            "epsilon": float(os.getenv("RL_EPSILON", "0.1")),
-            "learning_rate": float(os.getenv("RL_LR", "0.01")),
+            "alpha": float(os.getenv("RL_ALPHA", "0.1")),  # Exploration strength
+            "ridge": float(os.getenv("RL_RIDGE", "1.0")),  # Prior precision
+            "decay": float(os.getenv("RL_DECAY", "1.0")),  # Evidence kept per new observation; 1 = never forget
         }
+        self.rl_retrain_interval = float(os.getenv("RL_RETRAIN_INTERVAL", "10"))  # Seconds between retraining rounds
+        self.rl_retrain_batch = int(os.getenv("RL_RETRAIN_BATCH", "1000"))  # Feedback entries per batched update
+        self.policy_store = os.getenv("POLICY_STORE", "policy_state.db")  # Shared bandit state; empty keeps it in memory
+        self.uniprot_url = os.getenv("UNIPROT_URL", "https://www.uniprot.org/uniprot")
+        self.fetch_timeout = float(os.getenv("FETCH_TIMEOUT", "10"))
+        self.fetch_pool_size = int(os.getenv("FETCH_POOL_SIZE", "16"))
+        self.sequence_cache_size = int(os.getenv("SEQUENCE_CACHE_SIZE", "256"))
+        self.sequence_cache_ttl = float(os.getenv("SEQUENCE_CACHE_TTL", "3600"))
+        self.sequence_cache_bytes = int(os.getenv("SEQUENCE_CACHE_BYTES", str(256 << 20)))  # Cached bases in memory
+        self.sequence_cache_dir = os.getenv("SEQUENCE_CACHE_DIR")  # Optional on-disk sequence cache
+        self.genome_fasta = os.getenv("GENOME_FASTA")  # Local reference served via LocalGenomeStore
+        self.offtarget_index = os.getenv("OFFTARGET_INDEX")  # Directory built by OffTargetIndex.build
+        self.offtarget_max_mismatches = int(os.getenv("OFFTARGET_MAX_MISMATCHES", "3"))
+        self.design_chunk_size = int(os.getenv("DESIGN_CHUNK_SIZE", "100000"))  # Bases scored per design chunk
+        self.design_cache_size = int(os.getenv("DESIGN_CACHE_SIZE", "128"))  # 0 disables the design cache
+        self.design_cache_bytes = int(os.getenv("DESIGN_CACHE_BYTES", str(256 << 20)))  # Cached site index budget
+        self.site_index_max_length = int(os.getenv("SITE_INDEX_MAX_LENGTH", "10000000"))  # Longest indexed sequence
+        self.batch_workers = int(os.getenv("BATCH_WORKERS", "0"))  # Batch design processes; 0 = one per CPU
+        self.batch_max_genes = int(os.getenv("BATCH_MAX_GENES", "1000"))  # Genes accepted per batch request
+        self.design_workers = int(os.getenv("DESIGN_WORKERS", "4"))  # Designs run concurrently off the event loop
+        self.design_queue_depth = int(os.getenv("DESIGN_QUEUE_DEPTH", "16"))  # Designs waiting before 429s
+        self.design_timeout = float(os.getenv("DESIGN_TIMEOUT", "60"))  # Seconds per design request; 0 = none
+        self.specificity_model = os.getenv("SPECIFICITY_MODEL", "mit")  # mit | off | saved (L, 4, 4) CFD-style table
+        self.on_target_model = os.getenv("ON_TARGET_MODEL", "heuristic")  # heuristic | saved model directory
+        self.startup_mode = os.getenv("STARTUP_MODE", "background")  # background | eager | lazy component builds
+        self.tracing = os.getenv("CRISPR_TRACING", "0").lower() in ("1", "true", "yes")  # Log a span trace per design
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert config to dictionary."""
         return {
             "seed": self.seed,
             "pam_sequence": self.pam_sequence,
+            "pam_side": self.pam_side,
             "guide_length": self.guide_length,
             "weights": self.weights,
+            "rl_policy": self.rl_policy,
             "rl_params": self.rl_params,
+            "offtarget_max_mismatches": self.offtarget_max_mismatches,
+            "on_target_model": self.on_target_model,
+            "specificity_model": self.specificity_model,
         }
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""Nucleotide encoding utilities."""
+
+from typing import Dict
+import numpy as np
+
+# Base codes: A=0, C=1, G=2, T=3, anything else (N, gaps, ...) = 4
+BASES = "ACGT"
+UNKNOWN = 4
+
+_ENCODE_TABLE = np.full(256, UNKNOWN, dtype=np.uint8)
+for _code, _base in enumerate(BASES):
+    _ENCODE_TABLE[ord(_base)] = _code
+    _ENCODE_TABLE[ord(_base.lower())] = _code
+_ENCODE_TABLE[ord('U')] = _ENCODE_TABLE[ord('u')] = 3
+
+_DECODE_TABLE = np.frombuffer(b"ACGTN", dtype=np.uint8)
+
+# Complement of each code; unknown stays unknown
+_COMPLEMENT = np.array([3, 2, 1, 0, UNKNOWN], dtype=np.uint8)
+
+# One bit per base so IUPAC classes become bitmasks; unknown bases match nothing
+_CODE_BITS = np.array([1, 2, 4, 8, 0], dtype=np.uint8)
+
+IUPAC_MASKS: Dict[str, int] = {
+    'A': 1, 'C': 2, 'G': 4, 'T': 8, 'U': 8,
+    'R': 1 | 4, 'Y': 2 | 8, 'S': 2 | 4, 'W': 1 | 8, 'K': 4 | 8, 'M': 1 | 2,
+    'B': 2 | 4 | 8, 'D': 1 | 4 | 8, 'H': 1 | 2 | 8, 'V': 1 | 2 | 4,
+    'N': 1 | 2 | 4 | 8,
+}
+
+_IUPAC_COMPLEMENT = str.maketrans("ACGTURYSWKMBDHVN", "TGCAAYRSWMKVHDBN")
+
+
+def encode_sequence(sequence) -> np.ndarray:
+    """Encode a nucleotide string, bytes or ASCII uint8 array into a code array."""
+    if isinstance(sequence, str):
+        sequence = sequence.encode('ascii', errors='replace')
+    raw = sequence if isinstance(sequence, np.ndarray) else np.frombuffer(sequence, dtype=np.uint8)
+    return _ENCODE_TABLE[raw]
+
+
+def decode_sequence(codes: np.ndarray) -> str:
+    """Decode a code array back into an upper-case nucleotide string."""
+    return _DECODE_TABLE[np.asarray(codes, dtype=np.uint8)].tobytes().decode('ascii')
+
+
+def reverse_complement_codes(codes: np.ndarray) -> np.ndarray:
+    """Reverse complement of an encoded sequence (last axis)."""
+    return _COMPLEMENT[np.asarray(codes, dtype=np.uint8)][..., ::-1]
+
+
+def reverse_complement_iupac(pattern: str) -> str:
+    """Reverse complement of an IUPAC pattern."""
+    return pattern.upper().translate(_IUPAC_COMPLEMENT)[::-1]
+
+
+def code_bits(codes: np.ndarray) -> np.ndarray:
+    """Map base codes to one-hot bitmasks for IUPAC matching."""
+    return _CODE_BITS[codes]
+
+
+def iupac_masks(pattern: str) -> np.ndarray:
+    """Convert an IUPAC pattern into per-position base bitmasks."""
+    try:
+        return np.array([IUPAC_MASKS[c] for c in pattern.upper()], dtype=np.uint8)
+    except KeyError as e:
+        raise ValueError(f"Invalid IUPAC code {e.args[0]!r} in pattern {pattern!r}") from None
+
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def pack_kmers(windows: np.ndarray) -> np.ndarray:
+    """Pack encoded k-mers (rows, k <= 32, ACGT only) into uint64, first base most significant."""
+    windows = np.asarray(windows, dtype=np.uint64)
+    k = windows.shape[-1]
+    if k > 32:
+        raise ValueError(f"Cannot pack {k}-mers into 64 bits")
+    shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+    return np.bitwise_or.reduce(windows << shifts, axis=-1)
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Number of set bits in each uint64."""
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    v = values - ((values >> np.uint64(1)) & _M1)
+    v = (v & _M2) + ((v >> np.uint64(2)) & _M2)
+    v = (v + (v >> np.uint64(4))) & _M4
+    return (v * _H01) >> np.uint64(56)
+
+
+def mismatch_bits(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """One bit (the low bit of each base) set per mismatching base of packed k-mers."""
+    x = np.bitwise_xor(a, b)
+    return (x | (x >> np.uint64(1))) & _M1
+
+
+def count_mismatches(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Hamming distance between packed k-mers (broadcasting)."""
+    return popcount64(mismatch_bits(a, b)).astype(np.uint8)
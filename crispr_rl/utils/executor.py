@@ -0,0 +1,174 @@
+"""Bounded executor for running blocking design work off the event loop."""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Set
+from .config import Config
+from .tracing import profiled
+
+_DONE = object()
+
+
+class Saturated(RuntimeError):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class DesignTimeout(TimeoutError):
+    """Raised when a job does not finish within the executor's timeout."""
+
+
+class DesignExecutor:
+    """Thread pool with admission control for CPU-bound design work.
+
+    At most ``max_workers`` jobs run at once and at most ``queue_depth`` more
+    wait for a worker; beyond that :meth:`run` fails fast with
+    :class:`Saturated` instead of queueing without bound. A job admitted but
+    not finished within ``timeout`` seconds raises :class:`DesignTimeout`; a
+    job still queued at that point is dropped, one already running keeps its
+    slot until it returns. Time spent queued and running is recorded as the
+    ``queue_wait`` and ``run`` stages of ``metrics``.
+
+    Jobs run in a copy of the caller's context, so tracing spans and
+    :func:`~crispr_rl.utils.tracing.cprofile_jobs` dumps include the work
+    done on the worker thread.
+    """
+
+    def __init__(self, max_workers: int = 4, queue_depth: int = 16, timeout: Optional[float] = None,
+                 metrics=None):
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self.metrics = metrics
+        self.threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="design")
+        self.futures: Set[Future] = set()  # Submitted jobs not yet done, cancelled by close()
+        self.lock = threading.Lock()
+        self.pending = 0  # Admitted jobs, queued or running
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_config(cls, config: Config, metrics=None) -> 'DesignExecutor':
+        """An executor sized by ``design_workers``, ``design_queue_depth`` and ``design_timeout``."""
+        return cls(config.design_workers, config.design_queue_depth, config.design_timeout, metrics)
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.queue_depth
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a job submitted now would be rejected."""
+        with self.lock:
+            return self.pending >= self.capacity
+
+    def _admit(self):
+        with self.lock:
+            if self.pending >= self.capacity:
+                self.rejected += 1
+                raise Saturated(f"Design queue full ({self.pending} jobs admitted)")
+            self.pending += 1
+
+    def _release(self, *_):
+        with self.lock:
+            self.pending -= 1
+
+    def _record(self, stage: str, duration: float):
+        if self.metrics is not None:
+            self.metrics.record_stage(stage, duration)
+
+    def _call(self, enqueued: float, func: Callable, args: tuple, kwargs: dict) -> Any:
+        started = time.perf_counter()
+        self._record("queue_wait", started - enqueued)
+        with self.lock:
+            self.running += 1
+        try:
+            return profiled(func, *args, **kwargs)
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.completed += 1
+            self._record("run", time.perf_counter() - started)
+
+    def _submit(self, func: Callable, args: tuple, kwargs: dict) -> Future:
+        context = contextvars.copy_context()
+        future = self.threads.submit(context.run, self._call, time.perf_counter(), func, args, kwargs)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future: Future):
+        with self.lock:
+            self.futures.discard(future)
+
+    async def _wait(self, future: Future, timeout: Optional[float]) -> Any:
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self.lock:
+                self.timeouts += 1
+            raise DesignTimeout(f"Design did not finish within {self.timeout:g}s") from None
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run ``func(*args, **kwargs)`` on a worker and await its result."""
+        self._admit()
+        try:
+            future = self._submit(func, args, kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return await self._wait(future, self.timeout)
+
+    async def iterate(self, iterator: Iterator[Any], per_item: bool = False) -> AsyncIterator[Any]:
+        """Drive a blocking iterator on the workers, one item per job.
+
+        The iterator holds a single admission slot for its whole life, and the
+        timeout bounds the total time to exhaust it, or with ``per_item`` the
+        time to produce each item.
+        """
+        self._admit()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        future = None
+        try:
+            while True:
+                if per_item and self.timeout is not None:
+                    deadline = time.monotonic() + self.timeout
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                future = self._submit(next, (iterator, _DONE), {})
+                item = await self._wait(future, remaining)
+                future = None
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            if future is not None and not future.cancel():
+                future.add_done_callback(self._release)  # Keep the slot until the running step returns
+            else:
+                self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current load and lifetime counters."""
+        with self.lock:
+            return {
+                'workers': self.max_workers,
+                'queue_depth': self.queue_depth,
+                'running': self.running,
+                'queued': max(self.pending - self.running, 0),
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+
+    def close(self):
+        """Stop accepting work and drop queued jobs."""
+        self.threads.shutdown(wait=False)
+        with self.lock:
+            futures = list(self.futures)
+        for future in futures:
+            future.cancel()  # A no-op for jobs already running
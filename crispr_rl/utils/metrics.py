@@ -1,73 +1,250 @@
 """Metrics and telemetry utilities."""
 
+import math
 import time
-from typing import Dict, Any
-from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
 import threading
+import numpy as np
+
+# Quantiles reported in summaries and the Prometheus exposition
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """Fixed-size, mergeable log-bucketed histogram for quantile estimates.
+
+    Values are counted in buckets whose bounds grow geometrically, so any
+    quantile is reported within ``relative_accuracy`` of the true value
+    (DDSketch-style). Values are clamped to ``[min_value, max_value]``, which
+    fixes the number of buckets; two sketches with the same parameters merge
+    by adding their counts.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-6, max_value: float = 1e5):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        self.counts = np.zeros(self._index(max_value) + 1, dtype=np.int64)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value: float) -> int:
+        value = min(max(value, self.min_value), self.max_value)
+        return math.ceil(math.log(value) / self._log_gamma) - self._offset
+
+    def add(self, value: float):
+        """Record one observation."""
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'QuantileSketch'):
+        """Fold another sketch with the same parameters into this one."""
+        if len(other.counts) != len(self.counts) or other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different parameters")
+        self.counts += other.counts
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Estimated ``q``-quantile (0 when empty)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank, side='right'))
+        value = 2 * self.gamma ** (index + self._offset) / (self.gamma + 1)
+        return min(max(value, self.min), self.max)
+
+    def summary(self) -> Dict[str, float]:
+        """Count, mean and the standard quantiles."""
+        result = {'count': self.count, 'mean': self.sum / self.count if self.count else 0.0}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = self.quantile(q)
+        return result
+
+
+class StageTimer:
+    """Accumulates wall time per pipeline stage for one request."""
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block under ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, duration: float):
+        """Add a duration measured elsewhere."""
+        self.totals[name] = self.totals.get(name, 0.0) + duration
+
+
+class _EndpointStats:
+    __slots__ = ('requests', 'errors', 'latency')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency = QuantileSketch()
 
 
 class MetricsCollector:
-    """Collects and reports system metrics."""
+    """Collects and reports system metrics.
+
+    Everything is aggregated as it arrives: counters, sums and one
+    :class:`QuantileSketch` per endpoint and per pipeline stage, so memory is
+    constant however long the process runs and summaries cost the same at
+    every call.
+    """
 
     def __init__(self):
-        self.metrics = defaultdict(list)
         self.lock = threading.Lock()
+        self.endpoints: Dict[str, _EndpointStats] = {}
+        self.stages: Dict[str, QuantileSketch] = {}
+        self.design_latency = QuantileSketch()
+        self.total_sites = 0
+        self.total_guides = 0
+        self.total_feedback = 0
+        self.rating_sum = 0.0
+        self.policy_reward_sum = 0.0
+        self.baseline_reward_sum = 0.0
 
     def record_request(self, endpoint: str, duration: float, success: bool = True):
         """Record API request metrics."""
         with self.lock:
-            self.metrics['requests'].append({
-                'endpoint': endpoint,
-                'duration': duration,
-                'success': success,
-                'timestamp': time.time()
-            })
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = _EndpointStats()
+            stats.requests += 1
+            stats.errors += 0 if success else 1
+            stats.latency.add(duration)
+
+    def record_stage(self, stage: str, duration: float):
+        """Record the time one request spent in a pipeline stage."""
+        with self.lock:
+            sketch = self.stages.get(stage)
+            if sketch is None:
+                sketch = self.stages[stage] = QuantileSketch()
+            sketch.add(duration)
+
+    def record_stages(self, totals: Dict[str, float]):
+        """Record a request's per-stage totals (see :class:`StageTimer`)."""
+        for stage, duration in totals.items():
+            self.record_stage(stage, duration)
 
     def record_design(self, gene_id: str, num_sites: int, num_guides: int, duration: float):
         """Record guide design metrics."""
         with self.lock:
-            self.metrics['designs'].append({
-                'gene_id': gene_id,
-                'num_sites': num_sites,
-                'num_guides': num_guides,
-                'duration': duration,
-                'timestamp': time.time()
-            })
+            self.design_latency.add(duration)
+            self.total_sites += num_sites
+            self.total_guides += num_guides
+
+    def record_estimated_uplift(self, policy_reward: float, baseline_reward: float):
+        """Record the policy's expected reward for a served ranking and for the scorer-only ranking."""
+        with self.lock:
+            self.policy_reward_sum += policy_reward
+            self.baseline_reward_sum += baseline_reward
 
     def record_feedback(self, rating: float):
         """Record user feedback metrics."""
         with self.lock:
-            self.metrics['feedback'].append({
-                'rating': rating,
-                'timestamp': time.time()
-            })
+            self.total_feedback += 1
+            self.rating_sum += rating
+
+    def _rl_estimated_uplift(self) -> Optional[float]:
+        """The policy's own reward estimate for its rankings over the scorer-only ones, minus one.
+
+        This is the model grading itself, not a measured effect: a policy that
+        mostly exploits picks the guides it rates highest, so the estimate is
+        rarely below zero whatever users think of them. Observed outcomes are
+        in ``avg_rating``.
+        """
+        if self.baseline_reward_sum <= 0:
+            return None
+        return self.policy_reward_sum / self.baseline_reward_sum - 1
 
     def get_summary(self) -> Dict[str, Any]:
         """Get metrics summary."""
         with self.lock:
-            total_requests = len(self.metrics['requests'])
-            successful_requests = sum(1 for r in self.metrics['requests'] if r['success'])
-            avg_latency = sum(r['duration'] for r in self.metrics['requests']) / max(total_requests, 1)
-
-            total_designs = len(self.metrics['designs'])
-            avg_sites = sum(d['num_sites'] for d in self.metrics['designs']) / max(total_designs, 1)
-            avg_guides = sum(d['num_guides'] for d in self.metrics['designs']) / max(total_designs, 1)
-
-            total_feedback = len(self.metrics['feedback'])
-            avg_rating = sum(f['rating'] for f in self.metrics['feedback']) / max(total_feedback, 1)
+            total_requests = sum(s.requests for s in self.endpoints.values())
+            errors = sum(s.errors for s in self.endpoints.values())
+            latency_sum = sum(s.latency.sum for s in self.endpoints.values())
+            total_designs = self.design_latency.count
 
             return {
                 "total_requests": total_requests,
-                "success_rate": successful_requests / max(total_requests, 1),
-                "avg_latency": avg_latency,
+                "success_rate": (total_requests - errors) / max(total_requests, 1),
+                "avg_latency": latency_sum / max(total_requests, 1),
                 "total_designs": total_designs,
-                "avg_sites_per_design": avg_sites,
-                "avg_guides_per_design": avg_guides,
-                "total_feedback": total_feedback,
-                "avg_rating": avg_rating,
-                "rl_uplift": 0.15,  # Placeholder - would be calculated from A/B testing
+                "avg_sites_per_design": self.total_sites / max(total_designs, 1),
+                "avg_guides_per_design": self.total_guides / max(total_designs, 1),
+                "total_feedback": self.total_feedback,
+                "avg_rating": self.rating_sum / max(self.total_feedback, 1),
+                "rl_estimated_uplift": self._rl_estimated_uplift(),
+                "endpoints": {
+                    endpoint: {"requests": s.requests, "errors": s.errors, **s.latency.summary()}
+                    for endpoint, s in sorted(self.endpoints.items())
+                },
+                "stages": {stage: sketch.summary() for stage, sketch in sorted(self.stages.items())},
             }
 
+    def prometheus_text(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Render all metrics in the Prometheus text exposition format.
+
+        ``gauges`` adds extra ``crispr_<name>`` gauges (e.g. cache statistics).
+        """
+        lines = []
+
+        def summary(name: str, help_text: str, label: str, sketches: Dict[str, QuantileSketch]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for value, sketch in sorted(sketches.items()):
+                for q in QUANTILES:
+                    lines.append(f'{name}{{{label}="{value}",quantile="{q}"}} {sketch.quantile(q):.6g}')
+                lines.append(f'{name}_sum{{{label}="{value}"}} {sketch.sum:.6g}')
+                lines.append(f'{name}_count{{{label}="{value}"}} {sketch.count}')
+
+        def scalar(name: str, kind: str, help_text: str, value: float):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value:.6g}")
+
+        with self.lock:
+            lines.append("# HELP crispr_requests_total API requests by endpoint and outcome.")
+            lines.append("# TYPE crispr_requests_total counter")
+            for endpoint, s in sorted(self.endpoints.items()):
+                lines.append(f'crispr_requests_total{{endpoint="{endpoint}",status="success"}} {s.requests - s.errors}')
+                lines.append(f'crispr_requests_total{{endpoint="{endpoint}",status="error"}} {s.errors}')
+            summary("crispr_request_duration_seconds", "API request latency.", "endpoint",
+                    {endpoint: s.latency for endpoint, s in self.endpoints.items()})
+            summary("crispr_stage_duration_seconds", "Time per design spent in each pipeline stage.", "stage",
+                    self.stages)
+            scalar("crispr_designs_total", "counter", "Completed guide designs.", self.design_latency.count)
+            scalar("crispr_design_sites_total", "counter", "PAM sites scored across designs.", self.total_sites)
+            scalar("crispr_feedback_total", "counter", "Feedback submissions.", self.total_feedback)
+            scalar("crispr_feedback_rating_sum", "counter", "Sum of feedback ratings.", self.rating_sum)
+            uplift = self._rl_estimated_uplift()
+            if uplift is not None:
+                scalar("crispr_rl_estimated_uplift", "gauge", "Policy-estimated reward of served rankings "
+                       "relative to scorer-only rankings, minus one (not a measured effect).", uplift)
+        for name, value in sorted((gauges or {}).items()):
+            scalar(f"crispr_{name}", "gauge", name.replace('_', ' ').capitalize() + ".", value)
+        return "\n".join(lines) + "\n"
+
 
 # Global metrics instance
-metrics_collector = MetricsCollector()
\ No newline at end of file
+metrics_collector = MetricsCollector()
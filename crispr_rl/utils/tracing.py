@@ -0,0 +1,214 @@
+"""Opt-in span tracing and profiling for the design hot path."""
+
+import cProfile
+import functools
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Trace of the request running in the current context; None means tracing is off
+_active: 'ContextVar[Optional[Trace]]' = ContextVar('crispr_trace', default=None)
+# Profilers of the cprofile_jobs() block running in the current context
+_profilers: 'ContextVar[Optional[List[cProfile.Profile]]]' = ContextVar('crispr_profilers', default=None)
+# Python 3.12+ allows one active profiler per process, so profiled blocks run one at a time
+_profile_lock = threading.Lock()
+
+
+class Span:
+    """One timed call inside a trace."""
+
+    __slots__ = ('name', 'start', 'duration', 'depth', 'attrs')
+
+    def __init__(self, name: str, start: float, depth: int, attrs: Optional[Dict[str, Any]]):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.depth = depth
+        self.attrs = attrs
+
+    def to_dict(self) -> Dict[str, Any]:
+        span = {'name': self.name, 'start': self.start, 'duration': self.duration, 'depth': self.depth}
+        if self.attrs:
+            span['attrs'] = self.attrs
+        return span
+
+
+class Trace:
+    """Spans recorded while handling one request (times are seconds from trace start)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.duration = 0.0
+        self.depth = 0
+        self.spans: List[Span] = []
+
+    def totals(self) -> Dict[str, float]:
+        """Inclusive time per span name."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'duration': self.duration,
+            'totals': self.totals(),
+            'spans': [span.to_dict() for span in sorted(self.spans, key=lambda span: span.start)],
+        }
+
+
+class _SpanContext:
+    __slots__ = ('trace', 'span')
+
+    def __init__(self, trace: Trace, name: str, attrs: Optional[Dict[str, Any]]):
+        self.trace = trace
+        self.span = Span(name, 0.0, trace.depth, attrs)
+
+    def __enter__(self) -> Span:
+        self.trace.depth += 1
+        self.span.start = time.perf_counter() - self.trace.origin
+        return self.span
+
+    def __exit__(self, *exc) -> bool:
+        self.span.duration = time.perf_counter() - self.trace.origin - self.span.start
+        self.trace.depth -= 1
+        self.trace.spans.append(self.span)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace active in this context, if any."""
+    return _active.get()
+
+
+def span(name: str, **attrs):
+    """Context manager timing a block as a span; a shared no-op when no trace is active."""
+    trace = _active.get()
+    if trace is None:
+        return _NOOP
+    return _SpanContext(trace, name, attrs or None)
+
+
+def traced(name: str) -> Callable:
+    """Decorator recording each call as a span named ``name``.
+
+    When no trace is active the only overhead is one context-variable lookup.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _active.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with _SpanContext(trace, name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def start_trace(name: str) -> Iterator[Trace]:
+    """Activate a new trace for the enclosed block (and tasks spawned from it)."""
+    trace = Trace(name)
+    token = _active.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.duration = time.perf_counter() - trace.origin
+        _active.reset(token)
+
+
+def log_trace(trace: Trace):
+    """Emit a finished trace as one JSON log line."""
+    logger.info(json.dumps(trace.to_dict()))
+
+
+def _dump(profilers: List[cProfile.Profile], limit: int, sort: str) -> str:
+    stream = io.StringIO()
+    if not profilers:
+        return stream.getvalue()
+    stats = pstats.Stats(profilers[0], stream=stream)
+    for profiler in profilers[1:]:
+        stats.add(profiler)
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+@contextmanager
+def cprofile(limit: int = 40, sort: str = 'cumulative') -> Iterator[Dict[str, str]]:
+    """Run the enclosed synchronous block under cProfile; the yielded dict gets a ``stats`` text dump.
+
+    Only the calling thread is profiled before Python 3.12; from 3.12 on,
+    every thread's calls are. Do not wrap ``await`` in it: other requests'
+    coroutines would run, and be profiled, in the meantime (use
+    :func:`cprofile_jobs` instead).
+    """
+    result: Dict[str, str] = {}
+    profiler = cProfile.Profile()
+    with _profile_lock:
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+    result['stats'] = _dump([profiler], limit, sort)
+
+
+@contextmanager
+def cprofile_jobs(limit: int = 40, sort: str = 'cumulative') -> Iterator[Dict[str, str]]:
+    """Profile only the calls run through :func:`profiled` in this context; the yielded dict gets ``stats``.
+
+    Nothing is profiled on the calling thread, so an event loop can await
+    executor jobs inside the block and the dump holds just those jobs.
+    """
+    result: Dict[str, str] = {}
+    profilers: List[cProfile.Profile] = []
+    token = _profilers.set(profilers)
+    try:
+        yield result
+    finally:
+        _profilers.reset(token)
+        result['stats'] = _dump(profilers, limit, sort)
+
+
+def profiled(func: Callable, *args, **kwargs) -> Any:
+    """Call ``func`` under its own profiler when a :func:`cprofile_jobs` block is active in this context.
+
+    Worker threads given a copy of a request's context use this to add
+    their calls to its dump. Profiled calls run one at a time; from Python
+    3.12 on, calls made meanwhile by other threads are included too.
+    """
+    profilers = _profilers.get()
+    if profilers is None:
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    with _profile_lock:
+        profilers.append(profiler)
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
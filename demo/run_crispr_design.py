@@ -2,6 +2,7 @@
 """Demo script for CRISPR guide design."""
 
 import argparse
+import json
 import sys
 import os
 
@@ -10,29 +11,58 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from crispr_rl.utils.config import Config
 from crispr_rl.data.fetchers import SequenceFetcher
-from crispr_rl.features.pam_scanner import PAMScanner
-from crispr_rl.features.extractor import FeatureExtractor
-from crispr_rl.scoring.scorer import GuideScorer
-from crispr_rl.rl.optimizer import RLOptimizer
-from crispr_rl.rl.reranker import ParetoReranker
+from crispr_rl.data.offtarget_index import OffTargetIndex
+from crispr_rl.pipeline import DesignPipeline
+from crispr_rl.batch import BatchDesigner
+
+
+def run_batch(config: Config, genes_file: str, top_k: int, workers: int, output: str) -> int:
+    """Design every gene listed in ``genes_file`` across a process pool."""
+    with open(genes_file, 'r') as f:
+        jobs = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    print(f"Designing CRISPR guides for {len(jobs)} genes")
+
+    failures = 0
+    out = open(output, 'w') if output else None
+    try:
+        with BatchDesigner(config, workers=workers) as designer:
+            for result in designer.iter_design(jobs, top_k=top_k):
+                if out:
+                    out.write(json.dumps(result) + "\n")
+                if result['status'] == 'ok':
+                    best = result['guides'][0]['guide_sequence'] if result['guides'] else '-'
+                    print(f"{result['gene_id']:<20} sites={result['total_sites']:<8} best={best}")
+                else:
+                    failures += 1
+                    print(f"{str(result['gene_id']):<20} ERROR {result['error']}")
+    finally:
+        if out:
+            out.close()
+
+    print(f"\n{len(jobs) - failures}/{len(jobs)} genes designed")
+    return 1 if failures and failures == len(jobs) else 0  # An empty job file is nothing to do, not a failure
 
 
 def main():
     parser = argparse.ArgumentParser(description="CRISPR Guide Design Demo")
-    parser.add_argument("--gene_id", required=True, help="Gene ID to design guides for")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--gene_id", help="Gene ID to design guides for")
+    target.add_argument("--genes_file", help="Batch mode: file with one 'gene_id' or 'gene_id start end' per line")
     parser.add_argument("--region_start", type=int, default=0, help="Region start position")
     parser.add_argument("--region_end", type=int, default=None, help="Region end position")
     parser.add_argument("--top_k", type=int, default=10, help="Number of top guides to return")
+    parser.add_argument("--workers", type=int, default=None, help="Batch mode: worker processes (default: BATCH_WORKERS)")
+    parser.add_argument("--output", default=None, help="Batch mode: write results as NDJSON to this file")
     args = parser.parse_args()
 
-    # Initialize components
     config = Config()
+    if args.genes_file:
+        return run_batch(config, args.genes_file, args.top_k, args.workers, args.output)
+
+    # Initialize components
     fetcher = SequenceFetcher(config)
-    scanner = PAMScanner(config)
-    extractor = FeatureExtractor()
-    scorer = GuideScorer(config)
-    optimizer = RLOptimizer(config, scorer)
-    reranker = ParetoReranker()
+    offtarget_index = OffTargetIndex.load(config.offtarget_index) if config.offtarget_index else None
+    pipeline = DesignPipeline(config, offtarget_index=offtarget_index)
 
     print(f"Designing CRISPR guides for gene: {args.gene_id}")
 
@@ -44,42 +74,25 @@ def main():
 
     print(f"Sequence length: {len(sequence)} bp")
 
-    # Scan PAM sites
-    pam_sites = scanner.find_pam_sites(sequence, args.region_start, args.region_end)
-    print(f"Found {len(pam_sites)} PAM sites")
+    # Scan, score, optimize and rerank chunk by chunk
+    result = pipeline.design(sequence, args.gene_id, args.region_start, args.region_end,
+                             top_k=args.top_k, pool_size=max(20, args.top_k))
+    print(f"Found {result['total_sites']} PAM sites")
 
-    if not pam_sites:
+    if not result['total_sites']:
         print("No PAM sites found in the specified region")
         return 1
 
-    # Extract features and score
-    guides = []
-    for site in pam_sites:
-        features = extractor.extract_features(
-            site['guide_sequence'], site['pam_sequence'], site['locus'], len(sequence)
-        )
-        scores = scorer.score_guide(features)
-        guide = {
-            **site,
-            **features,
-            **scores,
-            'candidate_id': f"{args.gene_id}_{site['locus']}"
-        }
-        guides.append(guide)
-
-    # RL optimization
-    optimized = optimizer.optimize_guides(guides.copy(), top_k=min(20, len(guides)))
-    # Rerank for diversity
-    final_guides = reranker.rerank(optimized, top_k=args.top_k)
+    final_guides = result['guides']
 
     # Display results
     print(f"\nTop {len(final_guides)} CRISPR Guide Candidates:")
     print("-" * 80)
-    print(f"{'Rank':<4} {'Guide Sequence':<20} {'PAM':<4} {'Locus':<6} {'GC%':<5} {'On-target':<10} {'Off-target':<10} {'Composite':<10}")
+    print(f"{'Rank':<4} {'Guide Sequence':<20} {'PAM':<4} {'Locus':<6} {'Str':<3} {'GC%':<5} {'On-target':<10} {'Off-target':<10} {'Composite':<10}")
     print("-" * 80)
 
     for i, guide in enumerate(final_guides, 1):
-        print(f"{i:<4} {guide['guide_sequence']:<20} {guide['pam_sequence']:<4} {guide['locus']:<6} "
+        print(f"{i:<4} {guide['guide_sequence']:<20} {guide['pam_sequence']:<4} {guide['locus']:<6} {guide['strand']:<3} "
               f"{guide['gc_content']:<5.1f} {guide['on_target_score']:<10.2f} "
               f"{guide['off_target_penalty']:<10.2f} {guide['composite_score']:<10.2f}")
 